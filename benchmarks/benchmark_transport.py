@@ -0,0 +1,123 @@
+"""
+Benchmarks decoding a page of email events through the HttpTransport against
+the previous plain requests.get(...).json() behaviour, using a local server
+that serves a synthetic page of EMAIL_BATCH_LIMIT events.
+
+    python -m benchmarks.benchmark_transport
+"""
+
+import gzip
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from hs_api.api.hubspot_api import EMAIL_BATCH_LIMIT
+from hs_api.api.transport import JSON_BACKENDS, HttpTransport
+
+ITERATIONS = 50
+
+
+def email_events_page():
+    events = [
+        {
+            "id": f"{random.getrandbits(64):x}",
+            "created": 1650000000000 + i,
+            "type": random.choice(["SENT", "DELIVERED", "OPEN", "CLICK"]),
+            "recipient": f"recipient{i}@example.com",
+            "portalId": 1234,
+            "appId": 113,
+            "appName": "BatchEmail",
+            "emailCampaignId": random.randint(1, 10**9),
+            "sentBy": {"id": f"{random.getrandbits(64):x}", "created": i},
+            "browser": {"name": "Chrome", "family": "Chrome", "type": "Browser"},
+            "location": {"country": "United Kingdom", "city": "London"},
+            "userAgent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)",
+        }
+        for i in range(EMAIL_BATCH_LIMIT)
+    ]
+    return json.dumps({"events": events, "hasMore": False, "offset": "x"}).encode()
+
+
+def serve(body):
+    compressed = gzip.compress(body)
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            gzipped = "gzip" in self.headers.get("Accept-Encoding", "")
+            content = compressed if gzipped else body
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            if gzipped:
+                self.send_header("Content-Encoding", "gzip")
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def benchmark_requests(url):
+    decode_seconds = 0.0
+    bytes_received = 0
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        response = requests.get(url, headers={"Authorization": "Bearer token"})
+        response.content
+        decode_start = time.perf_counter()
+        response.json()
+        decode_seconds += time.perf_counter() - decode_start
+        bytes_received += response.raw.tell()
+    return time.perf_counter() - start, decode_seconds, bytes_received
+
+
+def benchmark_transport(url, json_backend):
+    transport = HttpTransport("token", json_backend=json_backend, base_url=url)
+    start = time.perf_counter()
+    for _ in range(ITERATIONS):
+        transport.get_json("/email/public/v1/events")
+    stats = transport.stats.as_dict()
+    return (
+        time.perf_counter() - start,
+        stats["decode_seconds"],
+        stats["bytes_received"],
+    )
+
+
+def main():
+    body = email_events_page()
+    server = serve(body)
+    url = f"http://127.0.0.1:{server.server_port}"
+
+    print(f"{ITERATIONS} pages of {EMAIL_BATCH_LIMIT} events, {len(body)} bytes each")
+    print(f"{'':<20}{'total (s)':>12}{'decode (s)':>12}{'bytes/page':>12}")
+
+    results = [("requests.json", benchmark_requests(url))]
+    for backend in JSON_BACKENDS:
+        try:
+            results.append((f"transport {backend}", benchmark_transport(url, backend)))
+        except ImportError:
+            results.append((f"transport {backend}", None))
+
+    for name, result in results:
+        if result is None:
+            print(f"{name:<20}{'not installed':>12}")
+            continue
+        total, decode, bytes_received = result
+        print(
+            f"{name:<20}{total:>12.3f}{decode:>12.3f}"
+            f"{bytes_received // ITERATIONS:>12}"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
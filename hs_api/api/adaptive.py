@@ -0,0 +1,189 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import requests
+from urllib3.exceptions import TimeoutError as Urllib3TimeoutError
+
+# Seconds a request can take and still count as healthy
+TARGET_LATENCY = 2
+# Page sizes and concurrency are multiplied by this on a throttle or timeout
+DECREASE_FACTOR = 0.5
+MAX_CONCURRENCY = 8
+# The number of recent decisions kept for the metrics
+DECISION_LOG_SIZE = 100
+
+
+def is_overloaded(exception):
+    """
+    Returns whether the exception is hubspot (or the network) signalling it
+    is overloaded, i.e. a 429 or 5xx response or a timeout, rather than an
+    error with the request itself.
+    """
+    timeouts = (TimeoutError, requests.Timeout, Urllib3TimeoutError)
+    if isinstance(exception, timeouts):
+        return True
+    # urllib3 wraps timeouts in a MaxRetryError once retries are used up
+    if isinstance(getattr(exception, "reason", None), timeouts):
+        return True
+
+    status = getattr(exception, "status", None)
+    response = getattr(exception, "response", None)
+    if status is None and response is not None:
+        status = getattr(response, "status_code", None)
+    try:
+        status = int(status)
+    except (TypeError, ValueError):
+        return False
+    return status == 429 or status >= 500
+
+
+class _PageSize:
+    def __init__(self, initial, minimum, maximum):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.value = initial
+        # Additive increases step by a tenth of the largest page
+        self.step = max(1, maximum // 10)
+        self.increases = 0
+        self.decreases = 0
+
+
+class AIMDController:
+    """
+    Adapts the page and batch sizes of the client's paginated and batch
+    methods, and how many of their requests are in flight at once, to how
+    hubspot is responding, with additive increase, multiplicative decrease.
+    Each request answered within target_latency grows the page size it was
+    made with by a step and concurrency by 1 / concurrency (so by about one
+    a round of requests), up to their maximums. A 429, 5xx, timeout or slow
+    response instead multiplies both by decrease_factor, at most once every
+    target_latency seconds per name so one burst of failures only backs off
+    once. Other errors, e.g. a 400, leave both as they are.
+    Page sizes are kept by name, e.g. "ticket_search", as each endpoint has
+    its own limits, while concurrency is shared by all requests.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=MAX_CONCURRENCY,
+        target_latency=TARGET_LATENCY,
+        decrease_factor=DECREASE_FACTOR,
+    ):
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.decrease_factor = decrease_factor
+        self.concurrency = 1.0
+        self._in_flight = 0
+        self._page_sizes = dict()
+        # When each name last backed off, whether or not it has a page size
+        self._last_decrease = dict()
+        self._decisions = deque(maxlen=DECISION_LOG_SIZE)
+        self._condition = threading.Condition()
+
+    def page_size(self, name, initial, maximum, minimum=None):
+        """
+        Returns the page size to use for the name, starting at initial and
+        kept between minimum (a tenth of maximum by default) and maximum. The
+        page size returned is never above the maximum given, even where the
+        name was first registered with a larger one.
+        """
+        with self._condition:
+            page_size = self._page_sizes.get(name)
+            if page_size is None:
+                minimum = minimum or max(1, maximum // 10)
+                page_size = self._page_sizes[name] = _PageSize(
+                    initial, minimum, maximum
+                )
+            return min(page_size.value, maximum)
+
+    @contextmanager
+    def request(self, name):
+        """
+        Waits for a request to be allowed in flight, then times the request
+        made within the context and adapts to its outcome.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._in_flight < int(self.concurrency))
+            self._in_flight += 1
+        start = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            self._record(name, time.monotonic() - start, e)
+            raise
+        else:
+            self._record(name, time.monotonic() - start)
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def _record(self, name, latency, exception=None):
+        if exception is not None:
+            if not is_overloaded(exception):
+                return
+            reason = type(exception).__name__
+        elif latency > self.target_latency:
+            reason = "slow"
+        else:
+            reason = None
+
+        with self._condition:
+            page_size = self._page_sizes.get(name)
+            now = time.monotonic()
+            if reason is None:
+                decision = "increase"
+                self.concurrency = min(
+                    self.max_concurrency, self.concurrency + 1 / self.concurrency
+                )
+                if page_size is not None:
+                    page_size.value = min(
+                        page_size.maximum, page_size.value + page_size.step
+                    )
+                    page_size.increases += 1
+            else:
+                if now - self._last_decrease.get(name, 0.0) < self.target_latency:
+                    return
+                self._last_decrease[name] = now
+                if page_size is not None:
+                    page_size.value = max(
+                        page_size.minimum, int(page_size.value * self.decrease_factor)
+                    )
+                    page_size.decreases += 1
+                decision = "decrease"
+                self.concurrency = max(1.0, self.concurrency * self.decrease_factor)
+
+            self._decisions.append(
+                {
+                    "time": time.time(),
+                    "name": name,
+                    "decision": decision,
+                    "reason": reason,
+                    "latency": latency,
+                    "page_size": page_size.value if page_size else None,
+                    "concurrency": int(self.concurrency),
+                }
+            )
+            self._condition.notify_all()
+
+    def metrics(self):
+        """
+        Returns the current concurrency and page sizes, with the counts of
+        increases and decreases of each, and the most recent decisions.
+        """
+        with self._condition:
+            return {
+                "concurrency": int(self.concurrency),
+                "in_flight": self._in_flight,
+                "page_sizes": {
+                    name: {
+                        "page_size": x.value,
+                        "increases": x.increases,
+                        "decreases": x.decreases,
+                    }
+                    for name, x in self._page_sizes.items()
+                },
+                "decisions": list(self._decisions),
+            }
@@ -0,0 +1,119 @@
+import threading
+from array import array
+from collections import defaultdict
+
+# The associations returned on objects are keyed on the plural object type
+OBJECT_TYPE_LOOKUP = {
+    "contacts": "contact",
+    "companies": "company",
+    "deals": "deal",
+    "tickets": "ticket",
+}
+
+
+def _object_type(object_type):
+    return OBJECT_TYPE_LOOKUP.get(object_type, object_type)
+
+
+class AssociationIndex:
+    """
+    An in memory index of the associations between objects, e.g. deals,
+    contacts and companies, giving constant time lookups in either direction.
+    Object ids are held as integers in typed arrays per object, rather than
+    as strings in lists, to keep the index small at millions of associations.
+    The index is thread safe, so it can be filled on one thread, e.g. the
+    background thread of find_all_deals with read_ahead, while read on another.
+    """
+
+    def __init__(self):
+        # (from object type, to object type) -> from object id -> to object ids
+        self._edges = defaultdict(dict)
+        # The arrays added to since they were last deduplicated, as checking
+        # each add against its array would make building the index quadratic
+        # in the associations per object
+        self._dirty = set()
+        self._edge_count = 0
+        self._lock = threading.Lock()
+
+    def _add_edge(self, from_object_type, from_object_id, to_object_type, to_object_id):
+        to_object_ids = self._edges[(from_object_type, to_object_type)].setdefault(
+            from_object_id, array("q")
+        )
+        to_object_ids.append(to_object_id)
+        self._dirty.add((from_object_type, to_object_type, from_object_id))
+
+    def add(self, from_object_type, from_object_id, to_object_type, to_object_id):
+        """
+        Adds the association between the two objects, in both directions.
+        """
+        from_object_type = _object_type(from_object_type)
+        to_object_type = _object_type(to_object_type)
+        from_object_id = int(from_object_id)
+        to_object_id = int(to_object_id)
+
+        with self._lock:
+            self._add_edge(
+                from_object_type, from_object_id, to_object_type, to_object_id
+            )
+            if (from_object_type, from_object_id) != (to_object_type, to_object_id):
+                self._add_edge(
+                    to_object_type, to_object_id, from_object_type, from_object_id
+                )
+            self._edge_count += 1
+
+    def _deduplicate(self):
+        """
+        Removes the duplicate associations from the arrays added to, keeping
+        the first of each, once per array rather than on every add. Called
+        with the lock held.
+        """
+        for from_object_type, to_object_type, from_object_id in self._dirty:
+            edges = self._edges[(from_object_type, to_object_type)]
+            seen = set()
+            unique = array("q")
+            for to_object_id in edges[from_object_id]:
+                if to_object_id not in seen:
+                    seen.add(to_object_id)
+                    unique.append(to_object_id)
+                # Each duplicate is in the arrays of both its objects, so is
+                # only uncounted from one of them
+                elif (from_object_type, from_object_id) <= (
+                    to_object_type,
+                    to_object_id,
+                ):
+                    self._edge_count -= 1
+            edges[from_object_id] = unique
+        self._dirty.clear()
+
+    @property
+    def edge_count(self):
+        with self._lock:
+            self._deduplicate()
+            return self._edge_count
+
+    def add_objects(self, object_type, objects):
+        """
+        Adds the associations held on the given sdk objects, e.g. the deals
+        returned by find_all_deals.
+        """
+        for x in objects:
+            for to_object_type, associations in (x.associations or {}).items():
+                for associated in associations.results:
+                    self.add(object_type, x.id, to_object_type, associated.id)
+
+    def associated(self, from_object_type, object_id, to_object_type):
+        """
+        Returns the ids of the objects of to_object_type associated with the
+        given object, e.g. associated("company", company_id, "deal") for all
+        the deals of a company.
+        """
+        key = (_object_type(from_object_type), _object_type(to_object_type))
+        with self._lock:
+            edges = self._edges.get(key)
+            if not edges:
+                return []
+            self._deduplicate()
+            return [str(x) for x in edges.get(int(object_id), ())]
+
+    def __len__(self):
+        return self.edge_count
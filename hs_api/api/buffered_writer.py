@@ -0,0 +1,169 @@
+import threading
+
+# Seconds between background flushes of the buffered updates
+FLUSH_INTERVAL = 5
+# The most inputs hubspot accepts in one batch update
+MAX_BATCH_SIZE = 100
+
+
+class FailedUpdate:
+    def __init__(self, object_name, object_id, properties, exception):
+        self.object_name = object_name
+        self.object_id = object_id
+        self.properties = properties
+        self.exception = exception
+
+    def __repr__(self):
+        return (
+            f"FailedUpdate({self.object_name!r}, {self.object_id!r}, "
+            f"{self.properties!r}, {self.exception!r})"
+        )
+
+
+def call_on_error(on_error, failure):
+    """
+    Calls on_error with the failure from a background thread, printing
+    anything it raises, as raising would stop the thread.
+    """
+    try:
+        on_error(failure)
+    except Exception as e:
+        print(f"Exception in on_error for {failure}: {e}\n")
+
+
+class BufferedWriter:
+    """
+    Buffers updates to objects, merging the properties of updates to the same
+    object so only the latest value of each property is written, and writes
+    them through the batch update endpoints from a background thread every
+    flush_interval seconds, or as soon as max_batch_size objects of a type
+    are waiting.
+    Updates that fail are passed to on_error as a FailedUpdate where given, as
+    well as being kept in failed.
+    flush() writes everything buffered so far and close() stops the
+    background thread after a final flush. It can also be used as a context
+    manager to close it on exit.
+    """
+
+    def __init__(
+        self,
+        client,
+        max_batch_size=MAX_BATCH_SIZE,
+        flush_interval=FLUSH_INTERVAL,
+        on_error=None,
+    ):
+        self._client = client
+        self.max_batch_size = min(max_batch_size, MAX_BATCH_SIZE)
+        self.flush_interval = flush_interval
+        self.on_error = on_error
+        self.failed = []
+        self._closed = False
+        # object name -> object id -> merged properties
+        self._pending = dict()
+        self._condition = threading.Condition()
+        # Only one flush writes at a time so updates to an object stay in order
+        self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _is_full(self):
+        return any(len(x) >= self.max_batch_size for x in self._pending.values())
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed or self._is_full(),
+                    timeout=self.flush_interval,
+                )
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                # Keep flushing in the background whatever goes wrong
+                print(f"Exception when flushing buffered updates: {e}\n")
+
+    def update(self, object_name, object_id, **properties):
+        with self._condition:
+            if self._closed:
+                raise ValueError("Cannot update through a closed BufferedWriter")
+            pending = self._pending.setdefault(object_name, dict())
+            pending.setdefault(str(object_id), dict()).update(properties)
+            if len(pending) >= self.max_batch_size:
+                self._condition.notify_all()
+
+    def update_company(self, object_id, **properties):
+        self.update("company", object_id, **properties)
+
+    def update_contact(self, object_id, **properties):
+        self.update("contact", object_id, **properties)
+
+    def update_deal(self, object_id, **properties):
+        self.update("deal", object_id, **properties)
+
+    def _record_failure(self, failures, object_name, object_id, properties, exception):
+        failure = FailedUpdate(object_name, object_id, properties, exception)
+        failures.append(failure)
+        self.failed.append(failure)
+        if self.on_error is not None:
+            call_on_error(self.on_error, failure)
+
+    def flush(self):
+        """
+        Writes all the buffered updates, returning a list of the FailedUpdates
+        of this flush.
+        """
+        failures = []
+        with self._flush_lock:
+            with self._condition:
+                pending, self._pending = self._pending, dict()
+
+            for object_name, updates in pending.items():
+                object_ids = list(updates)
+                while object_ids:
+                    # Batches shrink where the client's adaptive controller
+                    # backs off
+                    size = self._client._page_size(
+                        "batch_update", self.max_batch_size, self.max_batch_size
+                    )
+                    batch_ids, object_ids = object_ids[:size], object_ids[size:]
+                    batch = {x: updates[x] for x in batch_ids}
+
+                    def on_error(object_id, exception):
+                        self._record_failure(
+                            failures,
+                            object_name,
+                            object_id,
+                            batch[object_id],
+                            exception,
+                        )
+
+                    try:
+                        self._client._batch_update(
+                            object_name, batch, on_error=on_error
+                        )
+                    except Exception as e:
+                        # e.g. a connection error, so none of the batch was written
+                        for object_id in batch:
+                            on_error(object_id, e)
+        return failures
+
+    def close(self):
+        """
+        Stops the background flushes and writes any remaining updates,
+        returning a list of the FailedUpdates of the final flush.
+        """
+        with self._condition:
+            if self._closed:
+                return []
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        return self.flush()
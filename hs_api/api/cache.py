@@ -0,0 +1,231 @@
+import hashlib
+import inspect
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from hs_api.api.coalescing import call_key
+
+CACHE_SIZE = 10000
+# Seconds responses are cached for, unless set for the object type
+CACHE_TTL = 5 * 60
+
+
+class LRUCache:
+    """
+    A thread safe in memory cache holding up to max_size entries, evicting
+    the least recently used first. Entries are tagged with the object types
+    they depend on, so they can be invalidated by object type.
+    """
+
+    def __init__(self, max_size=CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_tag = defaultdict(set)
+
+    def _remove(self, key):
+        _, tags, _ = self._entries.pop(key)
+        for tag in tags:
+            self._keys_by_tag[tag].discard(key)
+
+    def get(self, key):
+        """
+        Returns a tuple of whether the key was found and its value.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, _, expires = entry
+            if expires <= time.time():
+                self._remove(key)
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, tags, expires):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, tags, expires)
+            for tag in tags:
+                self._keys_by_tag[tag].add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tag):
+        with self._lock:
+            for key in list(self._keys_by_tag.pop(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+
+class DiskCache:
+    """
+    A cache kept in a sqlite database at the given path, so cached responses
+    survive between runs and can be shared by processes. Values are pickled.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, tags TEXT, expires REAL, value BLOB)"
+            )
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value FROM responses WHERE key = ? AND expires > ?",
+                (repr(key), time.time()),
+            ).fetchone()
+        if row is None:
+            return False, None
+        return True, pickle.loads(row[0])
+
+    def set(self, key, value, tags, expires):
+        # Tags are stored wrapped in commas so each can be matched whole
+        tags = "," + ",".join(tags) + ","
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (repr(key), tags, expires, pickle.dumps(value)),
+            )
+
+    def invalidate(self, tag):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM responses WHERE tags LIKE ?", (f"%,{tag},%",)
+            )
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+
+class ResponseCache:
+    """
+    A read-through cache of the responses of the client's read methods, keyed
+    on the method, its arguments and the client's cache_scope, held in memory
+    (an LRUCache) unless another backend, e.g. a DiskCache, is given.
+    Responses are cached for the ttl (in seconds) of their object type in
+    ttls, otherwise default_ttl, and writes made through the same client
+    invalidate the responses of the object types they affect.
+    """
+
+    def __init__(self, backend=None, ttls=None, default_ttl=CACHE_TTL):
+        self.backend = backend if backend is not None else LRUCache()
+        self.ttls = ttls or dict()
+        self.default_ttl = default_ttl
+        self._lock = threading.Lock()
+        # Bumped on each invalidation of a tag, so a response read before an
+        # invalidation isn't cached after it
+        self._generations = defaultdict(int)
+
+    def generation(self, tags):
+        with self._lock:
+            return tuple(self._generations[x] for x in tags)
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def set(self, key, value, tags, generation):
+        ttl = min(self.ttls.get(x, self.default_ttl) for x in tags)
+        with self._lock:
+            if generation != tuple(self._generations[x] for x in tags):
+                return
+            self.backend.set(key, value, tags, time.time() + ttl)
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] += 1
+                self.backend.invalidate(tag)
+
+
+def cache_scope(access_token, api_url, pipeline_id):
+    """
+    Returns what, beyond their arguments, the cached responses of a client
+    depend on: the portal, identified by a fingerprint of the api url and
+    access token rather than the token itself, and the client's pipeline.
+    Clients sharing a cache, or a disk cache shared between runs, only see
+    the responses of clients with the same scope.
+    """
+    fingerprint = hashlib.sha256(f"{api_url}\n{access_token}".encode()).hexdigest()
+    return fingerprint[:16], pipeline_id
+
+
+def cached(*tags):
+    """
+    Decorates a read method of HubSpotClient so its responses are served
+    from the client's response cache, where it has one. The tags are the
+    object types the response depends on.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = self._response_cache
+            key = call_key(method.__name__, args, kwargs)
+            if cache is None or key is None:
+                return method(self, *args, **kwargs)
+            key = (self._cache_scope, key)
+
+            hit, value = cache.get(key)
+            if hit:
+                return value
+            generation = cache.generation(tags)
+            value = method(self, *args, **kwargs)
+            cache.set(key, value, tags, generation)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def _bound_object_name(signature, self, args, kwargs):
+    # object_name can be passed by keyword as well as by position
+    try:
+        bound = signature.bind_partial(self, *args, **kwargs)
+    except TypeError:
+        return ()
+    if bound.arguments.get("object_name") is None:
+        return ()
+    return (bound.arguments["object_name"],)
+
+
+def invalidates(*tags, object_name=False):
+    """
+    Decorates a write method of HubSpotClient so that, once it is done, it
+    invalidates the cached responses of the object types it affects, i.e. the
+    tags and, where object_name is True, its object_name (first) argument.
+    """
+
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                if self._response_cache is not None:
+                    invalidated = tags
+                    if object_name:
+                        invalidated += _bound_object_name(signature, self, args, kwargs)
+                    self._response_cache.invalidate(*invalidated)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,83 @@
+import threading
+from functools import wraps
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.exception = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls, so while a call for a key is in
+    flight, any other calls for the same key wait for it and share its result
+    (or exception) rather than making the call again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = dict()
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+def _freeze(value):
+    """
+    Returns a hashable version of the value, converting lists and dicts to
+    tuples, so call arguments can be used as a key.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(x) for x in value)
+    return value
+
+
+def call_key(name, args, kwargs):
+    key = (name, _freeze(args), _freeze(kwargs))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def coalesced(method):
+    """
+    Decorates a read method of HubSpotClient so identical concurrent calls
+    share one request, where the client was created with coalesce_reads.
+    Callers sharing a call get the same result object, so shouldn't mutate it.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = call_key(method.__name__, args, kwargs)
+        if self._single_flight is None or key is None:
+            return method(self, *args, **kwargs)
+        return self._single_flight.do(key, method, self, *args, **kwargs)
+
+    return wrapper
@@ -0,0 +1,103 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Seconds the catalogue is served as is before it is refreshed from hubspot
+CONTACT_LIST_CACHE_AGE = 60 * 60
+
+
+class ContactListCatalogue:
+    """
+    A catalogue of the metadata of all contact lists, indexed by list id and
+    name, that is only refreshed from hubspot when it is older than max_age
+    seconds (or on refresh(force=True)).
+    On a refresh, only the lists updated since the last sync replace the lists
+    already held, and lists no longer in hubspot are dropped.
+    Where a cache_path is given, the catalogue is also saved to that file
+    after each refresh and loaded from it on creation, so it can be shared
+    between runs and processes.
+    """
+
+    def __init__(self, client, cache_path=None, max_age=CONTACT_LIST_CACHE_AGE):
+        self._client = client
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.max_age = max_age
+        self.synced_at = None
+        self._lock = threading.RLock()
+        self._by_id = dict()
+        self._by_name = dict()
+
+        if self.cache_path and self.cache_path.exists():
+            self._load()
+
+    def _load(self):
+        with open(self.cache_path) as f:
+            cache = json.load(f)
+        self.synced_at = cache["synced_at"]
+        self._index(cache["lists"])
+
+    def _save(self):
+        # Write to a temp file and swap it in so readers never see a partial file
+        temp_path = self.cache_path.with_suffix(self.cache_path.suffix + ".tmp")
+        with open(temp_path, "w") as f:
+            json.dump({"synced_at": self.synced_at, "lists": self.lists()}, f)
+        os.replace(temp_path, self.cache_path)
+
+    def _index(self, contact_lists):
+        self._by_id = {x["listId"]: x for x in contact_lists}
+        self._by_name = {x["name"]: x for x in contact_lists}
+
+    @property
+    def is_stale(self):
+        return self.synced_at is None or time.time() - self.synced_at >= self.max_age
+
+    def refresh(self, force=False):
+        """
+        Syncs the catalogue with hubspot if it is stale or force is True,
+        returning the lists that were added or updated since the last sync.
+        """
+        with self._lock:
+            if not (force or self.is_stale):
+                return []
+
+            contact_lists = dict(self._by_id)
+            seen = set()
+            changed = []
+            for page in self._client._contact_list_pages():
+                for contact_list in page:
+                    list_id = contact_list["listId"]
+                    seen.add(list_id)
+                    known = contact_lists.get(list_id)
+                    if known is None or contact_list.get("updatedAt", 0) > known.get(
+                        "updatedAt", 0
+                    ):
+                        contact_lists[list_id] = contact_list
+                        changed.append(contact_list)
+
+            self._index([x for list_id, x in contact_lists.items() if list_id in seen])
+            self.synced_at = time.time()
+            if self.cache_path:
+                self._save()
+            return changed
+
+    def get(self, list_id):
+        """
+        Returns the contact list with the given id, or None if there is none.
+        """
+        self.refresh()
+        return self._by_id.get(int(list_id))
+
+    def find_by_name(self, name):
+        """
+        Returns the contact list with the given name, or None if there is none.
+        """
+        self.refresh()
+        return self._by_name.get(name)
+
+    def lists(self):
+        """
+        Returns all the contact lists held, without refreshing.
+        """
+        return list(self._by_id.values())
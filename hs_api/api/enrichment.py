@@ -0,0 +1,51 @@
+class EnrichedTicket:
+    """
+    A ticket, as returned by find_all_tickets, along with the contacts and
+    companies associated with it, as returned by the batch read api.
+    """
+
+    def __init__(self, ticket, contacts, companies):
+        self.ticket = ticket
+        self.contacts = contacts
+        self.companies = companies
+
+    @property
+    def id(self):
+        return self.ticket.id
+
+    def to_dict(self):
+        """
+        Returns the ticket as a dict, like the sdk objects' to_dict, with the
+        associated contacts and companies as lists of dicts.
+        """
+        return {
+            **self.ticket.to_dict(),
+            "contacts": [x.to_dict() for x in self.contacts],
+            "companies": [x.to_dict() for x in self.companies],
+        }
+
+    def __repr__(self):
+        return (
+            f"EnrichedTicket({self.id!r}, contacts={[x.id for x in self.contacts]}, "
+            f"companies={[x.id for x in self.companies]})"
+        )
+
+
+def enrich_tickets(tickets, associations, objects):
+    """
+    Returns the tickets as EnrichedTickets. associations is a dict of each
+    associated object type, "contact" or "company", to a dict of ticket id to
+    associated object ids, and objects a dict of each object type to a dict
+    of object id to the object read. Associated objects that couldn't be
+    read, e.g. as they've since been deleted, are left out.
+    """
+
+    def associated(object_type, ticket_id):
+        read = objects[object_type]
+        ids = associations[object_type].get(ticket_id, [])
+        return [read[x] for x in ids if x in read]
+
+    return [
+        EnrichedTicket(x, associated("contact", x.id), associated("company", x.id))
+        for x in tickets
+    ]
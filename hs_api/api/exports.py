@@ -0,0 +1,160 @@
+import csv
+import io
+import shutil
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timezone
+from itertools import islice
+from urllib.parse import urlparse
+
+from hubspot.crm.objects import Configuration, SimplePublicObject
+
+from hs_api.api.polling import poll_until
+
+EXPORT_PATH = "/crm/v3/exports/export/async"
+# Seconds to wait for an export to complete before giving up
+EXPORT_TIMEOUT = 60 * 60
+# Seconds between polls of an export's status, doubling up to the maximum
+EXPORT_POLL_INTERVAL = 2
+MAX_EXPORT_POLL_INTERVAL = 60
+EXPORT_FAILED_STATUSES = ("CANCELED", "FAILED")
+# The properties needed to build the records, always exported
+RECORD_PROPERTIES = ("hs_object_id", "createdate")
+# Contacts have their own name for the last modified date
+MODIFIED_DATE_PROPERTIES = ("hs_lastmodifieddate", "lastmodifieddate")
+ID_COLUMNS = ("hs_object_id", "Record ID")
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# The exported records are built without the sdk's validation, as not every
+# export has created and updated dates
+RECORD_CONFIGURATION = Configuration()
+RECORD_CONFIGURATION.client_side_validation = False
+
+
+def export_request(object_type, properties, export_name=None, list_id=None):
+    """
+    Returns the body of a request to export the properties of all objects of
+    the object type (e.g. "deal"), or of the contact list with list_id, as
+    csv with property names and values as stored rather than their labels.
+    """
+    modified_date = (
+        "lastmodifieddate" if object_type == "contact" else "hs_lastmodifieddate"
+    )
+    properties = list(dict.fromkeys([*RECORD_PROPERTIES, modified_date, *properties]))
+    request = {
+        "exportType": "VIEW" if list_id is None else "LIST",
+        "exportName": export_name or f"{object_type} export {int(time.time())}",
+        "format": "CSV",
+        "language": "EN",
+        "objectType": object_type.upper(),
+        "objectProperties": properties,
+        "exportInternalValuesOptions": ["NAMES", "VALUES"],
+    }
+    if list_id is not None:
+        request["listId"] = str(list_id)
+    return request
+
+
+def wait_for_export(transport, task_id, timeout, poll_interval, max_poll_interval):
+    """
+    Polls the status of the export task, backing off exponentially, until it
+    completes, returning its status with the download url as its result.
+    Raises a RuntimeError if the export fails and a TimeoutError if it isn't
+    complete within timeout seconds.
+    """
+    status = poll_until(
+        f"Export {task_id}",
+        lambda: transport.get_json(f"{EXPORT_PATH}/tasks/{task_id}/status"),
+        "status",
+        ("COMPLETE", *EXPORT_FAILED_STATUSES),
+        timeout,
+        poll_interval,
+        max_poll_interval,
+    )
+    if status["status"] in EXPORT_FAILED_STATUSES:
+        raise RuntimeError(
+            f"Export {task_id} {status['status'].lower()}: "
+            f"{status.get('errors') or status.get('message')}"
+        )
+    return status
+
+
+def _parse_datetime(value):
+    if not value:
+        return None
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value) / 1000, tz=timezone.utc)
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def record_from_row(row):
+    """
+    Builds a SimplePublicObject, like those returned by the find_all_*
+    methods, from a row of an export. Empty values are None, as they are in
+    the api's responses.
+    """
+    properties = {k: v if v != "" else None for k, v in row.items()}
+    object_id = next((row[x] for x in ID_COLUMNS if row.get(x)), None)
+    modified_date = next((row[x] for x in MODIFIED_DATE_PROPERTIES if row.get(x)), None)
+    properties.setdefault("hs_object_id", object_id)
+    return SimplePublicObject(
+        id=object_id,
+        properties=properties,
+        created_at=_parse_datetime(row.get("createdate")),
+        updated_at=_parse_datetime(modified_date),
+        archived=False,
+        local_vars_configuration=RECORD_CONFIGURATION,
+    )
+
+
+def _csv_rows(binary_file):
+    # utf-8-sig as the exported files start with a byte order mark
+    text_file = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+    yield from csv.DictReader(text_file)
+
+
+def download_rows(transport, url):
+    """
+    Yields the rows of the exported csv at url as dicts, parsed as the file
+    is downloaded. Large exports are zipped, possibly into several csv files,
+    and as a zip can't be read until it has all arrived they are streamed to
+    a temporary file first, rather than held in memory.
+    """
+    with transport.download(url) as response:
+        response.raw.decode_content = True
+        # Otherwise urllib3 closes the stream once the body has been read,
+        # before the text wrapper reading it sees the end of the stream
+        response.raw.auto_close = False
+        is_zip = "zip" in response.headers.get("Content-Type", "") or urlparse(
+            url
+        ).path.lower().endswith(".zip")
+        if not is_zip:
+            yield from _csv_rows(response.raw)
+            return
+
+        with tempfile.TemporaryFile() as temp_file:
+            shutil.copyfileobj(response.raw, temp_file, DOWNLOAD_CHUNK_SIZE)
+            temp_file.seek(0)
+            with zipfile.ZipFile(temp_file) as zip_file:
+                for name in zip_file.namelist():
+                    if name.lower().endswith(".csv"):
+                        with zip_file.open(name) as f:
+                            yield from _csv_rows(f)
+
+
+def export_batches(rows, batch_size):
+    """
+    Yields the rows as lists of up to batch_size SimplePublicObjects, the
+    batches the find_all_* methods yield.
+    """
+    rows = iter(rows)
+    while True:
+        batch = [record_from_row(x) for x in islice(rows, batch_size)]
+        if not batch:
+            break
+        yield batch
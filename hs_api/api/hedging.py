@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+
+# The latency percentile after which a read is hedged
+HEDGE_PERCENTILE = 95
+# Seconds to wait before hedging until enough latencies have been seen
+INITIAL_HEDGE_DELAY = 1.0
+MIN_HEDGE_DELAY = 0.05
+# At most this many hedges are sent per read, on average
+HEDGE_RATIO = 0.1
+# Hedges that can be saved up to be sent together
+MAX_HEDGE_BUDGET = 10
+HEDGE_WORKERS = 16
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+
+def _run(future, fn, args, kwargs):
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        future.set_result(fn(*args, **kwargs))
+    except BaseException as e:
+        future.set_exception(e)
+
+
+class Hedger:
+    """
+    Hedges idempotent reads: where a read hasn't returned after the
+    percentile of recent latencies for reads of the same name, a duplicate
+    is sent and whichever returns first wins. Where the first to return
+    fails, the other is waited for.
+    Each read takes a request from the rate_limiter, waiting for one where
+    needed, and each hedge takes one without waiting, so hedges are only
+    sent where there's room left within the rate limit and never push
+    requests over it. Hedges are bounded to hedge_ratio of reads.
+    A read reserves a hedge from the budget while in flight, handing it back
+    if it isn't hedged. Reads that can't reserve one, as the budget is spent,
+    run on the caller's thread. Those that can run on a thread of their own,
+    so the caller is free to take whichever response comes first, with only
+    the hedges going through the pool of max_workers threads. So reads are
+    never queued behind the pool, whose size only bounds the hedges in
+    flight.
+    The losing request is cancelled if it hasn't started, otherwise it is
+    left to finish in the background and its response dropped, as a request
+    through the sdk can't be interrupted.
+    """
+
+    def __init__(
+        self,
+        rate_limiter,
+        percentile=HEDGE_PERCENTILE,
+        initial_delay=INITIAL_HEDGE_DELAY,
+        min_delay=MIN_HEDGE_DELAY,
+        hedge_ratio=HEDGE_RATIO,
+        max_workers=HEDGE_WORKERS,
+    ):
+        self.rate_limiter = rate_limiter
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.hedge_ratio = hedge_ratio
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hedge"
+        )
+        self._lock = threading.Lock()
+        self._latencies = dict()
+        self._budget = 0.0
+        self.reads = 0
+        self.hedges = 0
+        self.hedges_won = 0
+
+    def delay(self, name):
+        """
+        Returns the seconds to wait before hedging a read of the name.
+        """
+        with self._lock:
+            latencies = sorted(self._latencies.get(name, ()))
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return self.initial_delay
+        index = min(len(latencies) - 1, len(latencies) * self.percentile // 100)
+        return max(self.min_delay, latencies[index])
+
+    def _record(self, name, latency):
+        with self._lock:
+            latencies = self._latencies.get(name)
+            if latencies is None:
+                latencies = self._latencies[name] = deque(maxlen=LATENCY_WINDOW)
+            latencies.append(latency)
+
+    def _take_hedge(self):
+        acquired, _ = self.rate_limiter.try_acquire()
+        if not acquired:
+            return False
+        with self._lock:
+            self.hedges += 1
+        return True
+
+    def _return_hedge(self):
+        with self._lock:
+            self._budget = min(MAX_HEDGE_BUDGET, self._budget + 1)
+
+    def call(self, name, fn, *args, **kwargs):
+        """
+        Calls fn with the args and kwargs, hedging it once after the delay
+        for the name where the hedge budget and rate limit allow.
+        """
+        self.rate_limiter.acquire()
+        with self._lock:
+            self.reads += 1
+            self._budget = min(MAX_HEDGE_BUDGET, self._budget + self.hedge_ratio)
+            reserved = self._budget >= 1
+            if reserved:
+                self._budget -= 1
+
+        start = time.monotonic()
+        if not reserved:
+            result = fn(*args, **kwargs)
+            self._record(name, time.monotonic() - start)
+            return result
+
+        primary = Future()
+        threading.Thread(
+            target=_run, args=(primary, fn, args, kwargs), daemon=True
+        ).start()
+        done, _ = wait([primary], timeout=self.delay(name))
+        if done or not self._take_hedge():
+            self._return_hedge()
+            result = primary.result()
+            self._record(name, time.monotonic() - start)
+            return result
+
+        hedge = self._executor.submit(fn, *args, **kwargs)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in (primary, hedge):
+                if future in done and future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    self._record(name, time.monotonic() - start)
+                    if future is hedge:
+                        with self._lock:
+                            self.hedges_won += 1
+                    return future.result()
+        # Both failed, so raise as the read would have without hedging
+        return primary.result()
+
+    def stats(self):
+        """
+        Returns the counts of reads, hedges sent and hedges that won, and the
+        current hedge delay for each name.
+        """
+        with self._lock:
+            stats = {
+                "reads": self.reads,
+                "hedges": self.hedges,
+                "hedges_won": self.hedges_won,
+            }
+            names = list(self._latencies)
+        stats["delays"] = {x: self.delay(x) for x in names}
+        return stats
@@ -1,18 +1,82 @@
+import queue
+import tempfile
+import threading
 import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from importlib.metadata import version
+from itertools import chain, islice
 from math import ceil
+from pathlib import Path
 
-import requests
 from hubspot import HubSpot
 from hubspot.auth.oauth import ApiException
+from hubspot.crm.associations import (
+    ApiException as AssociationsApiException,
+    BatchInputPublicAssociation,
+    BatchInputPublicObjectId,
+    PublicAssociation,
+    PublicObjectId,
+)
+from hubspot.crm.companies import ApiException as CompaniesApiException
 from hubspot.crm.contacts import (
+    ApiException as ContactsApiException,
+    BatchInputSimplePublicObjectBatchInput,
+    BatchInputSimplePublicObjectId,
+    BatchInputSimplePublicObjectInput,
+    BatchReadInputSimplePublicObjectId,
     Filter,
     FilterGroup,
     PublicGdprDeleteInput,
     PublicObjectSearchRequest,
+    SimplePublicObjectBatchInput,
+    SimplePublicObjectId,
     SimplePublicObjectInput,
 )
+from hubspot.crm.deals import ApiException as DealsApiException
 from requests.exceptions import HTTPError
 
+from hs_api.api.buffered_writer import FLUSH_INTERVAL, MAX_BATCH_SIZE, BufferedWriter
+from hs_api.api.cache import cache_scope, cached, invalidates
+from hs_api.api.coalescing import SingleFlight, coalesced
+from hs_api.api.contact_lists import ContactListCatalogue
+from hs_api.api.enrichment import enrich_tickets
+from hs_api.api.exports import (
+    EXPORT_PATH,
+    EXPORT_POLL_INTERVAL,
+    EXPORT_TIMEOUT,
+    MAX_EXPORT_POLL_INTERVAL,
+    download_rows,
+    export_batches,
+    export_request,
+    wait_for_export,
+)
+from hs_api.api.hedging import Hedger
+from hs_api.api.imports import (
+    ALTERNATE_ID_COLUMNS,
+    IMPORT_BATCH_THRESHOLD,
+    IMPORT_COLUMN_SAMPLE,
+    IMPORT_PATH,
+    IMPORT_POLL_INTERVAL,
+    IMPORT_TIMEOUT,
+    MAX_IMPORT_POLL_INTERVAL,
+    OBJECT_TYPE_IDS,
+    ImportResult,
+    ImportRowError,
+    import_counters,
+    import_errors,
+    import_request,
+    wait_for_import,
+    write_import_body,
+)
+from hs_api.api.prefetch import prefetch, prefetched, put_unless_stopped
+from hs_api.api.properties import PropertyRegistry
+from hs_api.api.property_history import HISTORY_PAGE_LIMIT, extract_property_history
+from hs_api.api.rate_limit import RATE_LIMIT, RateLimiter
+from hs_api.api.sharding import ShardLeases, merge_shards, plan_shards, run_shard_worker
+from hs_api.api.transport import HUBSPOT_API_URL, HttpTransport
+from hs_api.api.windows import DAY, TimeWindowPlanner, WindowCheckpoint
 from hs_api.settings.settings import HUBSPOT_ACCESS_TOKEN, HUBSPOT_PIPELINE_ID
 
 ASSOCIATION_TYPE_LOOKUP = {
@@ -26,8 +90,24 @@ ASSOCIATION_TYPE_LOOKUP = {
 
 BATCH_LIMITS = 50
 EMAIL_BATCH_LIMIT = 1000
+CONTACT_LIST_BATCH_LIMIT = 100
+# The largest pages hubspot returns, which adaptive page sizes can grow to
+PAGE_LIMIT = 100
+CONTACT_LIST_PAGE_LIMIT = 250
 RETRY_LIMIT = 3
+CONNECTION_POOL_SIZE = 32
+PURGE_WORKERS = 4
 RETRY_WAIT = 60
+# Seconds to wait for hubspot to auto associate a company to a new contact
+ASSOCIATION_WAIT = 10
+
+# Each crm api in the sdk raises its own ApiException class
+CRM_API_EXCEPTIONS = (
+    AssociationsApiException,
+    CompaniesApiException,
+    ContactsApiException,
+    DealsApiException,
+)
 
 
 def get_association_id(from_object_type, to_object_type):
@@ -36,12 +116,68 @@ def get_association_id(from_object_type, to_object_type):
 
 
 class HubSpotClient:
+    """
+    A client for the hubspot api, wrapping the hubspot sdk client.
+    A client is safe to share between threads, e.g. across a thread pool. The
+    sdk apis are built once and shared, pooling their connections, the raw
+    http requests use a session per thread and the caches held are locked.
+    """
+
     def __init__(
-        self, access_token=HUBSPOT_ACCESS_TOKEN, pipeline_id=HUBSPOT_PIPELINE_ID
+        self,
+        access_token=HUBSPOT_ACCESS_TOKEN,
+        pipeline_id=HUBSPOT_PIPELINE_ID,
+        json_backend=None,
+        contact_list_cache_path=None,
+        validate_properties=False,
+        coalesce_reads=False,
+        api_url=HUBSPOT_API_URL,
+        connection_pool_size=CONNECTION_POOL_SIZE,
+        rate_limit=RATE_LIMIT,
+        cache=None,
+        adaptive=None,
+        hedge_reads=False,
+        profiler=None,
     ):
         self._access_token = access_token
+        # Where given a Profiler, the time of each public method is split
+        # into network, decoding, model building, filtering and the rest
+        self._profiler = profiler
         self._pipeline_id = pipeline_id
+        self._api_url = api_url
+        self._connection_pool_size = connection_pool_size
+        self._apis = dict()
+        self._apis_lock = threading.Lock()
         self._client = self.init_client()
+        self._build_lookups()
+        # Shared by the bulk methods to keep their concurrent requests within
+        # hubspot's rate limit
+        self.rate_limiter = RateLimiter(max_requests=rate_limit)
+        self._transport = HttpTransport(
+            access_token, json_backend=json_backend, base_url=api_url, profiler=profiler
+        )
+        self._contact_list_cache_path = contact_list_cache_path
+        self._contact_list_catalogue = None
+        self._contact_list_catalogue_lock = threading.Lock()
+        # Properties given to the find_* methods are checked against those
+        # read through the properties api, which needs the schema scopes, where
+        # validate_properties
+        self._validate_properties = validate_properties
+        self.property_registry = PropertyRegistry(self)
+        # Identical concurrent reads share one request where coalesce_reads
+        self._single_flight = SingleFlight() if coalesce_reads else None
+        # Reads are served from the cache, a ResponseCache, where given, and
+        # writes through the client invalidate what they affect
+        self._response_cache = cache
+        self._cache_scope = cache_scope(access_token, api_url, pipeline_id)
+        # Page sizes and concurrency adapt to hubspot's responses where given
+        # an AIMDController, otherwise they are fixed
+        self._adaptive = adaptive
+        # Slow idempotent reads are duplicated, within the rate limit, where
+        # hedge_reads
+        self._hedger = Hedger(self.rate_limiter) if hedge_reads else None
+        if profiler is not None:
+            profiler.instrument(self)
 
     @property
     def pipeline_id(self):
@@ -50,46 +186,170 @@ class HubSpotClient:
         return self._pipeline_id
 
     def init_client(self):
-        return HubSpot(access_token=self._access_token)
+        return HubSpot(access_token=self._access_token, api_factory=self._api_factory)
+
+    def _api_factory(self, api_client_package, api_name, config):
+        """
+        Builds each sdk api once and then shares it, where the sdk would
+        otherwise build a new api, with a new connection pool, every time one
+        is accessed. The apis are safe to share between threads as they hold
+        no state between requests and their urllib3 connection pools are
+        thread safe.
+        """
+        key = (api_client_package.__name__, api_name)
+        with self._apis_lock:
+            api = self._apis.get(key)
+            if api is None:
+                configuration = api_client_package.Configuration(host=self._api_url)
+                configuration.access_token = config.get("access_token")
+                if "retry" in config:
+                    configuration.retries = config["retry"]
+                # Allow as many pooled connections as threads likely to share
+                # the client, rather than the sdk default based on cpu count
+                configuration.connection_pool_maxsize = self._connection_pool_size
+
+                api_client = api_client_package.ApiClient(configuration=configuration)
+                api_client.user_agent = (
+                    f"hubspot-api-client-python; {version('hubspot-api-client')}"
+                )
+                if self._profiler is not None:
+                    self._profiler.instrument_api_client(api_client)
+                api = getattr(api_client_package, api_name)(api_client=api_client)
+                self._apis[key] = api
+            return api
+
+    @property
+    def transport_stats(self):
+        """
+        Returns the counts of requests, bytes and time spent on the network
+        and decoding json for the raw http (v1 api) requests made so far.
+        """
+        return self._transport.stats.as_dict()
+
+    @property
+    def adaptive_metrics(self):
+        """
+        Returns the page sizes and concurrency chosen by the adaptive
+        controller, and its recent decisions, or None without one.
+        """
+        if self._adaptive is None:
+            return None
+        return self._adaptive.metrics()
+
+    @property
+    def hedge_stats(self):
+        """
+        Returns the counts of reads, hedges sent and hedges won, and the
+        current hedge delays, or None where reads aren't hedged.
+        """
+        if self._hedger is None:
+            return None
+        return self._hedger.stats()
+
+    def _hedged(self, name, fn, *args, **kwargs):
+        """
+        Calls fn, an idempotent read, hedging it where hedge_reads. Hedged
+        reads wait on the rate_limiter, so hedges only use the room left
+        within the rate limit.
+        """
+        if self._hedger is None:
+            return fn(*args, **kwargs)
+        return self._hedger.call(name, fn, *args, **kwargs)
+
+    def _page_size(self, name, default, maximum):
+        if self._adaptive is None:
+            return default
+        return self._adaptive.page_size(name, default, maximum)
+
+    def _request(self, name):
+        if self._adaptive is None:
+            return nullcontext()
+        return self._adaptive.request(name)
+
+    def _phase(self, name):
+        if self._profiler is None:
+            return nullcontext()
+        return self._profiler.phase(name)
+
+    def _adaptive_chunks(
+        self, name, iterable, default=BATCH_LIMITS, maximum=MAX_BATCH_SIZE
+    ):
+        """
+        Yields the items of the iterable in lists of default items, or of the
+        size chosen by the adaptive controller where there is one.
+        """
+        iterator = iter(iterable)
+        while True:
+            chunk = list(islice(iterator, self._page_size(name, default, maximum)))
+            if not chunk:
+                break
+            yield chunk
 
     @property
+    @cached("pipeline")
+    @coalesced
     def pipeline_stages(self):
         results = self._client.crm.pipelines.pipeline_stages_api.get_all(
             "deals", self.pipeline_id
         ).results
         return sorted(results, key=lambda x: x.display_order)
 
+    def _build_lookups(self):
+        crm = self._client.crm
+        self._create_lookup = {
+            "contact": crm.contacts.basic_api.create,
+            "company": crm.companies.basic_api.create,
+            "deal": crm.deals.basic_api.create,
+        }
+        self._search_lookup = {
+            "contact": crm.contacts.search_api.do_search,
+            "company": crm.companies.search_api.do_search,
+            "deal": crm.deals.search_api.do_search,
+            "ticket": crm.tickets.search_api.do_search,
+        }
+        self._associations_lookup = {
+            "contact": crm.contacts.associations_api,
+            "company": crm.companies.associations_api,
+            "deal": crm.deals.associations_api,
+        }
+        self._update_lookup = {
+            "contact": crm.contacts.basic_api.update,
+            "company": crm.companies.basic_api.update,
+            "deal": crm.deals.basic_api.update,
+        }
+        self._archive_lookup = {
+            "contact": crm.contacts.basic_api.archive,
+            "company": crm.companies.basic_api.archive,
+            "deal": crm.deals.basic_api.archive,
+        }
+        self._batch_lookup = {
+            "contact": crm.contacts.batch_api,
+            "company": crm.companies.batch_api,
+            "deal": crm.deals.batch_api,
+        }
+
     @property
     def create_lookup(self):
-        return {
-            "contact": self._client.crm.contacts.basic_api.create,
-            "company": self._client.crm.companies.basic_api.create,
-            "deal": self._client.crm.deals.basic_api.create,
-        }
+        return self._create_lookup
 
     @property
     def search_lookup(self):
-        return {
-            "contact": self._client.crm.contacts.search_api.do_search,
-            "company": self._client.crm.companies.search_api.do_search,
-        }
+        return self._search_lookup
 
     @property
     def associations_lookup(self):
-        return {
-            "contact": self._client.crm.contacts.associations_api,
-            "company": self._client.crm.companies.associations_api,
-            "deal": self._client.crm.deals.associations_api,
-        }
+        return self._associations_lookup
 
     @property
     def update_lookup(self):
-        return {
-            "contact": self._client.crm.contacts.basic_api.update,
-            "company": self._client.crm.companies.basic_api.update,
-            "deal": self._client.crm.deals.basic_api.update,
-        }
+        return self._update_lookup
 
+    @property
+    def batch_lookup(self):
+        return self._batch_lookup
+
+    @cached("pipeline")
+    @coalesced
     def pipeline_details(self, pipeline_id=None, return_all_pipelines=False):
         """
         Returns a list of details of pipelines. Where a pipeline_id is provided,
@@ -113,7 +373,21 @@ class HubSpotClient:
             pipelines = [x for x in pipelines if x.id == pipeline_id]
         return pipelines
 
-    def _find(self, object_name, property_name, value, sort):
+    def _resolve_properties(self, object_name, properties=None, projection=None):
+        """
+        Returns the properties to request for the object, either the given
+        properties, checked against the property_registry where
+        validate_properties is set, or those of the named projection.
+        """
+        if projection is not None:
+            if properties is not None:
+                raise ValueError("Only one of properties or projection can be given")
+            return self.property_registry.projection(projection, object_name)
+        if properties is not None and self._validate_properties:
+            self.property_registry.validate(object_name, properties)
+        return properties
+
+    def _find(self, object_name, property_name, value, sort, properties=None):
         query = Filter(property_name=property_name, operator="EQ", value=value)
         filter_groups = [FilterGroup(filters=[query])]
 
@@ -121,13 +395,17 @@ class HubSpotClient:
             limit=20,
             filter_groups=filter_groups,
             sorts=sort,
+            properties=properties,
         )
 
-        response = self.search_lookup[object_name](
+        response = self._hedged(
+            f"{object_name}_search",
+            self.search_lookup[object_name],
             public_object_search_request=public_object_search_request,
         )
         return response
 
+    @invalidates("association", object_name=True)
     def _create(self, object_name, properties):
         try:
             simple_public_object_input = SimplePublicObjectInput(properties=properties)
@@ -139,6 +417,7 @@ class HubSpotClient:
         except ApiException as e:
             print(f"Exception when creating {object_name}: {e}\n")
 
+    @invalidates(object_name=True)
     def _update(self, object_name, object_id, properties):
         try:
             simple_public_object_input = SimplePublicObjectInput(properties=properties)
@@ -150,21 +429,198 @@ class HubSpotClient:
         except ApiException as e:
             print(f"Exception when updating {object_name}: {e}\n")
 
-    def find_contact(self, property_name, value):
+    def _batch_or_each(
+        self, object_name, action, batch_call, single_call, items, on_error=None
+    ):
+        """
+        Calls batch_call with all the items, falling back to calling
+        single_call for each item if the batch fails, as hubspot fails the
+        whole batch when any one of its inputs fails. Items that fail on their
+        own are left out of the returned results, and passed to on_error along
+        with the exception if given.
+        """
+        try:
+            return batch_call(items)
+        except CRM_API_EXCEPTIONS:
+            results = []
+            for item in items:
+                try:
+                    results.append(single_call(item))
+                except CRM_API_EXCEPTIONS as e:
+                    if on_error is None:
+                        print(f"Exception when {action} {object_name}: {e}\n")
+                    else:
+                        on_error(item, e)
+            return results
+
+    @invalidates("association", object_name=True)
+    def _batch_create(self, object_name, properties_list, on_error=None):
+        def batch_call(items):
+            batch_input = BatchInputSimplePublicObjectInput(
+                inputs=[SimplePublicObjectInput(properties=x) for x in items]
+            )
+            with self._request("batch_create"):
+                return (
+                    self.batch_lookup[object_name]
+                    .create(batch_input_simple_public_object_input=batch_input)
+                    .results
+                )
+
+        def single_call(item):
+            return self.create_lookup[object_name](
+                simple_public_object_input=SimplePublicObjectInput(properties=item)
+            )
+
+        return self._batch_or_each(
+            object_name,
+            "creating",
+            batch_call,
+            single_call,
+            properties_list,
+            on_error=on_error,
+        )
+
+    @invalidates(object_name=True)
+    def _batch_update(self, object_name, updates, on_error=None):
+        """
+        Updates the objects in the updates dict of object id to properties.
+        """
+
+        def batch_call(items):
+            batch_input = BatchInputSimplePublicObjectBatchInput(
+                inputs=[
+                    SimplePublicObjectBatchInput(id=x, properties=updates[x])
+                    for x in items
+                ]
+            )
+            with self._request("batch_update"):
+                return (
+                    self.batch_lookup[object_name]
+                    .update(batch_input_simple_public_object_batch_input=batch_input)
+                    .results
+                )
+
+        def single_call(item):
+            return self.update_lookup[object_name](
+                item,
+                simple_public_object_input=SimplePublicObjectInput(
+                    properties=updates[item]
+                ),
+            )
+
+        return self._batch_or_each(
+            object_name,
+            "updating",
+            batch_call,
+            single_call,
+            list(updates),
+            on_error=on_error,
+        )
+
+    @invalidates("association", object_name=True)
+    def _batch_archive(self, object_name, object_ids):
+        """
+        Archives the objects in batches, returning a dict of each object id to
+        True where it was archived, otherwise the exception raised for it.
+        """
+        results = dict()
+
+        def batch_call(items):
+            self.rate_limiter.acquire()
+            batch_input = BatchInputSimplePublicObjectId(
+                inputs=[SimplePublicObjectId(id=x) for x in items]
+            )
+            with self._request("batch_archive"):
+                self.batch_lookup[object_name].archive(
+                    batch_input_simple_public_object_id=batch_input
+                )
+            return items
+
+        def single_call(item):
+            self.rate_limiter.acquire()
+            self._archive_lookup[object_name](item)
+            return item
+
+        def on_error(item, e):
+            results[item] = e
+
+        for chunk in self._adaptive_chunks("batch_archive", object_ids):
+            archived = self._batch_or_each(
+                object_name, "deleting", batch_call, single_call, chunk, on_error
+            )
+            results.update((x, True) for x in archived)
+        return results
+
+    def _batch_read(self, object_name, object_ids, properties=None):
+        batch_input = BatchReadInputSimplePublicObjectId(
+            properties=properties or [],
+            inputs=[SimplePublicObjectId(id=x) for x in object_ids],
+        )
+        with self._request("batch_read"):
+            response = self.batch_lookup[object_name].read(
+                batch_read_input_simple_public_object_id=batch_input
+            )
+        return response.results
+
+    def _batch_read_associations(self, from_object_type, to_object_type, object_ids):
+        """
+        Returns a dict of each of the given object ids to the list of ids of
+        the objects of to_object_type associated with it. Object ids without
+        any associations are left out.
+        """
+        response = self._client.crm.associations.batch_api.read(
+            from_object_type,
+            to_object_type,
+            batch_input_public_object_id=BatchInputPublicObjectId(
+                inputs=[PublicObjectId(id=x) for x in object_ids]
+            ),
+        )
+        return {x._from.id: [to.id for to in x.to] for x in response.results}
+
+    @invalidates("association")
+    def _batch_create_associations(self, from_object_type, to_object_type, id_pairs):
+        batch_input = BatchInputPublicAssociation(
+            inputs=[
+                PublicAssociation(
+                    _from=PublicObjectId(id=from_object_id),
+                    to=PublicObjectId(id=to_object_id),
+                    type=f"{from_object_type}_to_{to_object_type}",
+                )
+                for from_object_id, to_object_id in id_pairs
+            ]
+        )
+        response = self._client.crm.associations.batch_api.create(
+            from_object_type,
+            to_object_type,
+            batch_input_public_association=batch_input,
+        )
+        return response.results
+
+    @cached("contact")
+    @coalesced
+    def find_contact(self, property_name, value, properties=None, projection=None):
+        properties = self._resolve_properties("contact", properties, projection)
 
         sort = [{"propertyName": "hs_object_id", "direction": "ASCENDING"}]
 
-        response = self._find("contact", property_name, value, sort)
+        response = self._find("contact", property_name, value, sort, properties)
         return response.results
 
-    def find_company(self, property_name, value):
+    @cached("company")
+    @coalesced
+    def find_company(self, property_name, value, properties=None, projection=None):
+        properties = self._resolve_properties("company", properties, projection)
 
         sort = [{"propertyName": "hs_lastmodifieddate", "direction": "DESCENDING"}]
 
-        response = self._find("company", property_name, value, sort)
+        response = self._find("company", property_name, value, sort, properties)
         return response.results
 
-    def find_deal(self, property_name, value):
+    @cached("deal")
+    @coalesced
+    def find_deal(self, property_name, value, properties=None, projection=None):
+        properties = self._resolve_properties("deal", properties, projection)
+
         pipeline_filter = Filter(
             property_name="pipeline", operator="EQ", value=self.pipeline_id
         )
@@ -175,9 +631,12 @@ class HubSpotClient:
             limit=20,
             filter_groups=filter_groups,
             sorts=None,
+            properties=properties,
         )
 
-        response = self._client.crm.deals.search_api.do_search(
+        response = self._hedged(
+            "deal_search",
+            self._client.crm.deals.search_api.do_search,
             public_object_search_request=public_object_search_request,
         )
         return response.results
@@ -196,6 +655,8 @@ class HubSpotClient:
         response = self._client.crm.owners.owners_api.get_by_id(owner_id=owner_id)
         return response
 
+    @cached("owner")
+    @coalesced
     def find_owner(self, property_name, value):
         if property_name not in ("id", "email"):
             raise NameError(
@@ -207,6 +668,7 @@ class HubSpotClient:
         if property_name == "email":
             return self._find_owner_by_email(email=value)
 
+    @prefetched
     def find_all_email_events(self, filter_name=None, filter_value=None):
         """
         Finds and returns all email events, using the filter name and value as the
@@ -222,25 +684,31 @@ class HubSpotClient:
         https://developers.hubspot.com/docs/api/events/email-analytics.
         Once this is released we can transition over to using that.
         """
+        params = dict()
+        if filter_name:
+            params[filter_name] = filter_value
+
+        yield from self._email_event_pages(params)
+
+    def _email_event_pages(self, params, stop_event=None):
+        """
+        Yields the batches of email events for the given params, following
+        the offset of each batch onto the next until there are no more.
+        Stops early if the stop_event is set.
+        """
         retry = 0
         offset = None
-        while True:
+        while stop_event is None or not stop_event.is_set():
             try:
-                params = {
-                    "limit": EMAIL_BATCH_LIMIT,
-                    "offset": offset,
-                }
-                if filter_name:
-                    params[filter_name] = filter_value
-
-                response = requests.get(
-                    "https://api.hubapi.com/email/public/v1/events",
-                    headers={"Authorization": f"Bearer {self._access_token}"},
-                    params=params,
+                limit = self._page_size(
+                    "email_events", EMAIL_BATCH_LIMIT, EMAIL_BATCH_LIMIT
                 )
-                response.raise_for_status()
+                params = dict(params, limit=limit, offset=offset)
 
-                response_json = response.json()
+                with self._request("email_events"):
+                    response_json = self._transport.get_json(
+                        "/email/public/v1/events", params=params
+                    )
 
                 yield response_json.get("events", [])
 
@@ -260,8 +728,123 @@ class HubSpotClient:
                 else:
                     raise e
 
+    def find_all_email_events_parallel(
+        self,
+        start_timestamp=None,
+        end_timestamp=None,
+        workers=4,
+        window_size=DAY,
+        checkpoint_path=None,
+        progress_callback=None,
+    ):
+        """
+        Finds and returns all email events between the start and end
+        timestamps (datetimes), defaulting to 0 epoch and now, in batches like
+        find_all_email_events.
+        Rather than following one offset over the whole range, the range is
+        split into time windows that are fetched concurrently by the given
+        number of workers, each following its own offset, and the batches are
+        returned as they arrive so are not in time order across windows.
+        Windows start at window_size milliseconds and are resized according to
+        the density of events found in completed windows.
+        Where a checkpoint_path is given, each completed window is recorded to
+        that file and windows already recorded there are skipped, so an
+        interrupted extraction can be resumed. A window is only recorded once
+        all its batches have been returned.
+        Where a progress_callback is given, it is called with the window
+        (start, end) and its number of events as each window completes.
+        """
+        start = convert_date_to_epoch(start_timestamp)
+        end = (
+            convert_date_to_epoch(end_timestamp)
+            if end_timestamp
+            else int(time.time() * 1000)
+        )
+
+        checkpoint = WindowCheckpoint(checkpoint_path)
+        planner = TimeWindowPlanner(
+            start, end, window_size=window_size, completed=checkpoint.completed
+        )
+        for kind, window, payload in self._email_event_windows(
+            planner, checkpoint, workers
+        ):
+            if kind == "error":
+                raise payload
+            if kind == "events":
+                if payload:
+                    yield payload
+            elif progress_callback:
+                progress_callback(window, payload)
+
+    def _email_event_windows(self, planner, checkpoint, workers):
+        """
+        Fetches the email events of the planner's windows, the given number of
+        windows at a time, yielding ("events", window, events) for each batch
+        as it arrives and then ("done", window, event_count) once all of the
+        window's batches have been, or ("error", window, exception) where
+        fetching the window failed.
+        A window is completed in the planner and recorded in the checkpoint
+        once the caller is done with its "done", so after it has handled all
+        its batches. Failed windows aren't recorded, so are fetched again when
+        the extraction is resumed.
+        """
+        stop_event = threading.Event()
+        batches = queue.Queue(maxsize=workers * 2)
+
+        def put(item):
+            put_unless_stopped(batches, item, stop_event)
+
+        def fetch_window(window):
+            try:
+                event_count = 0
+                # The email events api end timestamp is inclusive
+                params = {"startTimestamp": window[0], "endTimestamp": window[1] - 1}
+                for events in self._email_event_pages(params, stop_event):
+                    event_count += len(events)
+                    put(("events", window, events))
+                put(("done", window, event_count))
+            except Exception as e:
+                put(("error", window, e))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            in_flight = 0
+
+            def submit_next_window():
+                window = planner.next_window()
+                if window is None:
+                    return 0
+                executor.submit(fetch_window, window)
+                return 1
+
+            try:
+                for _ in range(workers):
+                    in_flight += submit_next_window()
+
+                while in_flight:
+                    item = batches.get()
+                    yield item
+                    kind, window, payload = item
+                    if kind == "events":
+                        continue
+
+                    # The window's batches are queued before it is done so
+                    # they have all been handled by now
+                    in_flight -= 1
+                    if kind == "done":
+                        planner.complete(window, payload)
+                        checkpoint.mark_complete(window)
+                    in_flight += submit_next_window()
+            finally:
+                stop_event.set()
+
+    @prefetched
     def find_all_tickets(
-        self, filter_name=None, filter_value=None, properties=None, pipeline_id=None
+        self,
+        filter_name=None,
+        filter_value=None,
+        properties=None,
+        pipeline_id=None,
+        projection=None,
     ):
         """
         Finds and returns all tickets, using the filter name and value as the
@@ -275,7 +858,11 @@ class HubSpotClient:
         return the given properties, where they exist as properties.
         If a pipeline_id is given, this will be used to filter tickets specific to
         that pipeline, otherwise it returns tickets from all pipelines.
+        A projection registered on the property_registry can be given by name
+        instead of the properties.
         """
+        properties = self._resolve_properties("ticket", properties, projection)
+
         if filter_name is None and filter_value is None:
             filter_name = "hs_lastmodifieddate"
 
@@ -302,15 +889,18 @@ class HubSpotClient:
             filter_groups = [FilterGroup(filters=filters)]
 
             public_object_search_request = PublicObjectSearchRequest(
-                limit=BATCH_LIMITS,
+                limit=self._page_size("ticket_search", BATCH_LIMITS, PAGE_LIMIT),
                 filter_groups=filter_groups,
                 sorts=[{"propertyName": filter_name, "direction": "ASCENDING"}],
                 properties=properties,
                 after=after,
             )
-            response = self._client.crm.tickets.search_api.do_search(
-                public_object_search_request=public_object_search_request
-            )
+            with self._request("ticket_search"):
+                response = self._hedged(
+                    "ticket_search",
+                    self._client.crm.tickets.search_api.do_search,
+                    public_object_search_request=public_object_search_request,
+                )
             yield response.results
 
             # Update after to page onto next batch if there is next otherwise break as
@@ -320,6 +910,61 @@ class HubSpotClient:
             else:
                 after = None
 
+    @prefetched
+    def find_all_tickets_enriched(
+        self,
+        filter_name=None,
+        filter_value=None,
+        properties=None,
+        pipeline_id=None,
+        projection=None,
+        contact_properties=None,
+        company_properties=None,
+    ):
+        """
+        Like find_all_tickets, but yields batches of EnrichedTickets holding
+        the contacts and companies associated with each ticket, with their
+        contact_properties and company_properties (or the default properties
+        if None are given).
+        The associations and associated objects of each page of tickets are
+        read with a batch request per object type, rather than a request per
+        ticket, so each page takes a few extra requests however many tickets
+        it holds.
+        """
+        enrich_properties = {
+            "contact": self._resolve_properties("contact", contact_properties),
+            "company": self._resolve_properties("company", company_properties),
+        }
+        for tickets in self.find_all_tickets(
+            filter_name=filter_name,
+            filter_value=filter_value,
+            properties=properties,
+            pipeline_id=pipeline_id,
+            projection=projection,
+        ):
+            if not tickets:
+                continue
+            ticket_ids = [x.id for x in tickets]
+            associations = dict()
+            objects = dict()
+            for object_type, object_properties in enrich_properties.items():
+                with self._request("batch_read_associations"):
+                    associations[object_type] = self._batch_read_associations(
+                        "ticket", object_type, ticket_ids
+                    )
+                object_ids = list(
+                    dict.fromkeys(
+                        x for ids in associations[object_type].values() for x in ids
+                    )
+                )
+                objects[object_type] = dict()
+                for chunk in self._adaptive_chunks(
+                    "batch_read", object_ids, PAGE_LIMIT, PAGE_LIMIT
+                ):
+                    for x in self._batch_read(object_type, chunk, object_properties):
+                        objects[object_type][x.id] = x
+            yield enrich_tickets(tickets, associations, objects)
+
     def find_all_contacts_in_list(self, contact_list_id: str) -> object:
         """
         This function will return all contacts in a contact list.
@@ -336,23 +981,22 @@ class HubSpotClient:
         vid_offset = 0
 
         # Lookup the contact list an get the size of the list
-        list_size = requests.get(
-            f"https://api.hubapi.com/contacts/v1/lists/{contact_list_id}",
-            headers={"Authorization": f"Bearer {self._client.access_token}"},
-        ).json()["metaData"]["size"]
+        list_size = self._transport.get_json(f"/contacts/v1/lists/{contact_list_id}")[
+            "metaData"
+        ]["size"]
 
         batches = ceil(list_size / limit)
 
         # go through each batch and add to the array
         for i in range(batches):
-            response = requests.get(
-                f"https://api.hubapi.com/contacts/v1/lists/{contact_list_id}/contacts/all?count={limit}&vidOffset={vid_offset}",  # noqa
-                headers={"Authorization": f"Bearer {self._client.access_token}"},
+            response_json = self._transport.get_json(
+                f"/contacts/v1/lists/{contact_list_id}/contacts/all",
+                params={"count": limit, "vidOffset": vid_offset},
             )
 
-            vid_offset = response.json()["vid-offset"]
+            vid_offset = response_json["vid-offset"]
 
-            json_data = response.json()["contacts"]
+            json_data = response_json["contacts"]
 
             # The list_id is not included in the response so we need to add this to the json_data for each line
             for contact in json_data:
@@ -369,38 +1013,64 @@ class HubSpotClient:
         # return the json object
         return all_contacts
 
-    def find_all_contact_lists(self) -> object:
+    def find_all_contact_lists(self, read_ahead=0) -> object:
         """
         This function will return all contact lists from hubspot
         No additional parameters are required as this returns all lists
         We use a while loop to build up the list as there is a hard limit of 100 results per page
+        Where read_ahead is given, up to that many pages are fetched ahead in
+        the background
         """
-        offset = 0
-        limit = 100
         all_lists = []
+        for contact_lists in prefetch(self._contact_list_pages(), read_ahead):
+            all_lists.extend(contact_lists)
 
-        # initially I thought it was possible to get the number of lists from an initial request
-        response = requests.get(
-            "https://api.hubapi.com/contacts/v1/lists",
-            params={"count": 0},
-            headers={"Authorization": f"Bearer {self._client.access_token}"},
-        )
-        json_data = response.json()
-        all_lists = json_data["lists"]
-
-        # Where offset appears in the json rsponse and where has-more is equal to true, make requests and add
-        # The response to the array to build up the json object
-        while "offset" in json_data and json_data["has-more"]:
-            offset = json_data["offset"]
-            response = requests.get(
-                f"https://api.hubapi.com/contacts/v1/lists?count={limit}&offset={offset}",
-                headers={"Authorization": f"Bearer {self._client.access_token}"},
+        return all_lists
+
+    def _contact_list_pages(self):
+        """
+        Yields the pages of contact lists, following the offset of each page
+        onto the next until there are no more.
+        """
+        params = dict()
+        while True:
+            params["count"] = self._page_size(
+                "contact_lists", CONTACT_LIST_BATCH_LIMIT, CONTACT_LIST_PAGE_LIMIT
             )
-            json_data = response.json()
-            all_lists.extend(json_data["lists"])
+            with self._request("contact_lists"):
+                json_data = self._transport.get_json(
+                    "/contacts/v1/lists", params=params
+                )
+            yield json_data["lists"]
 
-        return all_lists
+            if not ("offset" in json_data and json_data["has-more"]):
+                break
+            params = {"offset": json_data["offset"]}
 
+    @property
+    def contact_list_catalogue(self):
+        with self._contact_list_catalogue_lock:
+            if self._contact_list_catalogue is None:
+                self._contact_list_catalogue = ContactListCatalogue(
+                    self, cache_path=self._contact_list_cache_path
+                )
+            return self._contact_list_catalogue
+
+    def find_contact_list(self, list_id=None, name=None):
+        """
+        Returns the contact list with the given id or name, or None if there is
+        no such list.
+        Lists are looked up from the contact_list_catalogue, which is only
+        refreshed from hubspot when it is older than its max_age, rather than
+        downloading all the lists on every call.
+        """
+        if (list_id is None) == (name is None):
+            raise ValueError("Exactly one of list_id or name must be given")
+        if list_id is not None:
+            return self.contact_list_catalogue.get(list_id)
+        return self.contact_list_catalogue.find_by_name(name)
+
+    @prefetched
     def find_all_deals(
         self,
         filter_name=None,
@@ -409,6 +1079,8 @@ class HubSpotClient:
         pipeline_id=None,
         properties_with_history=None,
         archived_only=False,
+        association_index=None,
+        projection=None,
     ):
         """
         Finds and returns all deals, using the filter name and value as the
@@ -422,7 +1094,21 @@ class HubSpotClient:
         return the given properties, where they exist as properties.
         If a pipeline_id is given, this will be used to filter deals specific to
         that pipeline, otherwise it returns deals from all pipelines.
+        If an association_index is given, the contact and company associations
+        of every deal paged through are added to it along the way.
+        A projection registered on the property_registry can be given by name
+        instead of the properties.
         """
+        properties = self._resolve_properties("deal", properties, projection)
+        if properties_with_history is not None and self._validate_properties:
+            self.property_registry.validate("deal", properties_with_history)
+        # Hubspot returns smaller pages where history is asked for, so those
+        # pages are sized separately
+        if properties_with_history is None:
+            page_name, max_page_size = "deal_page", PAGE_LIMIT
+        else:
+            page_name, max_page_size = "deal_history_page", HISTORY_PAGE_LIMIT
+
         if filter_name is None and filter_value is None:
             filter_name = "id"
             filter_value = "0"
@@ -432,24 +1118,34 @@ class HubSpotClient:
             if after == 0:
                 after = None
 
-            response = self._client.crm.deals.basic_api.get_page(
-                limit=BATCH_LIMITS,
-                properties=properties,
-                properties_with_history=properties_with_history,
-                associations=["contacts", "companies"],
-                after=after,
-                archived=archived_only,
-            )
+            with self._request(page_name):
+                response = self._hedged(
+                    page_name,
+                    self._client.crm.deals.basic_api.get_page,
+                    limit=self._page_size(page_name, BATCH_LIMITS, max_page_size),
+                    properties=properties,
+                    properties_with_history=properties_with_history,
+                    associations=["contacts", "companies"],
+                    after=after,
+                    archived=archived_only,
+                )
 
             results = response.results
 
+            if association_index is not None:
+                association_index.add_objects("deal", results)
+
             # Filter records on filter name/value and pipeline id if provided
-            results = [
-                x
-                for x in results
-                if getattr(x, filter_name) > filter_value
-                and (x.properties.get("pipeline") == pipeline_id or pipeline_id is None)
-            ]
+            with self._phase("filter"):
+                results = [
+                    x
+                    for x in results
+                    if getattr(x, filter_name) > filter_value
+                    and (
+                        x.properties.get("pipeline") == pipeline_id
+                        or pipeline_id is None
+                    )
+                ]
 
             if results:
                 yield results
@@ -461,6 +1157,259 @@ class HubSpotClient:
             else:
                 after = None
 
+    def deal_property_history(
+        self, properties_with_history, since=None, archived_only=False
+    ):
+        """
+        Yields a PropertyHistoryRow of (deal_id, property, value, timestamp,
+        source) for each change to the properties_with_history of every deal,
+        streamed from the raw json a page at a time rather than building the
+        pages of deals with history that find_all_deals does.
+        Where since, a timezone aware datetime, is given only changes after it
+        are yielded. The rows can be written straight to parquet with
+        write_parquet.
+        """
+        if self._validate_properties:
+            self.property_registry.validate("deal", properties_with_history)
+        return extract_property_history(
+            self._transport,
+            properties_with_history,
+            since=since,
+            archived_only=archived_only,
+            page_size=lambda: self._page_size(
+                "deal_history_page", HISTORY_PAGE_LIMIT, HISTORY_PAGE_LIMIT
+            ),
+            request=lambda: self._request("deal_history_page"),
+        )
+
+    def start_export(
+        self,
+        object_type,
+        properties=None,
+        projection=None,
+        export_name=None,
+        list_id=None,
+    ):
+        """
+        Starts a hubspot export job of the properties (or projection) of all
+        objects of the object type, e.g. "deal", or of the contacts in the
+        contact list with list_id, returning the id of the export task.
+        Server side exports are much faster than paging through the api for
+        full snapshots of many objects.
+        """
+        properties = self._resolve_properties(object_type, properties, projection)
+        response = self._transport.post_json(
+            EXPORT_PATH,
+            export_request(
+                object_type, properties or [], export_name=export_name, list_id=list_id
+            ),
+        )
+        return response["id"]
+
+    def wait_export(
+        self,
+        task_id,
+        timeout=EXPORT_TIMEOUT,
+        poll_interval=EXPORT_POLL_INTERVAL,
+        max_poll_interval=MAX_EXPORT_POLL_INTERVAL,
+    ):
+        """
+        Waits for the export task to complete, polling its status with an
+        exponential backoff, returning the url to download it from. Raises a
+        RuntimeError if the export fails and a TimeoutError if it isn't
+        complete within timeout seconds.
+        """
+        status = wait_for_export(
+            self._transport, task_id, timeout, poll_interval, max_poll_interval
+        )
+        return status["result"]
+
+    def stream_export(
+        self,
+        object_type,
+        properties=None,
+        projection=None,
+        list_id=None,
+        batch_size=BATCH_LIMITS,
+        **wait_kwargs,
+    ):
+        """
+        Exports the objects with start_export, waits for the export with
+        wait_export (passing on any wait_kwargs) and yields the exported
+        objects in batches of batch_size SimplePublicObjects, like the
+        find_all_* methods, parsed as the export is downloaded so the export
+        is never held in memory.
+        Property values are strings as they are in the api's responses, with
+        empty values as None.
+        """
+        task_id = self.start_export(
+            object_type, properties=properties, projection=projection, list_id=list_id
+        )
+        url = self.wait_export(task_id, **wait_kwargs)
+        yield from export_batches(download_rows(self._transport, url), batch_size)
+
+    @invalidates("association", object_name=True)
+    def bulk_import(
+        self,
+        object_name,
+        records,
+        properties=None,
+        name=None,
+        batch_threshold=None,
+        timeout=IMPORT_TIMEOUT,
+        poll_interval=IMPORT_POLL_INTERVAL,
+        max_poll_interval=MAX_IMPORT_POLL_INTERVAL,
+        progress_callback=None,
+    ):
+        """
+        Creates (or, for contacts by email and companies by domain, updates)
+        objects of the object type from records, an iterable of property
+        dicts, returning an ImportResult with the errors of any rows that
+        failed as ImportRowErrors.
+        The records go through a hubspot import job, being streamed to a csv
+        file on disk rather than held in memory, and the job polled until it
+        is done, passing its state and counters to progress_callback if given.
+        The columns are the given properties, otherwise those of the first
+        IMPORT_COLUMN_SAMPLE records, and later records with other properties
+        raise a ValueError.
+        Loads of fewer than batch_threshold records skip the import job and
+        are created through the batch api instead, which is quicker for small
+        loads. The batch api only creates, so for contacts and companies,
+        those that already exist are duplicated or fail rather than being
+        updated, and there's no threshold unless one is given. For deals,
+        which imports only create too, it defaults to IMPORT_BATCH_THRESHOLD.
+        """
+        if object_name not in OBJECT_TYPE_IDS:
+            raise ValueError(
+                f"'{object_name}' can't be imported. "
+                f"Must be one of {', '.join(OBJECT_TYPE_IDS)}."
+            )
+        if batch_threshold is None and object_name not in ALTERNATE_ID_COLUMNS:
+            batch_threshold = IMPORT_BATCH_THRESHOLD
+        records = iter(records)
+        head = list(islice(records, max(batch_threshold or 0, IMPORT_COLUMN_SAMPLE)))
+        if not head:
+            return ImportResult("DONE", 0, [])
+        if properties is None:
+            properties = list(dict.fromkeys(k for x in head for k in x))
+        if self._validate_properties:
+            self.property_registry.validate(object_name, properties)
+        if batch_threshold is not None and len(head) < batch_threshold:
+            return self._batch_import(object_name, properties, head)
+
+        request = import_request(object_name, properties, name=name)
+        with tempfile.TemporaryFile() as f:
+            boundary, row_count = write_import_body(
+                f, request, properties, chain(head, records)
+            )
+            f.seek(0)
+            response = self._transport.post_data(
+                IMPORT_PATH, f, f"multipart/form-data; boundary={boundary}"
+            )
+
+        status = wait_for_import(
+            self._transport,
+            response["id"],
+            timeout,
+            poll_interval,
+            max_poll_interval,
+            progress_callback,
+        )
+        return ImportResult(
+            status["state"],
+            row_count,
+            import_errors(self._transport, response["id"]),
+            import_id=response["id"],
+            counters=import_counters(status),
+        )
+
+    def _batch_import(self, object_name, properties, records):
+        unknown = {k for x in records for k in x} - set(properties)
+        if unknown:
+            raise ValueError(
+                f"Records have properties {sorted(unknown)} not in the "
+                f"properties {properties}."
+            )
+        # Line numbers as they would be in an import file, after its header
+        line_numbers = {id(x): i + 2 for i, x in enumerate(records)}
+        errors = []
+
+        def on_error(item, e):
+            errors.append(
+                ImportRowError(
+                    line_numbers[id(item)],
+                    e.reason,
+                    message=e.body,
+                )
+            )
+
+        created = []
+        for chunk in self._adaptive_chunks("batch_create", records, MAX_BATCH_SIZE):
+            created.extend(self._batch_create(object_name, chunk, on_error=on_error))
+        errors.sort(key=lambda x: x.line_number)
+        return ImportResult("DONE", len(records), errors, created=created)
+
+    def sharded_export(
+        self,
+        object_type,
+        output_dir,
+        shard_count=8,
+        workers=4,
+        properties=None,
+        projection=None,
+    ):
+        """
+        Exports all objects of the object type (e.g. "deal" or "contact") by
+        splitting the hs_object_id space into shard_count ranges with roughly
+        the same number of objects, exported by a pool of worker processes.
+        Shards are handed out through a lease file in output_dir, each shard
+        being written to its own file there. A shard whose worker crashed is
+        handed out again once its lease expires, and calling this again with
+        the same output_dir resumes an interrupted export, only exporting the
+        shards not yet done. Workers on other nodes can join in by calling
+        run_shard_worker on the same (shared) lease file. Each worker process
+        gets an even share of the client's rate limit, and retries searches
+        hubspot throttles.
+        Returns a generator of the exported objects, as dicts, merged in id
+        order.
+        """
+        properties = self._resolve_properties(object_type, properties, projection)
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        lease_path = output_dir / "leases.json"
+
+        leases = ShardLeases(lease_path)
+        if not lease_path.exists():
+            leases.create(plan_shards(self, object_type, shard_count))
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    run_shard_worker,
+                    lease_path,
+                    output_dir,
+                    object_type,
+                    properties,
+                    processes=workers,
+                    access_token=self._access_token,
+                    pipeline_id=self._pipeline_id,
+                    api_url=self._api_url,
+                    rate_limit=self.rate_limiter.max_requests,
+                )
+                for _ in range(workers)
+            ]
+            for future in futures:
+                future.result()
+
+        shards = leases.shards()
+        unfinished = [x["index"] for x in shards if x["status"] != "done"]
+        if unfinished:
+            raise RuntimeError(
+                f"Shards {unfinished} are still leased to other workers. "
+                f"Call again once their leases expire to resume the export."
+            )
+        return merge_shards(output_dir, shards)
+
     def create_contact(self, email, first_name, last_name, **properties):
         properties = dict(
             email=email, firstname=first_name, lastname=last_name, **properties
@@ -510,6 +1459,7 @@ class HubSpotClient:
             )
         return response
 
+    @invalidates("contact", "association")
     def delete_contact(self, value, property_name=None):
         try:
             public_gdpr_delete_input = PublicGdprDeleteInput(
@@ -523,6 +1473,7 @@ class HubSpotClient:
         except ApiException as e:
             print(f"Exception when deleting contact: {e}\n")
 
+    @invalidates("company", "association")
     def delete_company(self, company_id):
         try:
             api_response = self._client.crm.companies.basic_api.archive(company_id)
@@ -530,6 +1481,7 @@ class HubSpotClient:
         except ApiException as e:
             print(f"Exception when deleting company: {e}\n")
 
+    @invalidates("deal", "association")
     def delete_deal(self, deal_id):
         try:
             api_response = self._client.crm.deals.basic_api.archive(deal_id)
@@ -537,6 +1489,49 @@ class HubSpotClient:
         except ApiException as e:
             print(f"Exception when deleting deal: {e}\n")
 
+    def archive_companies(self, company_ids):
+        """
+        Archives the companies in batches, returning a dict of each company id
+        to True where it was archived, otherwise the exception raised for it.
+        """
+        return self._batch_archive("company", company_ids)
+
+    def archive_deals(self, deal_ids):
+        """
+        Archives the deals in batches, returning a dict of each deal id to
+        True where it was archived, otherwise the exception raised for it.
+        """
+        return self._batch_archive("deal", deal_ids)
+
+    @invalidates("contact", "association")
+    def purge_contacts(self, values, property_name=None, max_workers=PURGE_WORKERS):
+        """
+        Permanently deletes the contacts through the GDPR api, purging up to
+        max_workers contacts concurrently within the client's rate limit, as
+        there is no batch GDPR delete. Like delete_contact, the contacts are
+        identified by their id or, where given, the property_name (e.g.
+        "email").
+        Returns a dict of each value to True where it was purged, otherwise
+        the exception raised for it.
+        """
+
+        def purge(value):
+            self.rate_limiter.acquire()
+            try:
+                with self._request("gdpr_purge"):
+                    self._client.crm.contacts.gdpr_api.purge(
+                        public_gdpr_delete_input=PublicGdprDeleteInput(
+                            object_id=value, id_property=property_name
+                        )
+                    )
+                return True
+            except Exception as e:
+                return e
+
+        values = list(values)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(zip(values, executor.map(purge, values)))
+
     def update_company(self, object_id, **properties):
         response = self._update("company", object_id, properties)
         return response
@@ -545,24 +1540,49 @@ class HubSpotClient:
         response = self._update("contact", object_id, properties)
         return response
 
+    def buffered_writer(
+        self,
+        max_batch_size=MAX_BATCH_SIZE,
+        flush_interval=FLUSH_INTERVAL,
+        on_error=None,
+    ):
+        """
+        Returns a BufferedWriter that buffers updates made through it, merging
+        the properties of updates to the same object, and flushes them through
+        the batch update endpoints in the background.
+        """
+        return BufferedWriter(
+            self,
+            max_batch_size=max_batch_size,
+            flush_interval=flush_interval,
+            on_error=on_error,
+        )
+
+    @cached("association")
+    @coalesced
     def company_associations(self, company_id, associated_with_type):
         result = self.associations_lookup["company"].get_all(
             company_id=company_id, to_object_type=associated_with_type
         )
         return result.results
 
+    @cached("association")
+    @coalesced
     def contact_associations(self, contact_id, associated_with_type):
         result = self.associations_lookup["contact"].get_all(
             contact_id=contact_id, to_object_type=associated_with_type
         )
         return result.results
 
+    @cached("association")
+    @coalesced
     def deal_associations(self, deal_id, associated_with_type):
         result = self.associations_lookup["deal"].get_all(
             deal_id=deal_id, to_object_type=associated_with_type
         )
         return result.results
 
+    @invalidates("association")
     def create_association(
         self, from_object_type, from_object_id, to_object_type, to_object_id
     ):
@@ -574,6 +1594,25 @@ class HubSpotClient:
         )
         return result
 
+    def fill_association_index(
+        self, association_index, from_object_type, object_ids, to_object_type
+    ):
+        """
+        Tops up the association_index with the associations between the given
+        objects and objects of to_object_type, read in batches.
+        """
+        for chunk in self._adaptive_chunks("batch_read_associations", object_ids):
+            with self._request("batch_read_associations"):
+                associations = self._batch_read_associations(
+                    from_object_type, to_object_type, chunk
+                )
+            for from_object_id, to_object_ids in associations.items():
+                for to_object_id in to_object_ids:
+                    association_index.add(
+                        from_object_type, from_object_id, to_object_type, to_object_id
+                    )
+        return association_index
+
     def create_contact_and_company(
         self, email, first_name, last_name, company, **properties
     ):
@@ -608,6 +1647,113 @@ class HubSpotClient:
             )
         return output
 
+    def create_contacts_and_companies(self, signups):
+        """
+        Batch version of create_contact_and_company. Takes an iterable of
+        signups, each a dict of the create_contact_and_company arguments, and
+        returns a list of outputs in the same order, each the same as the
+        output of create_contact_and_company for that signup.
+        Rather than waiting on each signup in turn, the contacts are all created
+        in batches and a single wait is made for hubspot to auto generate the
+        companies, before the associations are looked up and the companies are
+        updated, created and associated in batches too.
+        Where a contact could not be created, its output contact is None and no
+        company is created for it. This includes the later signups of an email
+        given more than once, as only the first is created.
+        """
+        signups = [dict(x) for x in signups]
+        outputs = [dict(contact=None) for _ in signups]
+
+        # Batch creates with a duplicate email fail, and the results are
+        # matched back to the signups on their email, so only the first
+        # signup of each email is created
+        first_signups = dict()
+        for i, signup in enumerate(signups):
+            first_signups.setdefault(signup["email"].lower(), i)
+
+        for chunk in self._adaptive_chunks("batch_create", first_signups.values()):
+            properties_list = []
+            for i in chunk:
+                signup = dict(signups[i])
+                properties_list.append(
+                    dict(
+                        email=signup.pop("email"),
+                        firstname=signup.pop("first_name"),
+                        lastname=signup.pop("last_name"),
+                        **signup,
+                    )
+                )
+
+            # Batch results aren't guaranteed to be in the order of the inputs
+            # so match them back up on the email
+            contacts = {
+                x.properties["email"].lower(): x
+                for x in self._batch_create("contact", properties_list)
+            }
+            for i, properties in zip(chunk, properties_list):
+                outputs[i]["contact"] = contacts.get(properties["email"].lower())
+        last_created = time.monotonic()
+
+        created = [i for i, x in enumerate(outputs) if x["contact"] is not None]
+        contact_ids = {i: outputs[i]["contact"].id for i in created}
+
+        # Check if companies have been created and assigned to contacts already
+        time.sleep(max(0, ASSOCIATION_WAIT - (time.monotonic() - last_created)))
+        associations = dict()
+        for chunk in self._adaptive_chunks(
+            "batch_read_associations", contact_ids.values()
+        ):
+            with self._request("batch_read_associations"):
+                associations.update(
+                    self._batch_read_associations("contact", "company", chunk)
+                )
+
+        company_ids = {
+            i: associations[contact_id][0]
+            for i, contact_id in contact_ids.items()
+            if associations.get(contact_id)
+        }
+
+        # Update company names if null, once per company as the first signup
+        # for a company would have set its name for any later signups
+        company_names = dict()
+        for chunk in self._adaptive_chunks("batch_read", set(company_ids.values())):
+            for company in self._batch_read("company", chunk, properties=["name"]):
+                company_names[company.id] = company.properties.get("name")
+
+        updates = dict()
+        for i, company_id in company_ids.items():
+            if company_id in company_names and company_names[company_id] is None:
+                updates.setdefault(company_id, (i, {"name": signups[i]["company"]}))
+
+        for chunk in self._adaptive_chunks("batch_update", updates):
+            updated = self._batch_update("company", {x: updates[x][1] for x in chunk})
+            for company in updated:
+                outputs[updates[company.id][0]]["company"] = company
+
+        # Create and associate new companies for the rest
+        unassociated = [i for i in created if i not in company_ids]
+        for chunk in self._adaptive_chunks("batch_create", unassociated):
+            new_companies = defaultdict(list)
+            properties_list = [
+                dict(name=signups[i]["company"], domain=None) for i in chunk
+            ]
+            for company in self._batch_create("company", properties_list):
+                new_companies[company.properties["name"]].append(company)
+
+            id_pairs = []
+            for i in chunk:
+                companies = new_companies[signups[i]["company"]]
+                outputs[i]["company"] = companies.pop() if companies else None
+                if outputs[i]["company"] is not None:
+                    id_pairs.append((contact_ids[i], outputs[i]["company"].id))
+
+            if id_pairs:
+                with self._request("batch_create_associations"):
+                    self._batch_create_associations("contact", "company", id_pairs)
+
+        return outputs
+
 
 def convert_date_to_epoch(date):
     if date:
@@ -0,0 +1,195 @@
+import csv
+import io
+import json
+import time
+import uuid
+
+from hs_api.api.polling import poll_until
+
+IMPORT_PATH = "/crm/v3/imports"
+# Records read to find the columns of an import where no properties are given
+IMPORT_COLUMN_SAMPLE = 500
+# Loads of fewer deals than this are created through the batch api instead by
+# default, as importing deals only creates them too
+IMPORT_BATCH_THRESHOLD = 500
+# Seconds to wait for an import to complete before giving up
+IMPORT_TIMEOUT = 60 * 60
+# Seconds between polls of an import's progress, doubling up to the maximum
+IMPORT_POLL_INTERVAL = 2
+MAX_IMPORT_POLL_INTERVAL = 60
+IMPORT_DONE_STATES = ("DONE", "FAILED", "CANCELED")
+IMPORT_ERRORS_PAGE_LIMIT = 100
+IMPORT_FILE_NAME = "import.csv"
+
+OBJECT_TYPE_IDS = {
+    "contact": "0-1",
+    "company": "0-2",
+    "deal": "0-3",
+}
+# Columns hubspot matches existing objects on, so they're updated rather than
+# duplicated
+ALTERNATE_ID_COLUMNS = {"contact": "email", "company": "domain"}
+
+
+class ImportRowError:
+    """
+    An error importing a row. line_number is the line of the row in the
+    import file, the header being line 1.
+    """
+
+    def __init__(
+        self, line_number, error_type, message=None, invalid_value=None, column=None
+    ):
+        self.line_number = line_number
+        self.error_type = error_type
+        self.message = message
+        self.invalid_value = invalid_value
+        self.column = column
+
+    def __repr__(self):
+        return (
+            f"ImportRowError({self.line_number!r}, {self.error_type!r}, "
+            f"{self.message!r}, {self.invalid_value!r}, {self.column!r})"
+        )
+
+
+class ImportResult:
+    """
+    The outcome of a bulk import. Where it was small enough to be created
+    through the batch api import_id is None and created holds the created
+    objects, otherwise counters holds hubspot's counts of the rows imported.
+    """
+
+    def __init__(
+        self, state, row_count, errors, import_id=None, counters=None, created=None
+    ):
+        self.state = state
+        self.row_count = row_count
+        self.errors = errors
+        self.import_id = import_id
+        self.counters = counters or dict()
+        self.created = created or []
+
+    def __repr__(self):
+        return (
+            f"ImportResult({self.state!r}, rows={self.row_count}, "
+            f"errors={len(self.errors)}, import_id={self.import_id!r})"
+        )
+
+
+def import_request(object_type, columns, name=None):
+    """
+    Returns the import request for a csv file of objects of the object type
+    with the given columns, each mapped to the property of the same name.
+    """
+    mappings = []
+    for column in columns:
+        mapping = {
+            "columnObjectTypeId": OBJECT_TYPE_IDS[object_type],
+            "columnName": column,
+            "propertyName": column,
+        }
+        if ALTERNATE_ID_COLUMNS.get(object_type) == column:
+            mapping["idColumnType"] = "HUBSPOT_ALTERNATE_ID"
+        mappings.append(mapping)
+
+    return {
+        "name": name or f"{object_type} import {int(time.time())}",
+        "files": [
+            {
+                "fileName": IMPORT_FILE_NAME,
+                "fileFormat": "CSV",
+                "fileImportPage": {"hasHeader": True, "columnMappings": mappings},
+            }
+        ],
+    }
+
+
+def write_import_body(f, request, columns, records):
+    """
+    Writes the multipart form body of an import, the import request and the
+    records as a csv file, to the binary file f, so the records are streamed
+    to disk rather than held in memory. Returns the boundary of the form and
+    the number of records written.
+    Raises a ValueError for records with properties not in the columns.
+    """
+    boundary = uuid.uuid4().hex
+    f.write(
+        (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="importRequest"\r\n\r\n'
+            f"{json.dumps(request)}\r\n"
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="files"; '
+            f'filename="{IMPORT_FILE_NAME}"\r\n'
+            f"Content-Type: text/csv\r\n\r\n"
+        ).encode()
+    )
+
+    text_file = io.TextIOWrapper(f, encoding="utf-8", newline="")
+    writer = csv.DictWriter(text_file, fieldnames=columns, restval="")
+    writer.writeheader()
+    row_count = 0
+    for record in records:
+        writer.writerow(record)
+        row_count += 1
+    text_file.flush()
+    text_file.detach()
+
+    f.write(f"\r\n--{boundary}--\r\n".encode())
+    return boundary, row_count
+
+
+def wait_for_import(
+    transport, import_id, timeout, poll_interval, max_poll_interval, progress_callback
+):
+    """
+    Polls the import, backing off exponentially, until it is done, failed or
+    canceled, returning its last status. progress_callback, if given, is
+    called with the state and counters of the import on each poll.
+    Raises a TimeoutError if the import isn't done within timeout seconds.
+    """
+
+    def get_status():
+        status = transport.get_json(f"{IMPORT_PATH}/{import_id}")
+        if progress_callback is not None:
+            progress_callback(status["state"], import_counters(status))
+        return status
+
+    return poll_until(
+        f"Import {import_id}",
+        get_status,
+        "state",
+        IMPORT_DONE_STATES,
+        timeout,
+        poll_interval,
+        max_poll_interval,
+    )
+
+
+def import_counters(status):
+    return (status.get("metadata") or dict()).get("counters") or dict()
+
+
+def import_errors(transport, import_id):
+    """
+    Returns the ImportRowErrors of the import, following the pages of errors.
+    """
+    errors = []
+    params = {"limit": IMPORT_ERRORS_PAGE_LIMIT}
+    while True:
+        response = transport.get_json(f"{IMPORT_PATH}/{import_id}/errors", params)
+        for x in response.get("results", []):
+            errors.append(
+                ImportRowError(
+                    line_number=(x.get("sourceData") or dict()).get("lineNumber"),
+                    error_type=x.get("errorType"),
+                    message=x.get("extraContext"),
+                    invalid_value=x.get("invalidValue"),
+                    column=x.get("knownColumnNumber"),
+                )
+            )
+        after = ((response.get("paging") or dict()).get("next") or dict()).get("after")
+        if not after:
+            return errors
+        params["after"] = after
@@ -0,0 +1,29 @@
+import time
+
+
+def poll_until(
+    name,
+    get_status,
+    state_key,
+    terminal_states,
+    timeout,
+    poll_interval,
+    max_poll_interval,
+):
+    """
+    Calls get_status, backing off exponentially from poll_interval up to
+    max_poll_interval seconds between calls, until the state (under
+    state_key) of the status it returns is one of the terminal_states, then
+    returns that status.
+    Raises a TimeoutError naming what was polled, e.g. "Export 1", if it
+    isn't done within timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        status = get_status()
+        if status[state_key] in terminal_states:
+            return status
+        if time.monotonic() + poll_interval > deadline:
+            raise TimeoutError(f"{name} not done after {timeout}s")
+        time.sleep(poll_interval)
+        poll_interval = min(poll_interval * 2, max_poll_interval)
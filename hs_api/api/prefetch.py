@@ -0,0 +1,83 @@
+import queue
+import threading
+from functools import wraps
+
+# Seconds between checks for the consumer having stopped while the queue is full
+PUT_TIMEOUT = 0.1
+
+
+def put_unless_stopped(items, item, stop_event):
+    """
+    Puts the item on the bounded queue of items, waiting while it's full
+    unless the stop_event is set, e.g. by a consumer that has stopped taking
+    items off it. Returns whether the item was put.
+    """
+    while not stop_event.is_set():
+        try:
+            items.put(item, timeout=PUT_TIMEOUT)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def prefetch(pages, read_ahead):
+    """
+    Yields the pages of the pages generator, fetching up to read_ahead pages
+    ahead from a background thread into a bounded queue, so the next pages
+    are fetched while the consumer works through the current one.
+    Where the consumer stops early, closing the generator stops the
+    background thread, which closes the pages generator once the page it is
+    fetching, if any, has arrived. Errors raised fetching the pages are
+    raised to the consumer once the pages before them have been yielded.
+    Where read_ahead is 0 the pages are yielded as they are fetched.
+    """
+    if not read_ahead:
+        yield from pages
+        return
+
+    stop_event = threading.Event()
+    fetched = queue.Queue(maxsize=read_ahead)
+
+    def fetch():
+        try:
+            for page in pages:
+                if not put_unless_stopped(fetched, ("page", page), stop_event):
+                    return
+            put_unless_stopped(fetched, ("done", None), stop_event)
+        except Exception as e:
+            put_unless_stopped(fetched, ("error", e), stop_event)
+        finally:
+            # Closed from this thread, as a generator can't be closed from
+            # another thread while it's running
+            if hasattr(pages, "close"):
+                pages.close()
+
+    thread = threading.Thread(target=fetch, daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, payload = fetched.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise payload
+            yield payload
+    finally:
+        stop_event.set()
+        thread.join()
+
+
+def prefetched(method):
+    """
+    Decorates a paginated generator method of HubSpotClient to take a
+    read_ahead argument, 0 by default. Where it's given, up to that many
+    pages (batches) are fetched ahead in the background with prefetch while
+    the current one is being worked through.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, read_ahead=0, **kwargs):
+        return prefetch(method(self, *args, **kwargs), read_ahead)
+
+    return wrapper
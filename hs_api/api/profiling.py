@@ -0,0 +1,320 @@
+import functools
+import inspect
+import sys
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+
+# The phases time is split into, any time left over being the client's own
+PHASES = ("network", "decode", "model", "filter")
+OTHER = "other"
+# Where time is spent outside of any profiled method, e.g. on the background
+# threads of read_ahead or the parallel methods
+BACKGROUND = "(background)"
+
+
+class Frame:
+    """
+    The profile of a call of a public method of the client, or of one page
+    of a method returning a generator, page being its index from 0.
+    seconds is the total time of the call, phases the time spent in each
+    phase, and child_seconds that spent in other profiled methods it called.
+    allocated_blocks and allocated_bytes are the net memory allocated by the
+    call, where allocations are traced.
+    """
+
+    def __init__(self, method, page=None, stack=()):
+        self.method = method
+        self.page = page
+        self.stack = stack
+        self.seconds = 0.0
+        self.child_seconds = 0.0
+        self.phases = defaultdict(float)
+        self.allocated_blocks = 0
+        self.allocated_bytes = 0
+        self.discard = False
+
+    @property
+    def other_seconds(self):
+        return max(self.seconds - self.child_seconds - sum(self.phases.values()), 0.0)
+
+    def as_dict(self):
+        return {
+            "method": self.method,
+            "page": self.page,
+            "seconds": self.seconds,
+            **{x: self.phases.get(x, 0.0) for x in PHASES},
+            OTHER: self.other_seconds,
+            "allocated_blocks": self.allocated_blocks,
+            "allocated_bytes": self.allocated_bytes,
+        }
+
+    def __repr__(self):
+        return f"Frame({self.method!r}, page={self.page!r}, seconds={self.seconds:.6f})"
+
+
+class Profiler:
+    """
+    Profiles the client it is given to, attributing the time of each call of
+    its public methods, and of each page of those returning generators, to
+    waiting on the network, decoding json, constructing the sdk models,
+    filtering the results and the rest of the client's own code.
+    Where trace_allocations is set the net memory blocks and bytes allocated
+    are counted too, tracing allocations with tracemalloc which slows the
+    client down considerably.
+    The results can be read as frames, a report or collapsed stacks for
+    flamegraph tools. Time spent on other threads, e.g. fetching the pages
+    of read_ahead, is attributed to BACKGROUND.
+    """
+
+    def __init__(self, trace_allocations=False):
+        self.trace_allocations = trace_allocations
+        if trace_allocations and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._frames = []
+        self._background = Frame(BACKGROUND)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _allocations(self):
+        if not self.trace_allocations:
+            return 0, 0
+        return sys.getallocatedblocks(), tracemalloc.get_traced_memory()[0]
+
+    @contextmanager
+    def frame(self, method, page=None):
+        """
+        Profiles the block as a call of the method, or a page of it.
+        """
+        stack = self._stack()
+        frame = Frame(method, page, tuple(x.method for x in stack) + (method,))
+        stack.append(frame)
+        blocks, allocated = self._allocations()
+        start = time.perf_counter()
+        try:
+            yield frame
+        finally:
+            frame.seconds = time.perf_counter() - start
+            end_blocks, end_allocated = self._allocations()
+            frame.allocated_blocks = end_blocks - blocks
+            frame.allocated_bytes = end_allocated - allocated
+            stack.pop()
+            if stack:
+                stack[-1].child_seconds += frame.seconds
+            if not frame.discard:
+                with self._lock:
+                    self._frames.append(frame)
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Adds the time spent in the block to the phase of the current frame.
+        Time spent in a phase nested within another, e.g. building the models
+        while decoding a response, only counts towards the inner phase.
+        """
+        phases = getattr(self._local, "phases", None)
+        if phases is None:
+            phases = self._local.phases = []
+        phases.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            nested = phases.pop()
+            if phases:
+                phases[-1] += seconds
+            stack = self._stack()
+            if stack:
+                stack[-1].phases[name] += seconds - nested
+            else:
+                with self._lock:
+                    self._background.seconds += seconds - nested
+                    self._background.phases[name] += seconds - nested
+
+    def profiled(self, method, fn):
+        """
+        Returns fn wrapped to be profiled as the method. Where fn returns a
+        generator each of its pages is profiled as its own frame.
+        """
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.frame(method) as frame:
+                result = fn(*args, **kwargs)
+                # Only the pages are of interest, not building the generator
+                frame.discard = inspect.isgenerator(result)
+            if frame.discard:
+                return self._profiled_pages(method, result)
+            return result
+
+        return wrapper
+
+    def _profiled_pages(self, method, pages):
+        page = 0
+        try:
+            while True:
+                with self.frame(method, page):
+                    try:
+                        value = next(pages)
+                    except StopIteration:
+                        return
+                yield value
+                page += 1
+        finally:
+            pages.close()
+
+    def instrument(self, client):
+        """
+        Profiles the public methods of the client, wrapping them on the
+        instance so other clients aren't affected.
+        """
+        for name in dir(type(client)):
+            if name.startswith("_"):
+                continue
+            if inspect.isfunction(inspect.getattr_static(type(client), name)):
+                setattr(client, name, self.profiled(name, getattr(client, name)))
+
+    def instrument_api_client(self, api_client):
+        """
+        Profiles the requests of an sdk ApiClient, splitting each into the
+        request itself, decoding the json response and building the models.
+        """
+        request = api_client.request
+        deserialize = api_client.deserialize
+        build_model = api_client._ApiClient__deserialize
+        building = threading.local()
+
+        @functools.wraps(request)
+        def profiled_request(*args, **kwargs):
+            with self.phase("network"):
+                return request(*args, **kwargs)
+
+        @functools.wraps(deserialize)
+        def profiled_deserialize(*args, **kwargs):
+            with self.phase("decode"):
+                return deserialize(*args, **kwargs)
+
+        @functools.wraps(build_model)
+        def profiled_build_model(*args, **kwargs):
+            # Models are built recursively, only the outermost call is timed
+            if getattr(building, "active", False):
+                return build_model(*args, **kwargs)
+            building.active = True
+            try:
+                with self.phase("model"):
+                    return build_model(*args, **kwargs)
+            finally:
+                building.active = False
+
+        api_client.request = profiled_request
+        api_client.deserialize = profiled_deserialize
+        # The sdk calls its name mangled __deserialize through self, so this
+        # instance attribute takes the place of the method
+        api_client._ApiClient__deserialize = profiled_build_model
+
+    def frames(self, method=None):
+        """
+        Returns the frames profiled so far, of the method if given.
+        """
+        with self._lock:
+            frames = list(self._frames)
+        return [x for x in frames if method is None or x.method == method]
+
+    def summary(self):
+        """
+        Returns a dict of each method to its calls, pages, total seconds,
+        seconds in each phase and net allocations, summed over its frames.
+        """
+        summary = dict()
+        frames = self.frames()
+        with self._lock:
+            if self._background.seconds:
+                frames.append(self._background)
+        for frame in frames:
+            totals = summary.setdefault(
+                frame.method,
+                {
+                    "calls": 0,
+                    "pages": 0,
+                    "seconds": 0.0,
+                    **{x: 0.0 for x in PHASES},
+                    OTHER: 0.0,
+                    "allocated_blocks": 0,
+                    "allocated_bytes": 0,
+                },
+            )
+            if frame.page is None:
+                totals["calls"] += 1
+            else:
+                totals["pages"] += 1
+            for key, value in frame.as_dict().items():
+                if key not in ("method", "page"):
+                    totals[key] += value
+        return summary
+
+    def report(self):
+        """
+        Returns a table of the summary, the slowest methods first.
+        """
+        columns = ("seconds", *PHASES, OTHER)
+        lines = [
+            f"{'method':<32}{'calls':>7}{'pages':>7}"
+            + "".join(f"{x:>10}" for x in columns)
+            + f"{'blocks':>12}{'bytes':>14}"
+        ]
+        summary = sorted(self.summary().items(), key=lambda x: -x[1]["seconds"])
+        for method, totals in summary:
+            lines.append(
+                f"{method:<32}{totals['calls']:>7}{totals['pages']:>7}"
+                + "".join(f"{totals[x]:>10.3f}" for x in columns)
+                + f"{totals['allocated_blocks']:>12}{totals['allocated_bytes']:>14}"
+            )
+        return "\n".join(lines)
+
+    def collapsed_stacks(self):
+        """
+        Returns the profile as collapsed stacks, a line of semicolon separated
+        frames and the microseconds spent in them, as read by flamegraph.pl,
+        speedscope and similar tools. Each stack is the profiled methods
+        called, ending with the phase the time was spent in.
+        """
+        stacks = defaultdict(float)
+        frames = self.frames()
+        with self._lock:
+            frames.append(self._background)
+        for frame in frames:
+            stack = ";".join(frame.stack or (frame.method,))
+            for name, seconds in frame.phases.items():
+                stacks[f"{stack};{name}"] += seconds
+            stacks[f"{stack};{OTHER}"] += frame.other_seconds
+        return "".join(
+            f"{stack} {round(seconds * 1e6)}\n"
+            for stack, seconds in sorted(stacks.items())
+            if round(seconds * 1e6) > 0
+        )
+
+    def dump(self, path, format="report"):
+        """
+        Writes the report, or the collapsed stacks where format is
+        "collapsed", to path.
+        """
+        if format not in ("report", "collapsed"):
+            raise ValueError(
+                f"'{format}' is not a valid format. Must be report or collapsed."
+            )
+        with open(path, "w") as f:
+            f.write(self.report() if format == "report" else self.collapsed_stacks())
+
+    def reset(self):
+        with self._lock:
+            self._frames = []
+            self._background = Frame(BACKGROUND)
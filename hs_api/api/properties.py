@@ -0,0 +1,92 @@
+import threading
+import time
+from difflib import get_close_matches
+
+# Seconds the property metadata of an object type is used before reloading
+PROPERTY_CACHE_AGE = 60 * 60
+
+# The properties api expects the plural object type
+PROPERTY_OBJECT_TYPE_LOOKUP = {
+    "contact": "contacts",
+    "company": "companies",
+    "deal": "deals",
+    "ticket": "tickets",
+}
+
+
+class PropertyRegistry:
+    """
+    A cache of the property metadata of each object type, loaded from hubspot
+    on first use and reloaded once older than max_age seconds, used to check
+    requested property names locally before making a request.
+    Also holds named projections, i.e. the list of properties a job needs
+    from an object type, so calls only fetch the columns they use.
+    """
+
+    def __init__(self, client, max_age=PROPERTY_CACHE_AGE):
+        self._client = client
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # object type -> (loaded at, property name -> property)
+        self._properties = dict()
+        # projection name -> (object type, property names)
+        self._projections = dict()
+
+    def properties(self, object_type):
+        """
+        Returns a dict of property name to the property metadata for the
+        object type.
+        """
+        object_type = PROPERTY_OBJECT_TYPE_LOOKUP.get(object_type, object_type)
+        with self._lock:
+            loaded_at, properties = self._properties.get(object_type, (None, None))
+            if loaded_at is None or time.time() - loaded_at >= self.max_age:
+                response = self._client._client.crm.properties.core_api.get_all(
+                    object_type=object_type
+                )
+                properties = {x.name: x for x in response.results}
+                self._properties[object_type] = (time.time(), properties)
+            return properties
+
+    def validate(self, object_type, property_names):
+        """
+        Raises a ValueError naming any of the property names that aren't
+        properties of the object type, along with any close matches.
+        """
+        properties = self.properties(object_type)
+        invalid = [x for x in property_names if x not in properties]
+        if invalid:
+            details = []
+            for name in invalid:
+                matches = get_close_matches(name, properties, n=3)
+                suggestion = f" (did you mean {', '.join(matches)}?)" if matches else ""
+                details.append(f"'{name}'{suggestion}")
+            raise ValueError(
+                f"{', '.join(details)} not valid properties of '{object_type}'."
+            )
+
+    def register_projection(self, name, object_type, property_names):
+        """
+        Registers the property names as a projection of the object type that
+        can then be passed by name to the find_* methods.
+        """
+        property_names = list(property_names)
+        self.validate(object_type, property_names)
+        self._projections[name] = (
+            PROPERTY_OBJECT_TYPE_LOOKUP.get(object_type, object_type),
+            property_names,
+        )
+
+    def projection(self, name, object_type):
+        """
+        Returns the property names of the named projection, raising a
+        ValueError if there is no such projection for the object type.
+        """
+        projection_object_type, property_names = self._projections.get(
+            name, (None, None)
+        )
+        if projection_object_type != PROPERTY_OBJECT_TYPE_LOOKUP.get(
+            object_type, object_type
+        ):
+            raise ValueError(f"'{name}' is not a projection of '{object_type}'.")
+        return list(property_names)
@@ -0,0 +1,95 @@
+from collections import namedtuple
+from contextlib import nullcontext
+from datetime import datetime
+
+from hs_api.api.writers import (
+    PARQUET_ROW_GROUP_SIZE,
+    import_pyarrow,
+    write_parquet_rows,
+)
+
+# The most deals hubspot returns in a page where history is asked for
+HISTORY_PAGE_LIMIT = 50
+
+PropertyHistoryRow = namedtuple(
+    "PropertyHistoryRow", ["deal_id", "property", "value", "timestamp", "source"]
+)
+
+
+def parse_timestamp(timestamp):
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+
+
+def extract_property_history(
+    transport,
+    properties_with_history,
+    since=None,
+    archived_only=False,
+    page_size=None,
+    request=None,
+):
+    """
+    Yields a PropertyHistoryRow for each change to the properties_with_history
+    of every deal, a page of raw json at a time, so only one page is held in
+    memory and no sdk models are built for the nested history.
+    Where since, a timezone aware datetime, is given only changes after it are
+    yielded, skipping deals not updated since.
+    page_size, a function returning the size of the next page, and request,
+    returning the context each page is requested in, let the client adapt
+    the pages to how hubspot is responding.
+    """
+    params = {
+        "propertiesWithHistory": ",".join(properties_with_history),
+        "archived": str(archived_only).lower(),
+    }
+    while True:
+        limit = page_size() if page_size else HISTORY_PAGE_LIMIT
+        params = dict(params, limit=limit)
+        with request() if request else nullcontext():
+            response_json = transport.get_json("/crm/v3/objects/deals", params=params)
+
+        for deal in response_json.get("results", []):
+            if since is not None and parse_timestamp(deal["updatedAt"]) <= since:
+                continue
+            for property_name, history in deal.get("propertiesWithHistory", {}).items():
+                for change in history:
+                    timestamp = parse_timestamp(change["timestamp"])
+                    if since is not None and timestamp <= since:
+                        continue
+                    yield PropertyHistoryRow(
+                        deal["id"],
+                        property_name,
+                        change.get("value"),
+                        timestamp,
+                        change.get("sourceType"),
+                    )
+
+        paging = response_json.get("paging")
+        if not paging:
+            break
+        params = dict(params, after=paging["next"]["after"])
+
+
+def write_parquet(rows, path, row_group_size=PARQUET_ROW_GROUP_SIZE):
+    """
+    Writes the PropertyHistoryRows to a parquet file at path, a row group of
+    up to row_group_size rows at a time, so the rows are never all held in
+    memory. Returns the number of rows written.
+    Needs pyarrow, installed with the parquet extra.
+    """
+    pa, _ = import_pyarrow()
+    schema = pa.schema(
+        [
+            ("deal_id", pa.string()),
+            ("property", pa.string()),
+            ("value", pa.string()),
+            ("timestamp", pa.timestamp("ms", tz="UTC")),
+            ("source", pa.string()),
+        ]
+    )
+
+    def to_table(row_group):
+        columns = [list(x) for x in zip(*row_group)]
+        return pa.Table.from_arrays(columns, schema=schema)
+
+    return write_parquet_rows(path, schema, rows, to_table, row_group_size)
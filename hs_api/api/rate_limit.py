@@ -0,0 +1,44 @@
+import threading
+import time
+from collections import deque
+
+# Hubspot allows private apps 100 requests every 10 seconds (more on higher tiers)
+RATE_LIMIT = 100
+RATE_LIMIT_PERIOD = 10
+
+
+class RateLimiter:
+    """
+    A thread safe sliding window rate limiter, allowing at most max_requests
+    in any period of seconds, shared by everything making requests through a
+    client so concurrent work stays under hubspot's rate limit together.
+    """
+
+    def __init__(self, max_requests=RATE_LIMIT, period=RATE_LIMIT_PERIOD):
+        self.max_requests = max_requests
+        self.period = period
+        self._lock = threading.Lock()
+        self._requests = deque()
+
+    def try_acquire(self):
+        """
+        Takes a request from the limit if one is available now, returning
+        whether it did, otherwise how long to wait until one is.
+        """
+        with self._lock:
+            now = time.monotonic()
+            while self._requests and now - self._requests[0] >= self.period:
+                self._requests.popleft()
+            if len(self._requests) < self.max_requests:
+                self._requests.append(now)
+                return True, 0
+            return False, self.period - (now - self._requests[0])
+
+    def acquire(self):
+        """
+        Blocks until a request can be made within the limit.
+        """
+        acquired, wait = self.try_acquire()
+        while not acquired:
+            time.sleep(wait)
+            acquired, wait = self.try_acquire()
@@ -0,0 +1,291 @@
+import fcntl
+import json
+import os
+import socket
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from hubspot.crm.contacts import Filter, FilterGroup, PublicObjectSearchRequest
+
+from hs_api.api.adaptive import is_overloaded
+from hs_api.api.rate_limit import RATE_LIMIT
+
+# Seconds a shard is leased to a worker before another worker can take it
+LEASE_SECONDS = 10 * 60
+# Sub-ranges probed per shard to balance the number of objects across shards
+PROBES_PER_SHARD = 4
+SHARD_PAGE_LIMIT = 100
+# Searches throttled (429) or failed on hubspot's side (5xx) are retried this
+# many times, waiting twice as long each time from SHARD_RETRY_WAIT seconds
+# up to MAX_SHARD_RETRY_WAIT
+SHARD_RETRY_LIMIT = 5
+SHARD_RETRY_WAIT = 1
+MAX_SHARD_RETRY_WAIT = 60
+
+
+def _search(client, object_type, filters, limit, sorts=None, properties=None):
+    public_object_search_request = PublicObjectSearchRequest(
+        limit=limit,
+        filter_groups=[FilterGroup(filters=filters)],
+        sorts=sorts,
+        properties=properties,
+    )
+    retry = 0
+    while True:
+        client.rate_limiter.acquire()
+        try:
+            with client._request("shard_search"):
+                return client.search_lookup[object_type](
+                    public_object_search_request=public_object_search_request
+                )
+        except Exception as e:
+            if retry >= SHARD_RETRY_LIMIT or not is_overloaded(e):
+                raise
+            time.sleep(min(SHARD_RETRY_WAIT * 2**retry, MAX_SHARD_RETRY_WAIT))
+            retry += 1
+
+
+def _id_filters(start, end):
+    filters = [Filter(property_name="hs_object_id", operator="GTE", value=str(start))]
+    # A shard without an end runs to the highest id
+    if end is not None:
+        filters.append(
+            Filter(property_name="hs_object_id", operator="LT", value=str(end))
+        )
+    return filters
+
+
+def _id_bound(client, object_type, direction):
+    response = _search(
+        client,
+        object_type,
+        [Filter(property_name="hs_object_id", operator="HAS_PROPERTY")],
+        limit=1,
+        sorts=[{"propertyName": "hs_object_id", "direction": direction}],
+    )
+    return int(response.results[0].id) if response.results else None
+
+
+def plan_shards(client, object_type, shard_count):
+    """
+    Splits the hs_object_id space of the object type into shard_count
+    ranges of [start, end) with roughly the same number of objects each.
+    The range between the lowest and highest ids is probed in equal
+    sub-ranges with search GTE/LT filters to count the objects in each, which
+    are then grouped into the shards.
+    """
+    lowest = _id_bound(client, object_type, "ASCENDING")
+    if lowest is None:
+        return []
+    end = _id_bound(client, object_type, "DESCENDING") + 1
+
+    probe_count = min(shard_count * PROBES_PER_SHARD, end - lowest)
+    step = -(-(end - lowest) // probe_count)
+    probes = []
+    for probe_start in range(lowest, end, step):
+        probe_end = min(probe_start + step, end)
+        total = _search(
+            client, object_type, _id_filters(probe_start, probe_end), limit=1
+        ).total
+        probes.append((probe_start, probe_end, total))
+
+    target = sum(x[2] for x in probes) / shard_count
+    shards = []
+    shard_start, shard_total = lowest, 0
+    for probe_start, probe_end, total in probes:
+        shard_total += total
+        if shard_total >= target * (len(shards) + 1) and len(shards) < shard_count - 1:
+            shards.append(
+                {"index": len(shards), "start": shard_start, "end": probe_end}
+            )
+            shard_start = probe_end
+    shards.append({"index": len(shards), "start": shard_start, "end": end})
+    return shards
+
+
+def export_shard(client, object_type, shard, properties=None, filters=None):
+    """
+    Yields the pages of objects in the shard's hs_object_id range, in id
+    order, narrowed by any other search filters given. Pages are followed on
+    the last id seen rather than the search after cursor, which stops at
+    10,000 results.
+    Each search waits on the client's rate_limiter, and is retried with an
+    exponential backoff where hubspot throttles it or fails. Where the client
+    is adaptive, the page size shrinks as hubspot throttles too.
+    """
+    start = shard["start"]
+    while True:
+        response = _search(
+            client,
+            object_type,
+            _id_filters(start, shard["end"]) + (filters or []),
+            limit=client._page_size("shard_search", SHARD_PAGE_LIMIT, SHARD_PAGE_LIMIT),
+            sorts=[{"propertyName": "hs_object_id", "direction": "ASCENDING"}],
+            properties=properties,
+        )
+        if response.results:
+            yield response.results
+        if not response.paging:
+            break
+        start = int(response.results[-1].id) + 1
+
+
+class ShardLeases:
+    """
+    Hands out the shards of an export to workers through a json lease file,
+    locked while read and written, so workers in different processes (or on
+    different nodes sharing the file) never work on the same shard.
+    A shard leased to a worker that hasn't renewed it within lease_seconds,
+    e.g. because it crashed, is handed out again.
+    """
+
+    def __init__(self, path, lease_seconds=LEASE_SECONDS):
+        self.path = Path(path)
+        self.lease_seconds = lease_seconds
+
+    @contextmanager
+    def _locked(self):
+        with open(self.path.with_suffix(".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with open(self.path) as f:
+                    state = json.load(f)
+                yield state
+                temp_path = self.path.with_suffix(".tmp")
+                with open(temp_path, "w") as f:
+                    json.dump(state, f)
+                os.replace(temp_path, self.path)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def create(self, shards):
+        """
+        Creates the lease file for the shards, unless it already exists so an
+        interrupted export can be resumed.
+        """
+        if self.path.exists():
+            return False
+        with open(self.path, "w") as f:
+            json.dump({"shards": [dict(x, status="pending") for x in shards]}, f)
+        return True
+
+    def acquire(self, worker_id):
+        """
+        Leases the next shard that isn't done or leased to the worker,
+        returning None where there are none left.
+        """
+        now = time.time()
+        with self._locked() as state:
+            for shard in state["shards"]:
+                if shard["status"] == "done":
+                    continue
+                if shard["status"] == "leased" and shard["expires"] > now:
+                    continue
+                shard.update(
+                    status="leased", worker=worker_id, expires=now + self.lease_seconds
+                )
+                return dict(shard)
+        return None
+
+    def renew(self, shard, worker_id):
+        """
+        Extends the worker's lease on the shard, returning False if it has
+        lost the lease to another worker.
+        """
+        with self._locked() as state:
+            leased = state["shards"][shard["index"]]
+            if leased["status"] != "leased" or leased["worker"] != worker_id:
+                return False
+            leased["expires"] = time.time() + self.lease_seconds
+            return True
+
+    def complete(self, shard, worker_id, commit=None):
+        """
+        Marks the worker's shard as done, returning False without doing so
+        if it has lost the lease to another worker. Any commit function given,
+        e.g. moving the shard's output into place, is called with the lease
+        file locked, only while the worker still holds the lease.
+        """
+        with self._locked() as state:
+            leased = state["shards"][shard["index"]]
+            if leased["status"] != "leased" or leased["worker"] != worker_id:
+                return False
+            if commit is not None:
+                commit()
+            leased["status"] = "done"
+            return True
+
+    def shards(self):
+        with open(self.path) as f:
+            return json.load(f)["shards"]
+
+
+def shard_output_path(output_dir, shard):
+    return Path(output_dir) / f"shard-{shard['index']:05d}.jsonl"
+
+
+def run_shard_worker(
+    lease_path,
+    output_dir,
+    object_type,
+    properties=None,
+    client=None,
+    worker_id=None,
+    processes=1,
+    **client_kwargs,
+):
+    """
+    Works through the shards of the lease file until there are none left,
+    writing the objects of each to a json lines file in output_dir, returning
+    the number of shards exported.
+    Where no client is given, one is created from the client_kwargs, as a
+    client can't be passed between processes, with its rate_limit split
+    evenly between the given number of worker processes so together they stay
+    within the app's limit.
+    """
+    # Imported here as the client module imports this one
+    from hs_api.api.hubspot_api import HubSpotClient
+
+    if client is None:
+        rate_limit = client_kwargs.pop("rate_limit", RATE_LIMIT)
+        client = HubSpotClient(
+            rate_limit=max(rate_limit // processes, 1), **client_kwargs
+        )
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    leases = ShardLeases(lease_path)
+
+    exported = 0
+    shard = leases.acquire(worker_id)
+    while shard is not None:
+        output_path = shard_output_path(output_dir, shard)
+        temp_path = output_path.with_suffix(f".{worker_id}.tmp")
+        lost_lease = False
+        with open(temp_path, "w") as f:
+            for page in export_shard(client, object_type, shard, properties):
+                for x in page:
+                    f.write(json.dumps(x.to_dict(), default=str) + "\n")
+                if not leases.renew(shard, worker_id):
+                    lost_lease = True
+                    break
+
+        if not lost_lease and leases.complete(
+            shard, worker_id, commit=lambda: os.replace(temp_path, output_path)
+        ):
+            exported += 1
+        else:
+            os.remove(temp_path)
+        shard = leases.acquire(worker_id)
+    return exported
+
+
+def merge_shards(output_dir, shards):
+    """
+    Yields the objects exported for the shards, as dicts, in shard and so id
+    order, so the merged output is the same however the shards were split
+    between workers.
+    """
+    for shard in sorted(shards, key=lambda x: x["start"]):
+        with open(shard_output_path(output_dir, shard)) as f:
+            for line in f:
+                yield json.loads(line)
@@ -0,0 +1,184 @@
+import importlib
+import json
+import threading
+import time
+from contextlib import nullcontext
+
+import requests
+
+HUBSPOT_API_URL = "https://api.hubapi.com"
+
+# Fastest first, falling back to the standard library
+JSON_BACKENDS = ("orjson", "ujson", "json")
+
+
+def _brotli_available():
+    for module in ("brotli", "brotlicffi"):
+        try:
+            importlib.import_module(module)
+            return True
+        except ImportError:
+            pass
+    return False
+
+
+# urllib3 can only decode brotli responses where a brotli package is installed
+ACCEPT_ENCODING = "gzip, br" if _brotli_available() else "gzip"
+
+
+def get_json_loads(json_backend=None):
+    """
+    Returns the loads function of the given json backend, or of the fastest
+    installed backend if None is given. A callable can also be given to be
+    used as is.
+    """
+    if callable(json_backend):
+        return json_backend
+    if json_backend is not None:
+        if json_backend not in JSON_BACKENDS:
+            raise ValueError(
+                f"'{json_backend}' is not a valid json_backend. "
+                f"Must be one of {', '.join(JSON_BACKENDS)}."
+            )
+        return importlib.import_module(json_backend).loads
+
+    for backend in JSON_BACKENDS:
+        try:
+            return importlib.import_module(backend).loads
+        except ImportError:
+            pass
+    return json.loads
+
+
+class TransportStats:
+    """
+    Thread safe counters of the requests made by a transport.
+    bytes_received is the (compressed) bytes read off the wire and
+    bytes_decoded the size of the decompressed bodies.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self.network_seconds = 0.0
+        self.decode_seconds = 0.0
+
+    def record(self, bytes_received, bytes_decoded, network_seconds, decode_seconds):
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += bytes_received
+            self.bytes_decoded += bytes_decoded
+            self.network_seconds += network_seconds
+            self.decode_seconds += decode_seconds
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "bytes_received": self.bytes_received,
+                "bytes_decoded": self.bytes_decoded,
+                "network_seconds": self.network_seconds,
+                "decode_seconds": self.decode_seconds,
+            }
+
+
+class HttpTransport:
+    """
+    Makes the raw http requests to the hubspot apis that aren't covered by the
+    hubspot sdk, reusing connections through a session per thread, as
+    requests sessions aren't safe to share between threads.
+    Always asks for compressed responses and decodes them with the given (or
+    fastest installed) json backend, keeping count of the bytes transferred
+    and the time spent on the network and decoding in stats.
+    """
+
+    def __init__(
+        self, access_token, json_backend=None, base_url=HUBSPOT_API_URL, profiler=None
+    ):
+        self.base_url = base_url
+        self.profiler = profiler
+        self.loads = get_json_loads(json_backend)
+        self.stats = TransportStats()
+        self.headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Accept": "application/json",
+            "Accept-Encoding": ACCEPT_ENCODING,
+        }
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update(self.headers)
+        return session
+
+    def get_json(self, path, params=None):
+        """
+        Gets the path of the api with the given params and returns the decoded
+        json body, raising an HTTPError for any error responses.
+        """
+        return self._request_json("GET", path, params=params)
+
+    def post_json(self, path, body):
+        """
+        Posts the body, as json, to the path of the api and returns the
+        decoded json response, raising an HTTPError for any error responses.
+        """
+        return self._request_json("POST", path, json=body)
+
+    def post_data(self, path, data, content_type):
+        """
+        Posts the data, bytes or a file to be streamed, with the content type
+        to the path of the api and returns the decoded json response, raising
+        an HTTPError for any error responses.
+        """
+        return self._request_json(
+            "POST", path, data=data, headers={"Content-Type": content_type}
+        )
+
+    def _phase(self, name):
+        if self.profiler is None:
+            return nullcontext()
+        return self.profiler.phase(name)
+
+    def _request_json(self, method, path, **kwargs):
+        start = time.perf_counter()
+        with self._phase("network"):
+            response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+            response.raise_for_status()
+            content = response.content
+        network_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with self._phase("decode"):
+            response_json = self.loads(content)
+        decode_seconds = time.perf_counter() - start
+
+        self.stats.record(
+            # The number of bytes pulled over the wire, before decompression
+            bytes_received=response.raw.tell() or len(content),
+            bytes_decoded=len(content),
+            network_seconds=network_seconds,
+            decode_seconds=decode_seconds,
+        )
+        return response_json
+
+    def download(self, url):
+        """
+        Gets the url as a streamed response, to be used as a context manager,
+        raising an HTTPError for any error responses. The access token is
+        only sent to the api itself, as download urls, e.g. of exports, are
+        signed and can be on other hosts.
+        """
+        if url.startswith(self.base_url):
+            response = self.session.get(url, stream=True)
+        else:
+            response = requests.get(
+                url, stream=True, headers={"Accept-Encoding": ACCEPT_ENCODING}
+            )
+        response.raise_for_status()
+        return response
@@ -0,0 +1,372 @@
+import base64
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from hubspot.crm.contacts import Filter
+from hubspot.exceptions import InvalidSignatureError
+from hubspot.utils.webhooks import validate_signature as validate_v1_v2_signature
+
+from hs_api.api.buffered_writer import call_on_error
+from hs_api.api.sharding import export_shard
+
+# Requests with a v3 signature older than this many milliseconds are rejected
+MAX_SIGNATURE_AGE = 5 * 60 * 1000
+CHANGE_BATCH_SIZE = 100
+# Seconds changes are held before being handed on in a batch
+CHANGE_BATCH_WAIT = 5
+# The number of recent events remembered to ignore retried events
+SEEN_EVENTS_LIMIT = 100000
+
+
+def validate_signature(client_secret, headers, method, uri, body, now=None):
+    """
+    Validates the signature of a webhook request sent by hubspot, raising an
+    InvalidSignatureError if it isn't valid.
+    Supports v3 signatures, rejecting those older than MAX_SIGNATURE_AGE, as
+    well as v1 and v2 signatures.
+    """
+    signature = headers.get("X-HubSpot-Signature-v3")
+    if signature is not None:
+        timestamp = headers.get("X-HubSpot-Request-Timestamp", "")
+        now = now or time.time() * 1000
+        if not timestamp.isdigit() or now - int(timestamp) > MAX_SIGNATURE_AGE:
+            raise InvalidSignatureError(
+                msg="Webhook request timestamp is too old",
+                signature=signature,
+                signature_version="v3",
+            )
+
+        source_string = f"{method}{uri}{body}{timestamp}"
+        hash_result = base64.b64encode(
+            hmac.new(
+                client_secret.encode("utf-8"),
+                source_string.encode("utf-8"),
+                hashlib.sha256,
+            ).digest()
+        ).decode()
+        if not hmac.compare_digest(hash_result, signature):
+            raise InvalidSignatureError(
+                signature=signature, signature_version="v3", hash_result=hash_result
+            )
+        return
+
+    signature = headers.get("X-HubSpot-Signature")
+    if signature is None:
+        raise InvalidSignatureError(msg="Webhook request is not signed")
+    validate_v1_v2_signature(
+        signature=signature,
+        client_secret=client_secret,
+        http_uri=uri,
+        request_body=body,
+        http_method=method,
+        signature_version=headers.get("X-HubSpot-Signature-Version", "v1"),
+    )
+
+
+class ChangeRecord:
+    """
+    A change to an object, from a webhook event or a reconciliation sweep.
+    change_type is one of "creation", "deletion", "propertyChange" or
+    "reconciliation".
+    """
+
+    def __init__(
+        self,
+        object_type,
+        object_id,
+        change_type,
+        property_name=None,
+        property_value=None,
+        occurred_at=None,
+        event_id=None,
+        subscription_id=None,
+    ):
+        self.object_type = object_type
+        self.object_id = object_id
+        self.change_type = change_type
+        self.property_name = property_name
+        self.property_value = property_value
+        self.occurred_at = occurred_at
+        self.event_id = event_id
+        self.subscription_id = subscription_id
+
+    @property
+    def event_key(self):
+        """
+        Identifies the webhook event the record came from, or is None for
+        records from elsewhere. hubspot doesn't guarantee event ids are unique
+        across subscriptions and objects, so they're only part of it.
+        """
+        if self.event_id is None:
+            return None
+        return (
+            self.subscription_id,
+            self.event_id,
+            self.object_id,
+            self.property_name,
+            self.occurred_at,
+        )
+
+    @classmethod
+    def from_event(cls, event):
+        """
+        Creates a ChangeRecord from a webhook event, whose subscriptionType is
+        e.g. "deal.propertyChange".
+        """
+        object_type, change_type = event["subscriptionType"].split(".", 1)
+        return cls(
+            object_type=object_type,
+            object_id=str(event["objectId"]),
+            change_type=change_type,
+            property_name=event.get("propertyName"),
+            property_value=event.get("propertyValue"),
+            occurred_at=event.get("occurredAt"),
+            event_id=event.get("eventId"),
+            subscription_id=event.get("subscriptionId"),
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, ChangeRecord) and vars(self) == vars(other)
+
+    def __repr__(self):
+        return (
+            f"ChangeRecord({self.object_type!r}, {self.object_id!r}, "
+            f"{self.change_type!r}, {self.property_name!r})"
+        )
+
+
+class FailedBatch:
+    def __init__(self, records, exception):
+        self.records = records
+        self.exception = exception
+
+    def __repr__(self):
+        return f"FailedBatch({len(self.records)} records, {self.exception!r})"
+
+
+class ChangeBatcher:
+    """
+    Collects change records and hands them to the handler in batches of up to
+    max_batch_size, or after max_wait seconds, from a background thread.
+    Events hubspot retries are only handed on once.
+    Batches the handler raises on are passed to on_error as a FailedBatch
+    where given, as well as being kept in failed, so they can be handled
+    again, and later batches are still handed on.
+    """
+
+    def __init__(
+        self,
+        handler,
+        max_batch_size=CHANGE_BATCH_SIZE,
+        max_wait=CHANGE_BATCH_WAIT,
+        on_error=None,
+    ):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.on_error = on_error
+        self.failed = []
+        self._records = []
+        self._seen_events = OrderedDict()
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, records):
+        with self._condition:
+            for record in records:
+                key = record.event_key
+                if key is not None:
+                    if key in self._seen_events:
+                        continue
+                    self._seen_events[key] = None
+                    if len(self._seen_events) > SEEN_EVENTS_LIMIT:
+                        self._seen_events.popitem(last=False)
+                self._records.append(record)
+            if len(self._records) >= self.max_batch_size:
+                self._condition.notify_all()
+
+    def _take_batch(self):
+        size = self.max_batch_size
+        with self._condition:
+            batch, self._records = self._records[:size], self._records[size:]
+            return batch
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed or len(self._records) >= self.max_batch_size,
+                    timeout=self.max_wait,
+                )
+                if self._closed:
+                    return
+            self.flush()
+
+    def _record_failure(self, failures, batch, exception):
+        failure = FailedBatch(batch, exception)
+        failures.append(failure)
+        self.failed.append(failure)
+        if self.on_error is not None:
+            call_on_error(self.on_error, failure)
+        else:
+            print(f"Exception when handling changes: {exception}\n")
+
+    def flush(self):
+        """
+        Hands all the records collected so far to the handler, returning a
+        list of the FailedBatches of this flush.
+        """
+        failures = []
+        batch = self._take_batch()
+        while batch:
+            try:
+                self.handler(batch)
+            except Exception as e:
+                self._record_failure(failures, batch, e)
+            batch = self._take_batch()
+        return failures
+
+    def close(self):
+        """
+        Stops the background thread and hands on any remaining records,
+        returning a list of the FailedBatches of the final flush.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+        return self.flush()
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        receiver = self.server.receiver
+        if self.path.split("?")[0] != receiver.path:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        uri = f"{receiver.public_url or 'http://' + self.headers['Host']}{self.path}"
+        try:
+            validate_signature(receiver.client_secret, self.headers, "POST", uri, body)
+        except InvalidSignatureError:
+            self.send_response(401)
+            self.end_headers()
+            return
+
+        try:
+            records = [ChangeRecord.from_event(x) for x in json.loads(body)]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_response(400)
+            self.end_headers()
+            return
+
+        receiver.batcher.add(records)
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookReceiver:
+    """
+    Receives hubspot webhook requests on the given host, port and path,
+    validating their signatures with the app's client_secret and turning
+    their creation, deletion and propertyChange events into ChangeRecords,
+    handed to the handler in batches. Batches the handler fails on are
+    passed to on_error, see ChangeBatcher.
+    public_url is the url hubspot is configured to send webhooks to, minus
+    the path, which v2 and v3 signatures are made with. Where it isn't given
+    it defaults to the url the request was received on.
+    Run it with start() and stop(), or as a context manager.
+    """
+
+    def __init__(
+        self,
+        client_secret,
+        handler,
+        host="0.0.0.0",
+        port=8080,
+        path="/webhooks",
+        public_url=None,
+        max_batch_size=CHANGE_BATCH_SIZE,
+        max_wait=CHANGE_BATCH_WAIT,
+        on_error=None,
+    ):
+        self.client_secret = client_secret
+        self.path = path
+        self.public_url = public_url
+        self.batcher = ChangeBatcher(
+            handler,
+            max_batch_size=max_batch_size,
+            max_wait=max_wait,
+            on_error=on_error,
+        )
+        self._server = ThreadingHTTPServer((host, port), _WebhookHandler)
+        self._server.receiver = self
+        self._thread = None
+
+    @property
+    def port(self):
+        return self._server.server_port
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops receiving webhooks and hands on any changes still held.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+        self.batcher.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def reconciliation_sweep(client, since, object_types=("deal", "ticket")):
+    """
+    Yields a "reconciliation" ChangeRecord for each deal and ticket modified
+    since the given (timezone aware) datetime, searched for on
+    hs_lastmodifieddate, to catch any changes missed by the webhooks. Meant to
+    be run periodically, rather than polling for every change.
+    """
+    # Deals are searched in id order, as in export_shard, so there can be more
+    # than the 10,000 results the search after cursor stops at
+    modified = Filter(
+        property_name="hs_lastmodifieddate",
+        operator="GT",
+        value=str(int(since.timestamp() * 1000)),
+    )
+    sweeps = {
+        "deal": lambda: export_shard(
+            client, "deal", {"start": 0, "end": None}, filters=[modified]
+        ),
+        "ticket": lambda: client.find_all_tickets(
+            filter_name="hs_lastmodifieddate", filter_value=since
+        ),
+    }
+    for object_type in object_types:
+        for batch in sweeps[object_type]():
+            for x in batch:
+                yield ChangeRecord(
+                    object_type=object_type,
+                    object_id=x.id,
+                    change_type="reconciliation",
+                    occurred_at=x.updated_at,
+                )
@@ -0,0 +1,107 @@
+import json
+import os
+from pathlib import Path
+
+DAY = 24 * 60 * 60 * 1000
+MIN_WINDOW_SIZE = 60 * 1000
+# Aim for each window to hold around this many events, so each one is a
+# handful of pages
+TARGET_WINDOW_EVENTS = 10000
+
+
+class TimeWindowPlanner:
+    """
+    Splits the range of epoch milliseconds [start, end) into windows, handed
+    out in order by next_window.
+    The size of each new window is adapted to the density of events seen in
+    the windows completed so far, aiming for target_events per window, so
+    sparse periods are covered by a few wide windows and busy periods by many
+    narrow ones.
+    Any completed windows given (e.g. from a checkpoint) are skipped over.
+    """
+
+    def __init__(
+        self,
+        start,
+        end,
+        window_size=DAY,
+        target_events=TARGET_WINDOW_EVENTS,
+        min_window_size=MIN_WINDOW_SIZE,
+        max_window_size=None,
+        completed=(),
+    ):
+        self.start = start
+        self.end = end
+        self.window_size = window_size
+        self.target_events = target_events
+        self.min_window_size = min_window_size
+        self.max_window_size = max_window_size or max(end - start, min_window_size)
+        self.completed = sorted(tuple(x) for x in completed)
+        self._cursor = start
+
+    def _skip_completed(self):
+        for completed_start, completed_end in self.completed:
+            if completed_start <= self._cursor < completed_end:
+                self._cursor = completed_end
+
+    def next_window(self):
+        """
+        Returns the next (start, end) window to fetch or None if the whole
+        range has been handed out.
+        """
+        self._skip_completed()
+        if self._cursor >= self.end:
+            return None
+
+        window_end = min(self._cursor + int(self.window_size), self.end)
+        # Stop short of any completed window so it isn't fetched again
+        for completed_start, _ in self.completed:
+            if self._cursor < completed_start < window_end:
+                window_end = completed_start
+
+        window = (self._cursor, window_end)
+        self._cursor = window_end
+        return window
+
+    def complete(self, window, event_count):
+        """
+        Records the number of events found in the window and resizes the
+        windows still to be handed out based on the density of events.
+        """
+        window_start, window_end = window
+        if event_count:
+            density = event_count / max(window_end - window_start, 1)
+            suggested_size = self.target_events / density
+        else:
+            suggested_size = self.window_size * 2
+
+        # Move halfway towards the suggested size to smooth out bursts
+        window_size = (self.window_size + suggested_size) / 2
+        self.window_size = min(
+            max(window_size, self.min_window_size), self.max_window_size
+        )
+
+
+class WindowCheckpoint:
+    """
+    Keeps track of the completed windows of a range in a json file, so an
+    interrupted extraction can be resumed without fetching them again.
+    Where no path is given, it only keeps track in memory.
+    """
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else None
+        self.completed = []
+        if self.path and self.path.exists():
+            with open(self.path) as f:
+                self.completed = [tuple(x) for x in json.load(f)["completed"]]
+
+    def mark_complete(self, window):
+        self.completed.append(tuple(window))
+        if self.path:
+            # Write to a temp file and swap it in so a crash mid write
+            # doesn't lose the checkpoint
+            temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(temp_path, "w") as f:
+                json.dump({"completed": sorted(self.completed)}, f)
+            os.replace(temp_path, self.path)
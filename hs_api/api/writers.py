@@ -0,0 +1,133 @@
+import csv
+import json
+import os
+from itertools import islice
+
+FORMATS = ("jsonl", "csv", "parquet")
+# Rows written to parquet at a time, so only a row group is held in memory
+PARQUET_ROW_GROUP_SIZE = 10000
+
+
+def flatten_record(record):
+    """
+    Flattens a record (as a dict) into one row, lifting the properties of
+    crm objects up alongside their id and dates, where they don't clash, and
+    json encoding any other nested values.
+    """
+    row = dict()
+    for key, value in record.items():
+        if key == "properties" and isinstance(value, dict):
+            continue
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, default=str)
+        row[key] = value
+    for key, value in (record.get("properties") or dict()).items():
+        row.setdefault(key, value)
+    return row
+
+
+def _rows(jsonl_path):
+    with open(jsonl_path) as f:
+        for line in f:
+            yield flatten_record(json.loads(line))
+
+
+def _columns(jsonl_path):
+    # Rows can have different keys, e.g. email events of different types, so
+    # the columns are all the keys seen, in the order first seen
+    columns = dict()
+    for row in _rows(jsonl_path):
+        columns.update(dict.fromkeys(row))
+    return list(columns)
+
+
+def _write_csv(jsonl_path, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=_columns(jsonl_path))
+        writer.writeheader()
+        writer.writerows(_rows(jsonl_path))
+
+
+def import_pyarrow():
+    """
+    Returns the pyarrow and pyarrow.parquet modules, imported when first
+    needed as pyarrow is only installed with the parquet extra.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "pyarrow is needed to write parquet, install hubspot-api[parquet]"
+        )
+    return pa, pq
+
+
+def write_parquet_rows(
+    path, schema, rows, to_table, row_group_size=PARQUET_ROW_GROUP_SIZE
+):
+    """
+    Writes the rows to a parquet file at path with the schema, a row group of
+    up to row_group_size rows at a time turned into a pyarrow Table by
+    to_table, so the rows are never all held in memory. Returns the number of
+    rows written.
+    """
+    _, pq = import_pyarrow()
+    rows = iter(rows)
+    written = 0
+    with pq.ParquetWriter(str(path), schema) as writer:
+        while True:
+            row_group = list(islice(rows, row_group_size))
+            if not row_group:
+                break
+            writer.write_table(to_table(row_group))
+            written += len(row_group)
+        if not written:
+            writer.write_table(schema.empty_table())
+    return written
+
+
+def _write_parquet(jsonl_path, path):
+    pa, _ = import_pyarrow()
+    columns = _columns(jsonl_path)
+    # Hubspot returns property values as strings, so everything is written as
+    # strings, with other values json encoded
+    schema = pa.schema([(x, pa.string()) for x in columns])
+
+    def as_string(value):
+        if value is None or isinstance(value, str):
+            return value
+        return json.dumps(value)
+
+    def to_table(rows):
+        return pa.Table.from_pylist(
+            [{x: as_string(row.get(x)) for x in columns} for row in rows],
+            schema=schema,
+        )
+
+    write_parquet_rows(path, schema, _rows(jsonl_path), to_table)
+
+
+def convert_jsonl(jsonl_path, path, format):
+    """
+    Writes the records of the json lines file to path in the given format,
+    one of FORMATS, then removes the json lines file. csv and parquet files
+    are flattened to one column per property.
+    The records are read back from the file rather than held in memory, as
+    csv and parquet need all their columns up front.
+    """
+    if format not in FORMATS:
+        raise ValueError(
+            f"'{format}' is not a valid format. Must be one of {', '.join(FORMATS)}."
+        )
+    if format == "jsonl":
+        os.replace(jsonl_path, path)
+        return
+
+    temp_path = f"{path}.tmp"
+    if format == "csv":
+        _write_csv(jsonl_path, temp_path)
+    else:
+        _write_parquet(jsonl_path, temp_path)
+    os.replace(temp_path, path)
+    os.remove(jsonl_path)
@@ -0,0 +1,455 @@
+"""
+The hs-api command, for bulk exports of hubspot objects to json lines, csv or
+parquet files, e.g.
+
+    hs-api export deals --since 2022-01-01 --workers 8 --format parquet --out deals
+"""
+
+import argparse
+import importlib.util
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from hubspot.crm.contacts import Filter
+
+from hs_api.api.hubspot_api import HubSpotClient, convert_date_to_epoch
+from hs_api.api.sharding import export_shard, plan_shards
+from hs_api.api.transport import HUBSPOT_API_URL
+from hs_api.api.windows import TimeWindowPlanner, WindowCheckpoint
+from hs_api.api.writers import FORMATS, convert_jsonl
+from hs_api.settings.settings import HUBSPOT_ACCESS_TOKEN
+
+OBJECTS = ("deals", "tickets", "contacts-in-list", "contact-lists", "email-events")
+WORKERS = 4
+# Deals and tickets are split into this many shards per worker, so workers
+# that finish early can take on more
+SHARDS_PER_WORKER = 4
+# Hours of email events in the first parts, later parts being resized to the
+# density of events found
+EMAIL_EVENT_WINDOW_HOURS = 24
+# Seconds between updates of the live progress
+PROGRESS_INTERVAL = 1
+PLAN_FILE = "plan.json"
+# Where the time windows of email events already exported are recorded
+CHECKPOINT_FILE = "windows.json"
+
+
+class UsageError(ValueError):
+    """
+    An error in how the command was run, e.g. options that don't match those
+    of the export being resumed, reported as a usage error.
+    """
+
+
+def parse_datetime(value):
+    """
+    Parses an ISO format date or datetime, taken to be UTC where no timezone
+    is given.
+    """
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class Progress:
+    """
+    Thread safe counts of the records and requests of an export, shown live
+    on stream every interval seconds while running.
+    Requests are the raw api requests counted by the client's transport plus
+    the sdk pages counted by the export. parts is None where the parts are
+    planned as the export runs.
+    """
+
+    def __init__(self, client, parts, stream=sys.stderr, interval=PROGRESS_INTERVAL):
+        self._client = client
+        self.stream = stream
+        self.interval = interval
+        self.parts = parts
+        self.parts_done = 0
+        self.parts_resumed = 0
+        self.parts_failed = 0
+        self.part_seconds = []
+        self.records = 0
+        self.sdk_requests = 0
+        self.start = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def requests(self):
+        return self.sdk_requests + self._client.transport_stats["requests"]
+
+    def add_records(self, count, sdk_requests=0):
+        with self._lock:
+            self.records += count
+            self.sdk_requests += sdk_requests
+
+    def part_done(self, seconds=None, resumed=False, failed=False):
+        with self._lock:
+            if resumed:
+                self.parts_resumed += 1
+            elif failed:
+                self.parts_failed += 1
+            else:
+                self.parts_done += 1
+                self.part_seconds.append(seconds)
+
+    def line(self):
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        requests = self.requests
+        finished = self.parts_done + self.parts_resumed + self.parts_failed
+        parts = finished if self.parts is None else f"{finished}/{self.parts}"
+        return (
+            f"{self.records} records ({self.records / elapsed:.1f}/s), "
+            f"{requests} requests ({requests / elapsed:.1f}/s), "
+            f"{parts} parts"
+        )
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.stream.write(f"\r{self.line()}")
+            self.stream.flush()
+
+    def show(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+            self.stream.write("\n")
+
+    def summary(self):
+        elapsed = max(time.monotonic() - self.start, 1e-9)
+        transport = self._client.transport_stats
+        lines = [
+            f"Exported {self.records} records in {elapsed:.1f}s",
+            f"  records/sec:  {self.records / elapsed:.1f}",
+            f"  requests:     {self.requests} ({self.requests / elapsed:.1f}/s)",
+            f"  parts:        {self.parts_done} exported, "
+            f"{self.parts_resumed} resumed, {self.parts_failed} failed",
+        ]
+        if self.part_seconds:
+            lines.append(
+                f"  part time:    {sum(self.part_seconds) / len(self.part_seconds):.1f}s "
+                f"mean, {max(self.part_seconds):.1f}s slowest"
+            )
+        if transport["requests"]:
+            lines.append(
+                f"  raw api time: {transport['network_seconds']:.1f}s network, "
+                f"{transport['decode_seconds']:.1f}s decoding json"
+            )
+        return "\n".join(lines)
+
+
+def plan_parts(client, options, workers):
+    """
+    Splits the export into parts that can be exported by separate workers:
+    hs_object_id shards of deals and tickets and each contact list of
+    contacts-in-list. Email events are planned as one range, split into time
+    windows as it is exported by export_windows.
+    """
+    object_name = options["object"]
+    if object_name in ("deals", "tickets"):
+        return plan_shards(client, object_name[:-1], workers * SHARDS_PER_WORKER)
+    if object_name == "email-events":
+        end = options["until"] or int(time.time() * 1000)
+        return [{"index": 0, "start": options["since"] or 0, "end": end}]
+    if object_name == "contacts-in-list":
+        return [{"index": i, "list_id": x} for i, x in enumerate(options["list_ids"])]
+    return [{"index": 0}]
+
+
+def load_plan(client, out, options, workers):
+    """
+    Returns the parts of the export to out, planning them where this is a
+    new export, otherwise those planned when it was started so it can be
+    resumed.
+    """
+    plan_path = out / PLAN_FILE
+    if plan_path.exists():
+        with open(plan_path) as f:
+            plan = json.load(f)
+        if plan["options"] != options:
+            raise UsageError(
+                f"{out} holds an export with different options, "
+                f"use another --out to start a new export"
+            )
+        return plan["parts"], True
+
+    parts = plan_parts(client, options, workers)
+    out.mkdir(parents=True, exist_ok=True)
+    with open(plan_path, "w") as f:
+        json.dump({"options": options, "parts": parts}, f)
+    return parts, False
+
+
+def part_path(out, part, format):
+    return out / f"part-{part['index']:05d}.{format}"
+
+
+def part_pages(client, options, part, progress):
+    """
+    Yields the pages of records, as dicts, of the part.
+    """
+    object_name = options["object"]
+    if object_name in ("deals", "tickets"):
+        filters = []
+        if options["since"]:
+            filters.append(
+                Filter(
+                    property_name="hs_lastmodifieddate",
+                    operator="GT",
+                    value=str(options["since"]),
+                )
+            )
+        for page in export_shard(
+            client, object_name[:-1], part, options["properties"], filters
+        ):
+            progress.add_records(0, sdk_requests=1)
+            yield [x.to_dict() for x in page]
+    elif object_name == "contacts-in-list":
+        yield client.find_all_contacts_in_list(part["list_id"])
+    else:
+        yield from client._contact_list_pages()
+
+
+def export_part(client, options, part, out, progress):
+    """
+    Exports the records of the part to its own file, first written as json
+    lines and then converted to the export's format, so a part file only
+    exists once the part is complete. Returns the number of records.
+    """
+    start = time.monotonic()
+    path = part_path(out, part, options["format"])
+    jsonl_path = path.with_suffix(".jsonl.tmp")
+    records = 0
+    with open(jsonl_path, "w") as f:
+        for page in part_pages(client, options, part, progress):
+            for record in page:
+                f.write(json.dumps(record, default=str) + "\n")
+            progress.add_records(len(page))
+            records += len(page)
+    convert_jsonl(jsonl_path, path, options["format"])
+    progress.part_done(seconds=time.monotonic() - start)
+    return records
+
+
+def export_windows(client, options, part, out, checkpoint, workers, progress):
+    """
+    Exports the email events of the part in time windows fetched by the
+    workers, resized to the density of events found as they are, each window
+    being a part of its own named by its start. Completed windows are
+    recorded in the WindowCheckpoint and skipped when the export is resumed.
+    Returns the failed windows' parts and exceptions.
+    """
+    planner = TimeWindowPlanner(
+        part["start"],
+        part["end"],
+        window_size=options["window_hours"] * 60 * 60 * 1000,
+        completed=checkpoint.completed,
+    )
+    # The open json lines files and start times of the windows being exported
+    files = dict()
+    starts = dict()
+    failures = []
+    try:
+        for kind, window, payload in client._email_event_windows(
+            planner, checkpoint, workers
+        ):
+            part = {"index": window[0], "start": window[0], "end": window[1]}
+            path = part_path(out, part, options["format"])
+            jsonl_path = path.with_suffix(".jsonl.tmp")
+            if window not in files:
+                files[window] = open(jsonl_path, "w")
+                starts[window] = time.monotonic()
+
+            if kind == "events":
+                for record in payload:
+                    files[window].write(json.dumps(record, default=str) + "\n")
+                progress.add_records(len(payload))
+                continue
+
+            files.pop(window).close()
+            seconds = time.monotonic() - starts.pop(window)
+            if kind == "error":
+                progress.part_done(failed=True)
+                failures.append((part, payload))
+            else:
+                convert_jsonl(jsonl_path, path, options["format"])
+                progress.part_done(seconds=seconds)
+    finally:
+        for f in files.values():
+            f.close()
+    return failures
+
+
+def export(args, stream=None):
+    """
+    Runs an export, returning the exit code of the command. Progress is
+    written to stream, stderr by default.
+    """
+    stream = stream or sys.stderr
+    client = HubSpotClient(access_token=args.access_token, api_url=args.api_url)
+    if args.properties and args.object in ("deals", "tickets"):
+        try:
+            client.property_registry.validate(args.object[:-1], args.properties)
+        except ValueError as e:
+            raise UsageError(str(e)) from e
+
+    out = Path(args.out)
+    options = {
+        "object": args.object,
+        "format": args.format,
+        "since": convert_date_to_epoch(args.since) if args.since else None,
+        "until": convert_date_to_epoch(args.until) if args.until else None,
+        "properties": args.properties,
+        "list_ids": args.list_id,
+        "window_hours": args.window_hours,
+    }
+    parts, resumed = load_plan(client, out, options, args.workers)
+
+    progress = Progress(client, len(parts), stream=stream)
+    pending = []
+    checkpoint = None
+    if args.object == "email-events":
+        checkpoint = WindowCheckpoint(out / CHECKPOINT_FILE)
+        # The windows aren't known until they're exported
+        progress.parts = None
+        for _ in checkpoint.completed:
+            progress.part_done(resumed=True)
+    else:
+        for part in parts:
+            if part_path(out, part, args.format).exists():
+                progress.part_done(resumed=True)
+            else:
+                pending.append(part)
+    if resumed:
+        total = "" if checkpoint else f" of {len(parts)}"
+        stream.write(
+            f"Resuming export to {out}, {progress.parts_resumed}{total} "
+            f"parts already exported\n"
+        )
+
+    failures = []
+
+    def export_pending(part):
+        try:
+            export_part(client, options, part, out, progress)
+        except Exception as e:
+            progress.part_done(failed=True)
+            failures.append((part, e))
+
+    if not args.quiet:
+        progress.show()
+    try:
+        if checkpoint is not None:
+            failures = export_windows(
+                client, options, parts[0], out, checkpoint, args.workers, progress
+            )
+        else:
+            with ThreadPoolExecutor(max_workers=args.workers) as executor:
+                list(executor.map(export_pending, pending))
+    finally:
+        progress.stop()
+
+    stream.write(progress.summary() + "\n")
+    for part, e in failures:
+        stream.write(f"Part {part['index']} failed: {e!r}\n")
+    if failures:
+        stream.write("Run the same command again to retry the failed parts\n")
+        return 1
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="hs-api", description=__doc__.split("\n\n")[0]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser(
+        "export",
+        help="export hubspot objects to files",
+        description=(
+            "Exports the objects to part files in the --out directory, "
+            "exported in parallel by the workers. Running the same command "
+            "again resumes an interrupted export, skipping the parts already "
+            "exported."
+        ),
+    )
+    export_parser.add_argument("object", choices=OBJECTS)
+    export_parser.add_argument(
+        "--out", required=True, help="the directory to write the part files to"
+    )
+    export_parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    export_parser.add_argument("--workers", type=int, default=WORKERS)
+    export_parser.add_argument(
+        "--since",
+        type=parse_datetime,
+        help="only export deals and tickets modified, or email events created, "
+        "after this date or datetime (ISO format, UTC by default)",
+    )
+    export_parser.add_argument(
+        "--until",
+        type=parse_datetime,
+        help="only export email events created before this, defaults to now",
+    )
+    export_parser.add_argument(
+        "--properties",
+        type=lambda x: x.split(","),
+        help="comma separated properties of deals or tickets to export",
+    )
+    export_parser.add_argument(
+        "--list-id",
+        action="append",
+        help="the id of a contact list to export the contacts of, can be repeated",
+    )
+    export_parser.add_argument(
+        "--window-hours",
+        type=int,
+        default=EMAIL_EVENT_WINDOW_HOURS,
+        help="the hours of email events in the first parts, later parts being "
+        "resized to the density of events found",
+    )
+    export_parser.add_argument(
+        "--quiet", action="store_true", help="don't show live progress"
+    )
+    export_parser.add_argument("--access-token", default=HUBSPOT_ACCESS_TOKEN)
+    export_parser.add_argument("--api-url", default=HUBSPOT_API_URL)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.object == "contacts-in-list" and not args.list_id:
+        parser.error("contacts-in-list needs at least one --list-id")
+    if args.since and args.object not in ("deals", "tickets", "email-events"):
+        parser.error(f"--since is not supported for {args.object}")
+    if args.until and args.object != "email-events":
+        parser.error(f"--until is not supported for {args.object}")
+    if args.properties and args.object not in ("deals", "tickets"):
+        parser.error(f"--properties is not supported for {args.object}")
+    if args.format == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        parser.error("pyarrow is needed for parquet, install hubspot-api[parquet]")
+    if not args.access_token:
+        parser.error("--access-token or HUBSPOT_ACCESS_TOKEN must be set")
+
+    try:
+        return export(args)
+    except UsageError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
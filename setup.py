@@ -4,10 +4,12 @@ from setuptools import find_packages
 
 setup(
     name="hubspot-api",
-    version="1.2.3",
+    version="1.3.0",
     description="Superscript Hubspot API",
     author="Superscript",
     author_email="paul.lucas@gosuperscript.com",
     install_requires=["requests", "python-dotenv>=0.19.2", "hubspot-api-client>=5.0.1"],
+    extras_require={"parquet": ["pyarrow"]},
     packages=find_packages(include=["hs_api*"]),
+    entry_points={"console_scripts": ["hs-api=hs_api.cli:main"]},
 )
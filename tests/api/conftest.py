@@ -0,0 +1,123 @@
+import json
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+
+class MockRequest:
+    """
+    A request made to a MockServer, as passed to the route handling it.
+    match is the match of the route's path pattern against the path.
+    """
+
+    def __init__(self, server, handler, match=None):
+        url = urlparse(handler.path)
+        self.server = server
+        self.method = handler.command
+        self.path = url.path
+        self.query = parse_qs(url.query)
+        self.headers = handler.headers
+        self.client_address = handler.client_address
+        length = int(handler.headers.get("Content-Length") or 0)
+        self.body = handler.rfile.read(length) if length else b""
+        self.match = match
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    # Keep connections alive, as the api does
+    protocol_version = "HTTP/1.1"
+
+    def handle_request(self):
+        server = self.server
+        path = urlparse(self.path).path
+        for (method, pattern), route in server.routes.items():
+            match = re.fullmatch(pattern, path)
+            if method == self.command and match:
+                break
+        else:
+            route, match = None, None
+
+        request = MockRequest(server, self, match)
+        with server.lock:
+            server.requests.append(request)
+        self.send(*self.response(route(request) if route else (404, {})))
+
+    @staticmethod
+    def response(result):
+        """
+        Returns the status, body and headers of a route's result, which is
+        the body alone, a (status, body) or a (status, body, headers) tuple.
+        """
+        if not isinstance(result, tuple):
+            result = (200, result)
+        status, body, headers = (*result, dict())[:3]
+        if not isinstance(body, bytes):
+            body = json.dumps(body).encode()
+            headers = {"Content-Type": "application/json", **headers}
+        return status, body, headers
+
+    def send(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_request
+
+    def log_message(self, *args):
+        pass
+
+
+class MockServer(ThreadingHTTPServer):
+    """
+    A local stand-in for the HubSpot api, answering requests from a route
+    table of (method, path pattern) to the function handling them. Each
+    function is passed the MockRequest and returns the body of the
+    response, as json unless it is bytes, or a (status, body) or
+    (status, body, headers) tuple. The first route matching the whole path
+    is used, and requests matching no route are answered with a 404.
+    Every request is kept in requests, and tests can keep any state the
+    routes need as attributes of the server.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, routes):
+        super().__init__(("127.0.0.1", 0), MockHandler)
+        self.routes = routes
+        self.requests = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+@pytest.fixture()
+def mock_server():
+    """
+    Returns a function starting a MockServer for a route table, the servers
+    being shut down after the test.
+    """
+    servers = []
+
+    def start(routes):
+        server = MockServer(routes)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    try:
+        yield start
+    finally:
+        for server in servers:
+            server.shutdown()
+            server.server_close()
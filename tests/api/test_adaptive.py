@@ -0,0 +1,212 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from hubspot.crm.tickets import ApiException
+
+from hs_api.api import sharding
+from hs_api.api.adaptive import AIMDController, is_overloaded
+from hs_api.api.hubspot_api import BATCH_LIMITS, PAGE_LIMIT, HubSpotClient
+from hs_api.api.property_history import HISTORY_PAGE_LIMIT
+
+
+def fail_with(controller, name, exception):
+    with pytest.raises(type(exception)):
+        with controller.request(name):
+            raise exception
+
+
+def test_is_overloaded():
+    assert is_overloaded(ApiException(status=429))
+    assert is_overloaded(ApiException(status=502))
+    assert is_overloaded(TimeoutError())
+    assert not is_overloaded(ApiException(status=400))
+    assert not is_overloaded(ValueError())
+
+
+def test_healthy_requests_increase_additively():
+    controller = AIMDController(max_concurrency=4)
+    assert controller.page_size("search", 50, 100) == 50
+
+    for _ in range(3):
+        with controller.request("search"):
+            pass
+
+    assert controller.page_size("search", 50, 100) == 80
+    metrics = controller.metrics()
+    assert metrics["page_sizes"]["search"]["increases"] == 3
+    assert metrics["concurrency"] == 2
+
+
+def test_page_size_is_capped_at_maximum():
+    controller = AIMDController()
+    controller.page_size("search", 50, 100)
+
+    for _ in range(20):
+        with controller.request("search"):
+            pass
+
+    assert controller.page_size("search", 50, 100) == 100
+
+
+def test_page_size_is_capped_at_maximum_of_each_call():
+    controller = AIMDController()
+    controller.page_size("search", 50, 100)
+
+    for _ in range(5):
+        with controller.request("search"):
+            pass
+
+    assert controller.page_size("search", 50, 100) == 100
+    assert controller.page_size("search", 50, 50) == 50
+
+
+def test_throttle_decreases_multiplicatively_once_per_burst():
+    controller = AIMDController()
+    controller.page_size("search", 80, 100)
+
+    fail_with(controller, "search", ApiException(status=429))
+    fail_with(controller, "search", ApiException(status=429))
+
+    assert controller.page_size("search", 80, 100) == 40
+    metrics = controller.metrics()
+    assert metrics["page_sizes"]["search"]["decreases"] == 1
+    assert metrics["decisions"][-1]["decision"] == "decrease"
+
+
+def test_throttle_without_page_size_decreases_once_per_burst():
+    controller = AIMDController(max_concurrency=8)
+    for _ in range(20):
+        with controller.request("purge"):
+            pass
+    concurrency = controller.metrics()["concurrency"]
+
+    for _ in range(3):
+        fail_with(controller, "purge", ApiException(status=429))
+
+    assert controller.metrics()["concurrency"] == int(concurrency * 0.5)
+
+
+def test_page_size_is_kept_above_minimum():
+    controller = AIMDController(target_latency=0)
+    controller.page_size("search", 20, 100)
+
+    for _ in range(5):
+        fail_with(controller, "search", ApiException(status=503))
+
+    assert controller.page_size("search", 20, 100) == 10
+
+
+def test_request_errors_do_not_adapt():
+    controller = AIMDController()
+    controller.page_size("search", 50, 100)
+
+    fail_with(controller, "search", ApiException(status=400))
+
+    assert controller.page_size("search", 50, 100) == 50
+    assert controller.metrics()["decisions"] == []
+
+
+def test_concurrency_limits_requests_in_flight():
+    controller = AIMDController()
+    in_flight = []
+    most_in_flight = []
+    lock = threading.Lock()
+
+    def request():
+        with controller.request("search"):
+            with lock:
+                in_flight.append(1)
+                most_in_flight.append(len(in_flight))
+            time.sleep(0.05)
+            with lock:
+                in_flight.pop()
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Starts at one request in flight, growing as requests succeed
+    assert most_in_flight[0] == 1
+    assert max(most_in_flight) <= controller.metrics()["concurrency"]
+
+
+def test_client_adapts_ticket_page_size():
+    client = HubSpotClient(
+        access_token="token", pipeline_id="pipeline", adaptive=AIMDController()
+    )
+    limits = []
+
+    def do_search(public_object_search_request):
+        limits.append(public_object_search_request.limit)
+        paging = (
+            None if len(limits) == 5 else SimpleNamespace(next=SimpleNamespace(after=1))
+        )
+        return SimpleNamespace(results=[], paging=paging)
+
+    client._client.crm.tickets.search_api.do_search = do_search
+    list(client.find_all_tickets())
+
+    assert limits == [BATCH_LIMITS, 60, 70, 80, 90]
+    assert (
+        client.adaptive_metrics["page_sizes"]["ticket_search"]["page_size"]
+        == PAGE_LIMIT
+    )
+
+
+def test_client_sizes_deal_history_pages_separately():
+    client = HubSpotClient(
+        access_token="token",
+        pipeline_id="pipeline",
+        adaptive=AIMDController(),
+        validate_properties=False,
+    )
+    limits = []
+
+    def get_page(limit, **kwargs):
+        limits.append(limit)
+        paging = (
+            None
+            if len(limits) % 6 == 0
+            else SimpleNamespace(next=SimpleNamespace(after=1))
+        )
+        return SimpleNamespace(results=[], paging=paging)
+
+    client._client.crm.deals.basic_api.get_page = get_page
+    list(client.find_all_deals())
+    list(client.find_all_deals(properties_with_history=["amount"]))
+
+    assert limits[5] == PAGE_LIMIT
+    assert max(limits[6:]) <= HISTORY_PAGE_LIMIT
+
+
+def test_client_without_controller_has_no_metrics():
+    client = HubSpotClient(access_token="token", pipeline_id="pipeline")
+
+    assert client.adaptive_metrics is None
+
+
+def test_client_shrinks_shard_pages_on_throttle(monkeypatch):
+    monkeypatch.setattr(sharding, "SHARD_RETRY_WAIT", 0)
+    client = HubSpotClient(
+        access_token="token", pipeline_id="pipeline", adaptive=AIMDController()
+    )
+    limits = []
+
+    def do_search(public_object_search_request):
+        limits.append(public_object_search_request.limit)
+        if len(limits) == 1:
+            raise ApiException(status=429)
+        deal = SimpleNamespace(id=str(len(limits)))
+        paging = object() if len(limits) < 3 else None
+        return SimpleNamespace(results=[deal], paging=paging)
+
+    client.search_lookup["deal"] = do_search
+    list(sharding.export_shard(client, "deal", {"start": 0, "end": None}))
+
+    # The throttled search is retried as it was, and the next page halved
+    # then grown again by the retry's success
+    assert limits == [PAGE_LIMIT, PAGE_LIMIT, PAGE_LIMIT // 2 + 10]
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from hs_api.api.hubspot_api import CRM_API_EXCEPTIONS, HubSpotClient
+
+
+def batch_archive(request):
+    ids = [x["id"] for x in request.json()["inputs"]]
+    request.server.batches.append(ids)
+    if "bad" in ids:
+        return 400, {"status": "error", "message": "Invalid id"}
+    return 204, b""
+
+
+def archive(request):
+    object_id = request.match.group(1)
+    request.server.archived.append(object_id)
+    if object_id == "bad":
+        return 404, {"status": "error", "message": "Not found"}
+    return 204, b""
+
+
+def gdpr_delete(request):
+    server = request.server
+    object_id = request.json()["objectId"]
+    with server.lock:
+        server.in_flight += 1
+        server.most_in_flight = max(server.most_in_flight, server.in_flight)
+    time.sleep(0.05)
+    with server.lock:
+        server.in_flight -= 1
+    if object_id == "bad":
+        return 400, {"status": "error", "message": "Invalid id"}
+    return 204, b""
+
+
+@pytest.fixture()
+def server(mock_server):
+    server = mock_server(
+        {
+            ("POST", "/crm/v3/objects/deals/batch/archive"): batch_archive,
+            ("DELETE", "/crm/v3/objects/deals/(.+)"): archive,
+            ("POST", "/crm/v3/objects/contacts/gdpr-delete"): gdpr_delete,
+        }
+    )
+    server.batches = []
+    server.archived = []
+    server.in_flight = 0
+    server.most_in_flight = 0
+    return server
+
+
+@pytest.fixture()
+def client(server):
+    return HubSpotClient(
+        access_token="token",
+        pipeline_id="pipeline",
+        api_url=server.url,
+        validate_properties=False,
+    )
+
+
+def test_archive_deals_in_batches(server, client):
+    deal_ids = [str(x) for x in range(120)]
+
+    results = client.archive_deals(deal_ids)
+
+    assert [len(x) for x in server.batches] == [50, 50, 20]
+    assert server.archived == []
+    assert results == {x: True for x in deal_ids}
+
+
+def test_archive_deals_falls_back_to_each_when_batch_fails(server, client):
+    results = client.archive_deals(["1", "bad", "3"])
+
+    assert server.batches == [["1", "bad", "3"]]
+    assert server.archived == ["1", "bad", "3"]
+    assert results["1"] is True and results["3"] is True
+    assert isinstance(results["bad"], CRM_API_EXCEPTIONS)
+    assert results["bad"].status == 404
+
+
+def test_purge_contacts_returns_result_of_each(server, client):
+    results = client.purge_contacts(["1", "bad", "3"])
+
+    assert list(results) == ["1", "bad", "3"]
+    assert results["1"] is True and results["3"] is True
+    assert isinstance(results["bad"], CRM_API_EXCEPTIONS)
+    assert results["bad"].status == 400
+
+
+def test_purge_contacts_bounds_concurrency(server, client):
+    results = client.purge_contacts([str(x) for x in range(8)], max_workers=3)
+
+    assert all(x is True for x in results.values())
+    assert server.most_in_flight == 3
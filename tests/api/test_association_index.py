@@ -0,0 +1,165 @@
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from hs_api.api.association_index import AssociationIndex
+from hs_api.api.hubspot_api import HubSpotClient
+
+
+def test_add_indexes_both_directions():
+    index = AssociationIndex()
+    index.add("deal", "1", "company", "10")
+    index.add("deal", "2", "company", "10")
+
+    assert index.associated("deal", "1", "company") == ["10"]
+    assert index.associated("company", "10", "deal") == ["1", "2"]
+    assert len(index) == 2
+
+
+def test_add_ignores_duplicate_associations():
+    index = AssociationIndex()
+    index.add("deal", "1", "contact", "20")
+    index.add("contact", "20", "deal", "1")
+
+    assert index.associated("deal", "1", "contact") == ["20"]
+    assert len(index) == 1
+
+
+def test_associated_without_associations_returns_empty():
+    index = AssociationIndex()
+    index.add("deal", "1", "contact", "20")
+
+    assert index.associated("deal", "2", "contact") == []
+    assert index.associated("deal", "1", "company") == []
+
+
+def test_add_objects_uses_plural_association_keys():
+    deal = SimpleNamespace(
+        id="1",
+        associations={
+            "contacts": SimpleNamespace(results=[SimpleNamespace(id="20")]),
+            "companies": SimpleNamespace(results=[SimpleNamespace(id="10")]),
+        },
+    )
+    index = AssociationIndex()
+    index.add_objects("deal", [deal])
+
+    assert index.associated("contact", "20", "deal") == ["1"]
+    assert index.associated("companies", "10", "deals") == ["1"]
+
+
+def test_add_many_associations_to_one_object():
+    index = AssociationIndex()
+    for deal_id in range(30000):
+        index.add("deal", deal_id, "company", "10")
+        index.add("company", "10", "deal", deal_id)
+
+    assert len(index) == 30000
+    assert index.associated("company", "10", "deal")[:3] == ["0", "1", "2"]
+    assert len(index.associated("company", "10", "deal")) == 30000
+
+
+def test_add_and_read_from_different_threads():
+    index = AssociationIndex()
+    errors = []
+
+    def fill():
+        for deal_id in range(20000):
+            index.add("deal", deal_id, "company", deal_id % 10)
+
+    # Switch threads often so the reads land part way through the adds
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        thread = threading.Thread(target=fill)
+        thread.start()
+        while thread.is_alive():
+            try:
+                index.associated("company", "1", "deal")
+                index.edge_count
+            except RuntimeError as e:
+                errors.append(e)
+        thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert len(index) == 20000
+
+
+def deal(deal_id, company_id):
+    return {
+        "id": deal_id,
+        "properties": {"dealname": f"Deal {deal_id}"},
+        "createdAt": "2022-01-01T00:00:00Z",
+        "updatedAt": "2022-01-01T00:00:00Z",
+        "archived": False,
+        "associations": {
+            "companies": {"results": [{"id": company_id, "type": "deal_to_company"}]}
+        },
+    }
+
+
+def list_deals(request):
+    page = int(request.query.get("after", ["0"])[0])
+    response = {"results": [deal(str(page * 2 + x), "10") for x in (1, 2)]}
+    if page < 2:
+        response["paging"] = {"next": {"after": str(page + 1)}}
+    return response
+
+
+def read_associations(request):
+    return {
+        "status": "COMPLETE",
+        "results": [
+            {"from": {"id": x["id"]}, "to": [{"id": "20", "type": "t"}]}
+            for x in request.json()["inputs"]
+        ],
+        "startedAt": "2022-01-01T00:00:00Z",
+        "completedAt": "2022-01-01T00:00:00Z",
+    }
+
+
+@pytest.fixture()
+def client(mock_server):
+    server = mock_server(
+        {
+            ("GET", "/crm/v3/objects/deals"): list_deals,
+            (
+                "POST",
+                "/crm/v3/associations/company/contact/batch/read",
+            ): read_associations,
+        }
+    )
+    return HubSpotClient(
+        access_token="token",
+        pipeline_id="pipeline",
+        api_url=server.url,
+        validate_properties=False,
+    )
+
+
+def test_find_all_deals_fills_index_with_read_ahead(client):
+    index = AssociationIndex()
+
+    seen = []
+    for batch in client.find_all_deals(association_index=index, read_ahead=2):
+        # The index is filled on the background thread while read here
+        seen.extend(x.id for x in batch)
+        assert set(seen) <= set(index.associated("company", "10", "deal"))
+
+    assert index.associated("company", "10", "deal") == ["1", "2", "3", "4", "5", "6"]
+    assert len(index) == 6
+
+
+def test_fill_association_index(client):
+    index = AssociationIndex()
+
+    assert client.fill_association_index(index, "company", ["10", "11"], "contact") is (
+        index
+    )
+
+    assert index.associated("company", "11", "contact") == ["20"]
+    assert index.associated("contact", "20", "company") == ["10", "11"]
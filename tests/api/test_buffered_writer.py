@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from hs_api.api.buffered_writer import BufferedWriter
+
+
+class FakeClient:
+    def __init__(self, failing_ids=()):
+        self.batches = []
+        self.failing_ids = failing_ids
+        self.flushed = threading.Event()
+        # The batch size an adaptive controller would choose
+        self.batch_size = None
+
+    def _page_size(self, name, default, maximum):
+        return self.batch_size or default
+
+    def _batch_update(self, object_name, updates, on_error=None):
+        self.batches.append((object_name, dict(updates)))
+        for object_id in updates:
+            if object_id in self.failing_ids:
+                on_error(object_id, ValueError(object_id))
+        self.flushed.set()
+
+
+def test_updates_to_same_object_are_merged():
+    client = FakeClient()
+    with BufferedWriter(client, flush_interval=60) as writer:
+        writer.update_contact(1, firstname="first")
+        writer.update_contact(1, lastname="last")
+        writer.update_contact(1, firstname="second")
+        writer.update_company(2, name="company")
+
+    assert client.batches == [
+        ("contact", {"1": {"firstname": "second", "lastname": "last"}}),
+        ("company", {"2": {"name": "company"}}),
+    ]
+
+
+def test_full_batch_is_flushed_in_background():
+    client = FakeClient()
+    writer = BufferedWriter(client, max_batch_size=2, flush_interval=60)
+    writer.update_contact(1, firstname="first")
+    writer.update_contact(2, firstname="second")
+
+    assert client.flushed.wait(timeout=5)
+    assert client.batches == [
+        ("contact", {"1": {"firstname": "first"}, "2": {"firstname": "second"}})
+    ]
+    writer.close()
+
+
+def test_batches_shrink_to_adaptive_batch_size():
+    client = FakeClient()
+    client.batch_size = 2
+    with BufferedWriter(client, flush_interval=60) as writer:
+        for object_id in range(5):
+            writer.update_contact(object_id, firstname="first")
+
+    assert [len(x[1]) for x in client.batches] == [2, 2, 1]
+
+
+def test_updates_are_flushed_after_flush_interval():
+    client = FakeClient()
+    writer = BufferedWriter(client, flush_interval=0.1)
+    writer.update_contact(1, firstname="first")
+
+    assert client.flushed.wait(timeout=5)
+    writer.close()
+
+
+def test_failed_updates_are_reported():
+    client = FakeClient(failing_ids=["2"])
+    errors = []
+    writer = BufferedWriter(client, flush_interval=60, on_error=errors.append)
+    writer.update_contact(1, firstname="first")
+    writer.update_contact(2, firstname="second")
+
+    failures = writer.flush()
+
+    assert [(x.object_id, x.properties) for x in failures] == [
+        ("2", {"firstname": "second"})
+    ]
+    assert errors == failures
+    assert writer.failed == failures
+    writer.close()
+
+
+def test_failing_on_error_does_not_stop_background_flushes():
+    client = FakeClient(failing_ids=["1"])
+
+    def on_error(failure):
+        raise RuntimeError("on_error failed")
+
+    writer = BufferedWriter(
+        client, max_batch_size=1, flush_interval=0.05, on_error=on_error
+    )
+    writer.update_contact(1, firstname="first")
+    time.sleep(0.2)
+    writer.update_contact(2, firstname="second")
+    time.sleep(0.2)
+
+    assert [x.object_id for x in writer.failed] == ["1"]
+    assert writer._thread.is_alive()
+    assert ("contact", {"2": {"firstname": "second"}}) in client.batches
+    writer.close()
+
+
+def test_update_after_close_raises_value_error():
+    writer = BufferedWriter(FakeClient(), flush_interval=60)
+    writer.close()
+
+    with pytest.raises(ValueError):
+        writer.update_contact(1, firstname="first")
@@ -0,0 +1,155 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from hs_api.api.cache import DiskCache, LRUCache, ResponseCache
+from hs_api.api.hubspot_api import HubSpotClient
+
+
+@pytest.fixture(params=["memory", "disk"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return LRUCache()
+    return DiskCache(tmp_path / "cache.sqlite")
+
+
+def test_backend_get_set(backend):
+    backend.set(("find_contact", "email"), ["contact"], ("contact",), time.time() + 60)
+
+    assert backend.get(("find_contact", "email")) == (True, ["contact"])
+    assert backend.get(("find_contact", "other")) == (False, None)
+
+
+def test_backend_expires_entries(backend):
+    backend.set("key", "value", ("contact",), time.time() - 1)
+
+    assert backend.get("key") == (False, None)
+
+
+def test_backend_invalidates_by_tag(backend):
+    expires = time.time() + 60
+    backend.set("contact", 1, ("contact",), expires)
+    backend.set("contacts", 2, ("contact", "association"), expires)
+    backend.set("company", 3, ("company",), expires)
+
+    backend.invalidate("contact")
+
+    assert backend.get("contact") == (False, None)
+    assert backend.get("contacts") == (False, None)
+    assert backend.get("company") == (True, 3)
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(max_size=2)
+    expires = time.time() + 60
+    cache.set("a", 1, ("contact",), expires)
+    cache.set("b", 2, ("contact",), expires)
+    cache.get("a")
+    cache.set("c", 3, ("contact",), expires)
+
+    assert cache.get("a") == (True, 1)
+    assert cache.get("b") == (False, None)
+    assert cache.get("c") == (True, 3)
+
+
+def test_disk_cache_persists(tmp_path):
+    DiskCache(tmp_path / "cache.sqlite").set(
+        "key", {"id": "1"}, ("deal",), time.time() + 60
+    )
+
+    assert DiskCache(tmp_path / "cache.sqlite").get("key") == (True, {"id": "1"})
+
+
+def test_response_cache_uses_ttl_of_object_type():
+    cache = ResponseCache(ttls={"owner": -1}, default_ttl=60)
+    cache.set("owner", 1, ("owner",), cache.generation(("owner",)))
+    cache.set("contact", 2, ("contact",), cache.generation(("contact",)))
+
+    assert cache.get("owner") == (False, None)
+    assert cache.get("contact") == (True, 2)
+
+
+def test_response_cache_skips_responses_read_before_invalidation():
+    cache = ResponseCache()
+    generation = cache.generation(("contact",))
+    cache.invalidate("contact")
+    cache.set("key", "stale", ("contact",), generation)
+
+    assert cache.get("key") == (False, None)
+
+
+@pytest.fixture
+def client():
+    client = HubSpotClient(
+        access_token="token", pipeline_id="pipeline", cache=ResponseCache()
+    )
+    client.calls = []
+
+    def find(*args):
+        client.calls.append(args)
+        return SimpleNamespace(results=[f"result {len(client.calls)}"])
+
+    client._find = find
+    return client
+
+
+def test_client_caches_find(client):
+    first = client.find_company("domain", "example.com")
+    second = client.find_company("domain", "example.com")
+    client.find_company("domain", "other.com")
+
+    assert first == second == ["result 1"]
+    assert len(client.calls) == 2
+
+
+def test_client_write_invalidates_find(client):
+    client.update_lookup["company"] = lambda *args, **kwargs: None
+    client.find_company("domain", "example.com")
+    client.find_contact("email", "test@example.com")
+
+    client.update_company("1", name="Renamed")
+
+    assert client.find_company("domain", "example.com") == ["result 3"]
+    assert client.find_contact("email", "test@example.com") == ["result 2"]
+    assert len(client.calls) == 3
+
+
+def test_client_without_cache_does_not_cache():
+    client = HubSpotClient(access_token="token", pipeline_id="pipeline")
+    calls = []
+    client._find = lambda *args: calls.append(args) or SimpleNamespace(results=[])
+
+    client.find_company("domain", "example.com")
+    client.find_company("domain", "example.com")
+
+    assert len(calls) == 2
+
+
+def test_clients_sharing_a_cache_are_scoped_by_pipeline_and_portal():
+    cache = ResponseCache()
+    clients = [
+        HubSpotClient(access_token="token", pipeline_id="A", cache=cache),
+        HubSpotClient(access_token="token", pipeline_id="B", cache=cache),
+        HubSpotClient(access_token="other", pipeline_id="A", cache=cache),
+    ]
+    for client in clients:
+        client._find = lambda *args, client=client: SimpleNamespace(
+            results=[client._pipeline_id]
+        )
+
+    assert [x.find_company("domain", "example.com") for x in clients] == [
+        ["A"],
+        ["B"],
+        ["A"],
+    ]
+    assert len(cache.backend._entries) == 3
+
+
+def test_invalidates_object_name_given_by_keyword(client):
+    client.find_contact("email", "test@example.com")
+
+    result = client.bulk_import(object_name="contact", records=[])
+
+    assert result.row_count == 0
+    assert client.find_contact("email", "test@example.com") == ["result 2"]
@@ -0,0 +1,186 @@
+import csv
+import json
+
+import pytest
+
+from hs_api import cli
+from hs_api.api import sharding
+from hs_api.cli import main
+
+DAY = 24 * 60 * 60 * 1000
+# 2022-01-01 to 2022-01-03 UTC
+START = 1640995200000
+END = START + 2 * DAY
+
+
+def email_events(request):
+    start = int(request.query["startTimestamp"][0])
+    if start == START + DAY and request.server.fail_second_day:
+        return 500, {}
+    # Two events per day, the second with an extra field
+    events = [
+        {"id": f"{start}-1", "created": start, "type": "SENT"},
+        {"id": f"{start}-2", "created": start + 1, "browser": {"name": "x"}},
+    ]
+    return {"events": events, "hasMore": False}
+
+
+def contact_lists(request):
+    lists = [{"listId": 1, "name": "first"}, {"listId": 2, "name": "second"}]
+    return {"lists": lists, "has-more": False, "offset": 2}
+
+
+def search_deals(request):
+    # Throttles the first search, then searches deals 1 to 3 by id
+    if request.server.throttle:
+        request.server.throttle = False
+        return 429, {"status": "error", "message": "Too many requests"}
+    body = request.json()
+    ids = range(1, 4)
+    for x in body["filterGroups"][0]["filters"]:
+        if x["operator"] == "GTE":
+            ids = [y for y in ids if y >= int(x["value"])]
+        elif x["operator"] == "LT":
+            ids = [y for y in ids if y < int(x["value"])]
+    if (body.get("sorts") or [{}])[0].get("direction") == "DESCENDING":
+        ids = ids[::-1]
+    results = [
+        {
+            "id": str(x),
+            "properties": {"hs_object_id": str(x)},
+            "createdAt": "2022-01-01T00:00:00Z",
+            "updatedAt": "2022-01-01T00:00:00Z",
+            "archived": False,
+        }
+        for x in ids
+    ]
+    return {"total": len(ids), "results": results[: body["limit"]]}
+
+
+@pytest.fixture()
+def server(mock_server):
+    server = mock_server(
+        {
+            ("GET", "/email/public/v1/events"): email_events,
+            ("GET", "/contacts/v1/lists"): contact_lists,
+        }
+    )
+    server.fail_second_day = False
+    return server
+
+
+def run(server, out, *args):
+    return main(
+        [
+            "export",
+            *args,
+            "--out",
+            str(out),
+            "--access-token",
+            "token",
+            "--api-url",
+            server.url,
+            "--quiet",
+        ]
+    )
+
+
+def email_events_args(*args):
+    return (
+        "email-events",
+        "--since",
+        "2022-01-01",
+        "--until",
+        "2022-01-03",
+        "--workers",
+        "2",
+        *args,
+    )
+
+
+def test_export_email_events_to_csv(server, tmp_path, capsys):
+    assert run(server, tmp_path, *email_events_args("--format", "csv")) == 0
+
+    # Each window is a part named by its start
+    with open(tmp_path / f"part-{START + DAY}.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert [x["id"] for x in rows] == [f"{START + DAY}-1", f"{START + DAY}-2"]
+    # Columns are the union of the fields of all the events
+    assert list(rows[0]) == ["id", "created", "type", "browser"]
+    assert rows[1]["browser"] == '{"name": "x"}'
+    assert "Exported 4 records" in capsys.readouterr().err
+
+
+def test_export_resumes_failed_parts(server, tmp_path, capsys):
+    server.fail_second_day = True
+    assert run(server, tmp_path, *email_events_args()) == 1
+    assert (tmp_path / f"part-{START}.jsonl").exists()
+    assert not (tmp_path / f"part-{START + DAY}.jsonl").exists()
+
+    server.fail_second_day = False
+    server.requests.clear()
+    assert run(server, tmp_path, *email_events_args()) == 0
+
+    # Only the failed part was exported again
+    assert len(server.requests) == 1
+    with open(tmp_path / f"part-{START + DAY}.jsonl") as f:
+        assert [json.loads(x)["created"] for x in f] == [START + DAY, START + DAY + 1]
+    assert "1 parts already exported" in capsys.readouterr().err
+
+
+def test_email_event_windows_grow_over_sparse_periods(server, tmp_path):
+    args = ("email-events", "--until", "2022-01-03", "--workers", "1")
+    assert run(server, tmp_path, *args) == 0
+
+    # Without --since the export starts at 0 epoch, but the windows grow over
+    # the decades with hardly any events rather than being a day each
+    starts = sorted(int(x.query["startTimestamp"][0]) for x in server.requests)
+    assert starts[0] == 0
+    assert len(starts) < 10
+
+
+def test_export_with_different_options_is_rejected(server, tmp_path):
+    assert run(server, tmp_path, *email_events_args()) == 0
+
+    with pytest.raises(SystemExit):
+        run(server, tmp_path, *email_events_args("--window-hours", "12"))
+
+
+def test_other_export_errors_are_not_usage_errors(server, tmp_path, monkeypatch):
+    def plan_parts(client, options, workers):
+        raise ValueError("not a usage error")
+
+    monkeypatch.setattr(cli, "plan_parts", plan_parts)
+
+    with pytest.raises(ValueError, match="not a usage error"):
+        run(server, tmp_path, *email_events_args())
+
+
+def test_export_deals_retries_throttled_searches(mock_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(sharding, "SHARD_RETRY_WAIT", 0)
+    server = mock_server({("POST", "/crm/v3/objects/deals/search"): search_deals})
+    server.throttle = True
+
+    assert run(server, tmp_path, "deals", "--workers", "1") == 0
+
+    ids = []
+    for path in sorted(tmp_path.glob("part-*.jsonl")):
+        with open(path) as f:
+            ids.extend(json.loads(x)["id"] for x in f)
+    assert ids == ["1", "2", "3"]
+    # The throttled search was made again
+    assert server.requests[0].json() == server.requests[1].json()
+
+
+def test_export_contact_lists(server, tmp_path):
+    assert run(server, tmp_path, "contact-lists") == 0
+
+    with open(tmp_path / "part-00000.jsonl") as f:
+        assert [json.loads(x)["name"] for x in f] == ["first", "second"]
+
+
+def test_unsupported_options_are_rejected(server, tmp_path):
+    with pytest.raises(SystemExit):
+        run(server, tmp_path, "contact-lists", "--since", "2022-01-01")
+    with pytest.raises(SystemExit):
+        run(server, tmp_path, "contacts-in-list")
@@ -0,0 +1,89 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from hs_api.api.coalescing import SingleFlight
+from hs_api.api.hubspot_api import HubSpotClient
+
+WORKERS = 10
+
+
+def slow_call(calls, result=None, exception=None):
+    def call():
+        calls.append(threading.get_ident())
+        # Give the other threads time to join the call in flight
+        time.sleep(0.2)
+        if exception:
+            raise exception
+        return result
+
+    return call
+
+
+def test_concurrent_calls_share_one_call():
+    single_flight = SingleFlight()
+    calls = []
+    call = slow_call(calls, result="result")
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        futures = [
+            executor.submit(single_flight.do, "key", call) for _ in range(WORKERS)
+        ]
+        results = [x.result() for x in futures]
+
+    assert len(calls) == 1
+    assert results == ["result"] * WORKERS
+
+
+def test_concurrent_calls_share_exception():
+    single_flight = SingleFlight()
+    calls = []
+    call = slow_call(calls, exception=ValueError("failed"))
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        futures = [
+            executor.submit(single_flight.do, "key", call) for _ in range(WORKERS)
+        ]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+    assert len(calls) == 1
+
+
+def test_sequential_calls_are_not_shared():
+    single_flight = SingleFlight()
+    calls = []
+
+    single_flight.do("key", lambda: calls.append(1))
+    single_flight.do("key", lambda: calls.append(1))
+
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("coalesce_reads, expected_calls", [(True, 1), (False, 5)])
+def test_client_coalesces_find_company(coalesce_reads, expected_calls):
+    client = HubSpotClient(
+        access_token="token", pipeline_id="pipeline", coalesce_reads=coalesce_reads
+    )
+    calls = []
+
+    def find(*args):
+        calls.append(args)
+        time.sleep(0.2)
+        return SimpleNamespace(results=["company"])
+
+    client._find = find
+
+    with ThreadPoolExecutor(max_workers=5) as executor:
+        futures = [
+            executor.submit(client.find_company, "domain", "example.com")
+            for _ in range(5)
+        ]
+        results = [x.result() for x in futures]
+
+    assert len(calls) == expected_calls
+    assert results == [["company"]] * 5
@@ -0,0 +1,82 @@
+import pytest
+
+from hs_api.api.contact_lists import ContactListCatalogue
+
+
+class FakeClient:
+    def __init__(self, contact_lists):
+        self.contact_lists = contact_lists
+        self.requests = 0
+
+    def _contact_list_pages(self):
+        self.requests += 1
+        yield self.contact_lists[:1]
+        yield self.contact_lists[1:]
+
+
+@pytest.fixture()
+def client():
+    return FakeClient(
+        [
+            {"listId": 1, "name": "first list", "updatedAt": 100},
+            {"listId": 2, "name": "second list", "updatedAt": 200},
+        ]
+    )
+
+
+def test_catalogue_finds_lists_by_id_and_name(client):
+    catalogue = ContactListCatalogue(client)
+
+    assert catalogue.get(1)["name"] == "first list"
+    assert catalogue.get("2")["name"] == "second list"
+    assert catalogue.find_by_name("second list")["listId"] == 2
+    assert catalogue.get(3) is None
+
+
+def test_catalogue_is_served_from_memory_until_stale(client):
+    catalogue = ContactListCatalogue(client)
+    catalogue.get(1)
+    catalogue.find_by_name("first list")
+
+    assert client.requests == 1
+
+    catalogue.max_age = 0
+    catalogue.get(1)
+
+    assert client.requests == 2
+
+
+def test_catalogue_refresh_returns_updated_lists(client):
+    catalogue = ContactListCatalogue(client)
+    catalogue.refresh()
+
+    client.contact_lists = [
+        {"listId": 1, "name": "renamed list", "updatedAt": 300},
+        {"listId": 2, "name": "second list", "updatedAt": 200},
+    ]
+    changed = catalogue.refresh(force=True)
+
+    assert changed == [client.contact_lists[0]]
+    assert catalogue.find_by_name("renamed list")["listId"] == 1
+    assert catalogue.find_by_name("first list") is None
+
+
+def test_catalogue_drops_deleted_lists(client):
+    catalogue = ContactListCatalogue(client)
+    catalogue.refresh()
+
+    client.contact_lists = client.contact_lists[1:]
+    catalogue.refresh(force=True)
+
+    assert catalogue.get(1) is None
+    assert [x["listId"] for x in catalogue.lists()] == [2]
+
+
+def test_catalogue_is_loaded_from_cache_path(client, tmp_path):
+    cache_path = tmp_path / "contact_lists.json"
+    ContactListCatalogue(client, cache_path=cache_path).refresh()
+
+    catalogue = ContactListCatalogue(client, cache_path=cache_path)
+
+    assert catalogue.get(2)["name"] == "second list"
+    assert client.requests == 1
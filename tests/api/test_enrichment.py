@@ -0,0 +1,129 @@
+from collections import Counter
+
+import pytest
+
+from hs_api.api.hubspot_api import HubSpotClient
+
+TICKET_PAGES = [["1", "2"], ["3"]]
+ASSOCIATIONS = {
+    "contact": {"1": ["10", "11"], "2": ["10"], "3": ["12"]},
+    "company": {"1": ["20"]},
+}
+DATES = {"createdAt": "2022-01-01T00:00:00Z", "updatedAt": "2022-01-01T00:00:00Z"}
+
+
+def simple_object(object_id, properties):
+    return {"id": object_id, "properties": properties, "archived": False, **DATES}
+
+
+def batch_response(results):
+    return {
+        "status": "COMPLETE",
+        "results": results,
+        "startedAt": "2022-01-01T00:00:00Z",
+        "completedAt": "2022-01-01T00:00:00Z",
+    }
+
+
+def search_tickets(request):
+    page = int(request.json().get("after") or 0)
+    results = [simple_object(x, {"subject": f"Ticket {x}"}) for x in TICKET_PAGES[page]]
+    response = {"total": 3, "results": results}
+    if page + 1 < len(TICKET_PAGES):
+        response["paging"] = {"next": {"after": str(page + 1)}}
+    return response
+
+
+def read_associations(request):
+    associations = ASSOCIATIONS[request.match[1]]
+    return batch_response(
+        [
+            {
+                "from": {"id": x["id"]},
+                "to": [{"id": to, "type": "t"} for to in associations[x["id"]]],
+            }
+            for x in request.json()["inputs"]
+            if x["id"] in associations
+        ]
+    )
+
+
+def read_objects(request):
+    body = request.json()
+    return batch_response(
+        [
+            simple_object(x["id"], {p: f"{p} {x['id']}" for p in body["properties"]})
+            for x in body["inputs"]
+        ]
+    )
+
+
+@pytest.fixture()
+def server(mock_server):
+    return mock_server(
+        {
+            ("POST", "/crm/v3/objects/tickets/search"): search_tickets,
+            (
+                "POST",
+                r"/crm/v3/associations/ticket/(\w+)/batch/read",
+            ): read_associations,
+            ("POST", r"/crm/v3/objects/\w+/batch/read"): read_objects,
+        }
+    )
+
+
+@pytest.fixture()
+def client(server):
+    return HubSpotClient(
+        access_token="token",
+        pipeline_id="pipeline",
+        api_url=server.url,
+        validate_properties=False,
+    )
+
+
+def test_find_all_tickets_enriched_joins_contacts_and_companies(client):
+    batches = list(
+        client.find_all_tickets_enriched(
+            contact_properties=["email"], company_properties=["name"]
+        )
+    )
+
+    assert [[x.id for x in batch] for batch in batches] == [["1", "2"], ["3"]]
+    first, second, third = batches[0] + batches[1]
+    assert [x.id for x in first.contacts] == ["10", "11"]
+    assert first.contacts[0].properties["email"] == "email 10"
+    assert [x.properties["name"] for x in first.companies] == ["name 20"]
+    assert [x.id for x in second.contacts] == ["10"]
+    assert second.companies == []
+    assert [x.id for x in third.contacts] == ["12"]
+
+
+def test_find_all_tickets_enriched_batches_requests_per_page(server, client):
+    list(client.find_all_tickets_enriched())
+
+    # A search, two association reads and two object reads per page, with
+    # the second page having no companies to read
+    assert Counter(x.path for x in server.requests) == {
+        "/crm/v3/objects/tickets/search": 2,
+        "/crm/v3/associations/ticket/contact/batch/read": 2,
+        "/crm/v3/associations/ticket/company/batch/read": 2,
+        "/crm/v3/objects/contacts/batch/read": 2,
+        "/crm/v3/objects/companies/batch/read": 1,
+    }
+    # Contacts associated with several tickets are only read once
+    reads = [
+        x.json() for x in server.requests if x.path.endswith("/contacts/batch/read")
+    ]
+    assert [x["id"] for x in reads[0]["inputs"]] == ["10", "11"]
+
+
+def test_enriched_ticket_to_dict(client):
+    ticket = next(iter(client.find_all_tickets_enriched()))[0]
+
+    record = ticket.to_dict()
+
+    assert record["id"] == "1"
+    assert record["properties"]["subject"] == "Ticket 1"
+    assert [x["id"] for x in record["contacts"]] == ["10", "11"]
+    assert [x["id"] for x in record["companies"]] == ["20"]
@@ -0,0 +1,142 @@
+import io
+import zipfile
+from datetime import datetime, timezone
+
+import pytest
+
+from hs_api.api.hubspot_api import HubSpotClient
+
+CSV = (
+    "﻿hs_object_id,createdate,hs_lastmodifieddate,dealname,amount\r\n"
+    "1,2022-01-01T00:00:00Z,2022-01-02T00:00:00Z,First,100\r\n"
+    "2,2022-01-03T00:00:00Z,2022-01-04T00:00:00Z,Second,\r\n"
+    '3,2022-01-05T00:00:00Z,2022-01-06T00:00:00Z,"Third, with comma",300\r\n'
+)
+
+
+def zipped(*files):
+    content = io.BytesIO()
+    with zipfile.ZipFile(content, "w") as zip_file:
+        for i, data in enumerate(files):
+            zip_file.writestr(f"export-{i}.csv", data)
+    return content.getvalue()
+
+
+def start_export(request):
+    request.server.export_requests.append(request.json())
+    return {"id": "42"}
+
+
+def export_status(request):
+    server = request.server
+    server.polls += 1
+    status = server.statuses[min(server.polls, len(server.statuses)) - 1]
+    return {"status": status, "result": f"{server.url}/download/{server.file}"}
+
+
+def download_csv(request):
+    return 200, CSV.encode("utf-8"), {"Content-Type": "text/csv"}
+
+
+def download_zip(request):
+    content = zipped(CSV, CSV.replace(",First,", ",Fourth,"))
+    return 200, content, {"Content-Type": "application/zip"}
+
+
+@pytest.fixture()
+def server(mock_server):
+    server = mock_server(
+        {
+            ("POST", "/crm/v3/exports/export/async"): start_export,
+            ("GET", "/crm/v3/exports/export/async/tasks/42/status"): export_status,
+            ("GET", "/download/export.csv"): download_csv,
+            ("GET", "/download/export.zip"): download_zip,
+        }
+    )
+    server.export_requests = []
+    server.polls = 0
+    server.statuses = ["PENDING", "PROCESSING", "COMPLETE"]
+    server.file = "export.csv"
+    return server
+
+
+@pytest.fixture()
+def client(server):
+    return HubSpotClient(
+        access_token="token",
+        pipeline_id="pipeline",
+        api_url=server.url,
+        validate_properties=False,
+    )
+
+
+def test_start_export(server, client):
+    assert client.start_export("deal", ["dealname", "amount"]) == "42"
+
+    request = server.export_requests[0]
+    assert request["objectType"] == "DEAL"
+    assert request["format"] == "CSV"
+    assert request["objectProperties"] == [
+        "hs_object_id",
+        "createdate",
+        "hs_lastmodifieddate",
+        "dealname",
+        "amount",
+    ]
+
+
+def test_wait_export_polls_until_complete(server, client):
+    url = client.wait_export("42", poll_interval=0.01)
+
+    assert url.endswith("/download/export.csv")
+    assert server.polls == 3
+
+
+def test_wait_export_raises_for_failed_export(server, client):
+    server.statuses = ["PROCESSING", "CANCELED"]
+
+    with pytest.raises(RuntimeError):
+        client.wait_export("42", poll_interval=0.01)
+
+
+def test_wait_export_times_out(server, client):
+    server.statuses = ["PROCESSING"]
+
+    with pytest.raises(TimeoutError):
+        client.wait_export("42", timeout=0.05, poll_interval=0.01)
+
+
+def test_stream_export_yields_batches_of_records(client):
+    batches = list(
+        client.stream_export(
+            "deal", ["dealname", "amount"], batch_size=2, poll_interval=0.01
+        )
+    )
+
+    assert [len(x) for x in batches] == [2, 1]
+    first, second, third = batches[0] + batches[1]
+    assert first.id == "1"
+    assert first.properties["dealname"] == "First"
+    assert first.created_at == datetime(2022, 1, 1, tzinfo=timezone.utc)
+    assert first.updated_at == datetime(2022, 1, 2, tzinfo=timezone.utc)
+    assert second.properties["amount"] is None
+    assert third.properties["dealname"] == "Third, with comma"
+
+
+def test_stream_export_reads_zipped_exports(server, client):
+    server.file = "export.zip"
+
+    records = [
+        x
+        for batch in client.stream_export("deal", ["dealname"], poll_interval=0.01)
+        for x in batch
+    ]
+
+    assert [x.properties["dealname"] for x in records] == [
+        "First",
+        "Second",
+        "Third, with comma",
+        "Fourth",
+        "Second",
+        "Third, with comma",
+    ]
@@ -0,0 +1,171 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from hs_api.api.hedging import MIN_LATENCY_SAMPLES, Hedger
+from hs_api.api.hubspot_api import HubSpotClient
+from hs_api.api.rate_limit import RateLimiter
+
+
+def slow_first_call(calls, slow=1.0):
+    lock = threading.Lock()
+
+    def call(value):
+        with lock:
+            calls.append(value)
+            first = len(calls) == 1
+        time.sleep(slow if first else 0.01)
+        return f"{value} {'slow' if first else 'fast'}"
+
+    return call
+
+
+def hedger(**kwargs):
+    kwargs.setdefault("initial_delay", 0.1)
+    kwargs.setdefault("hedge_ratio", 1)
+    return Hedger(RateLimiter(), **kwargs)
+
+
+def test_fast_call_is_not_hedged():
+    hedger_ = hedger()
+
+    assert hedger_.call("search", lambda: "result") == "result"
+    assert hedger_.stats()["hedges"] == 0
+
+
+def test_slow_call_is_hedged_and_first_response_wins():
+    hedger_ = hedger()
+    calls = []
+
+    start = time.monotonic()
+    result = hedger_.call("search", slow_first_call(calls), "page")
+
+    assert result == "page fast"
+    assert time.monotonic() - start < 0.5
+    assert calls == ["page", "page"]
+    assert hedger_.stats()["hedges_won"] == 1
+
+
+def test_hedges_are_bounded_by_budget():
+    hedger_ = hedger(hedge_ratio=0.5)
+    calls = []
+
+    # Half a hedge is earned per read, so the first read can't be hedged
+    assert hedger_.call("search", slow_first_call(calls, slow=0.3), "page") == (
+        "page slow"
+    )
+    assert hedger_.stats()["hedges"] == 0
+
+
+def test_reads_that_cant_be_hedged_run_on_callers_thread():
+    hedger_ = hedger(hedge_ratio=0)
+
+    assert hedger_.call("search", threading.get_ident) == threading.get_ident()
+
+
+def test_reads_are_not_queued_behind_hedges():
+    hedger_ = hedger(max_workers=1)
+    calls = []
+
+    def call():
+        calls.append(hedger_.call("search", time.sleep, 0.3))
+
+    # The single worker is only used by hedges, so the reads run together
+    start = time.monotonic()
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 4
+    assert time.monotonic() - start < 0.6
+
+
+def test_reads_run_on_callers_thread_while_budget_is_reserved():
+    hedger_ = hedger(hedge_ratio=0.5)
+    hedger_._budget = 0.5
+    thread = threading.Thread(target=hedger_.call, args=("search", time.sleep, 0.3))
+    thread.start()
+    time.sleep(0.05)
+
+    # The hedge earned is reserved by the read in flight
+    assert hedger_.call("search", threading.get_ident) == threading.get_ident()
+    thread.join()
+
+
+def test_unused_hedges_are_returned_to_budget():
+    hedger_ = hedger(hedge_ratio=0.5)
+    hedger_._budget = 0.5
+
+    hedger_.call("search", lambda: "result")
+
+    assert hedger_._budget == 1
+
+
+def test_hedges_do_not_exceed_rate_limit():
+    rate_limiter = RateLimiter(max_requests=1)
+    hedger_ = Hedger(rate_limiter, initial_delay=0.1, hedge_ratio=1)
+    calls = []
+
+    # The read itself takes the only request within the limit
+    assert hedger_.call("search", slow_first_call(calls, slow=0.3), "page") == (
+        "page slow"
+    )
+    assert calls == ["page"]
+    assert hedger_.stats()["hedges"] == 0
+
+
+def test_failed_hedge_waits_for_primary():
+    hedger_ = hedger()
+    calls = []
+
+    def call():
+        calls.append(1)
+        if len(calls) == 1:
+            time.sleep(0.3)
+            return "primary"
+        raise ValueError("failed")
+
+    assert hedger_.call("search", call) == "primary"
+
+
+def test_error_before_delay_is_raised():
+    hedger_ = hedger()
+
+    def call():
+        raise ValueError("failed")
+
+    with pytest.raises(ValueError):
+        hedger_.call("search", call)
+    assert hedger_.stats()["hedges"] == 0
+
+
+def test_delay_follows_latency_percentile():
+    hedger_ = hedger(percentile=90, min_delay=0)
+    assert hedger_.delay("search") == 0.1
+
+    for latency in range(1, MIN_LATENCY_SAMPLES + 1):
+        hedger_._record("search", latency / 100)
+
+    assert hedger_.delay("search") == pytest.approx(0.19)
+
+
+def test_client_hedges_ticket_search():
+    client = HubSpotClient(
+        access_token="token", pipeline_id="pipeline", hedge_reads=True
+    )
+    client._hedger.initial_delay = 0.1
+    client._hedger._budget = 1
+    calls = []
+    search = slow_first_call(calls)
+
+    def do_search(public_object_search_request):
+        return SimpleNamespace(results=[search("tickets")], paging=None)
+
+    client._client.crm.tickets.search_api.do_search = do_search
+
+    assert list(client.find_all_tickets()) == [["tickets fast"]]
+    assert client.hedge_stats["hedges_won"] == 1
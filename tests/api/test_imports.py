@@ -0,0 +1,259 @@
+import csv
+import io
+import json
+
+import pytest
+
+from hs_api.api.hubspot_api import HubSpotClient
+
+ERRORS = [
+    {
+        "errorType": "INVALID_EMAIL",
+        "invalidValue": "not-an-email",
+        "extraContext": "Invalid email address",
+        "knownColumnNumber": 0,
+        "sourceData": {"lineNumber": 3},
+    },
+    {
+        "errorType": "UNKNOWN_ENUMERATION_VALUE",
+        "invalidValue": "purple",
+        "knownColumnNumber": 2,
+        "sourceData": {"lineNumber": 5},
+    },
+]
+
+
+def created_object(object_id, properties):
+    return {
+        "id": str(object_id),
+        "properties": properties,
+        "createdAt": "2022-01-01T00:00:00Z",
+        "updatedAt": "2022-01-01T00:00:00Z",
+        "archived": False,
+    }
+
+
+def parse_multipart(content_type, body):
+    boundary = content_type.split("boundary=")[1].encode()
+    parts = dict()
+    for part in body.split(b"--" + boundary)[1:-1]:
+        headers, content = part.split(b"\r\n\r\n", 1)
+        name = headers.split(b'name="')[1].split(b'"')[0].decode()
+        parts[name] = content[: -len(b"\r\n")].decode()
+    return parts
+
+
+def start_import(request):
+    content_type = request.headers["Content-Type"]
+    request.server.uploads.append(parse_multipart(content_type, request.body))
+    return {"id": "7", "state": "STARTED"}
+
+
+def batch_create(request):
+    inputs = request.json()["inputs"]
+    request.server.batches.append(inputs)
+    if any(x["properties"].get("email") == "bad" for x in inputs):
+        return 400, {"status": "error", "message": "Invalid"}
+    return 201, {
+        "status": "COMPLETE",
+        "results": [created_object(i, x["properties"]) for i, x in enumerate(inputs)],
+        "startedAt": "2022-01-01T00:00:00Z",
+        "completedAt": "2022-01-01T00:00:00Z",
+    }
+
+
+def create_contact(request):
+    properties = request.json()["properties"]
+    if properties["email"] == "bad":
+        return 400, {"status": "error", "message": "Invalid email"}
+    return 201, created_object(1, properties)
+
+
+def import_status(request):
+    server = request.server
+    server.polls += 1
+    state = server.states[min(server.polls, len(server.states)) - 1]
+    counters = {"TOTAL_ROWS": 600, "CREATED_OBJECTS": 598}
+    return {"id": "7", "state": state, "metadata": {"counters": counters}}
+
+
+def import_errors(request):
+    if "after" in request.query:
+        return {"results": ERRORS[1:]}
+    return {"results": ERRORS[:1], "paging": {"next": {"after": "1"}}}
+
+
+@pytest.fixture()
+def server(mock_server):
+    server = mock_server(
+        {
+            ("POST", "/crm/v3/imports"): start_import,
+            ("POST", "/crm/v3/objects/(contacts|deals)/batch/create"): batch_create,
+            ("POST", "/crm/v3/objects/contacts"): create_contact,
+            ("GET", "/crm/v3/imports/7"): import_status,
+            ("GET", "/crm/v3/imports/7/errors"): import_errors,
+        }
+    )
+    server.uploads = []
+    server.batches = []
+    server.polls = 0
+    server.states = ["STARTED", "PROCESSING", "DONE"]
+    return server
+
+
+@pytest.fixture()
+def client(server):
+    return HubSpotClient(
+        access_token="token",
+        pipeline_id="pipeline",
+        api_url=server.url,
+        validate_properties=False,
+    )
+
+
+def contacts(count):
+    for i in range(count):
+        yield {"email": f"contact{i}@example.com", "firstname": f"Contact {i}"}
+
+
+def test_bulk_import_uploads_csv_and_polls_until_done(server, client):
+    progress = []
+
+    result = client.bulk_import(
+        "contact",
+        contacts(600),
+        batch_threshold=500,
+        poll_interval=0.01,
+        progress_callback=lambda state, counters: progress.append(state),
+    )
+
+    upload = server.uploads[0]
+    request = json.loads(upload["importRequest"])
+    mappings = request["files"][0]["fileImportPage"]["columnMappings"]
+    assert [x["columnName"] for x in mappings] == ["email", "firstname"]
+    assert mappings[0]["idColumnType"] == "HUBSPOT_ALTERNATE_ID"
+    assert all(x["columnObjectTypeId"] == "0-1" for x in mappings)
+    rows = list(csv.DictReader(io.StringIO(upload["files"])))
+    assert len(rows) == 600
+    assert rows[599] == {"email": "contact599@example.com", "firstname": "Contact 599"}
+
+    assert progress == ["STARTED", "PROCESSING", "DONE"]
+    assert result.state == "DONE"
+    assert result.import_id == "7"
+    assert result.row_count == 600
+    assert result.counters["CREATED_OBJECTS"] == 598
+    assert server.batches == []
+
+
+def test_bulk_import_reports_row_errors(client):
+    result = client.bulk_import(
+        "contact", contacts(600), batch_threshold=500, poll_interval=0.01
+    )
+
+    assert [(x.line_number, x.error_type, x.invalid_value) for x in result.errors] == [
+        (3, "INVALID_EMAIL", "not-an-email"),
+        (5, "UNKNOWN_ENUMERATION_VALUE", "purple"),
+    ]
+    assert result.errors[0].message == "Invalid email address"
+
+
+def test_bulk_import_raises_for_unknown_properties(server, client):
+    records = [*contacts(500), {"email": "x@example.com", "phone": "123"}]
+
+    with pytest.raises(ValueError):
+        client.bulk_import("contact", records, batch_threshold=500)
+    assert server.uploads == []
+
+
+def test_bulk_import_times_out(server, client):
+    server.states = ["PROCESSING"]
+
+    with pytest.raises(TimeoutError):
+        client.bulk_import(
+            "contact", contacts(10), batch_threshold=5, timeout=0.05, poll_interval=0.01
+        )
+
+
+def test_small_bulk_import_uses_import_job_by_default(server, client):
+    result = client.bulk_import("contact", contacts(3), poll_interval=0.01)
+
+    # So existing contacts are updated by email, as in a large load
+    assert len(server.uploads) == 1
+    assert server.batches == []
+    assert result.import_id == "7"
+
+
+def test_small_deal_bulk_import_uses_batch_create_by_default(server, client):
+    deals = [{"dealname": f"Deal {i}"} for i in range(3)]
+
+    result = client.bulk_import("deal", deals)
+
+    # Deal imports only create, so the batch api does the same
+    assert server.uploads == []
+    assert [len(x) for x in server.batches] == [3]
+    assert len(result.created) == 3
+
+
+def test_bulk_import_columns_are_sampled_past_batch_threshold(server, client):
+    records = list(contacts(10))
+    records[7] = dict(records[7], phone="123")
+
+    client.bulk_import("contact", records, batch_threshold=5, poll_interval=0.01)
+
+    request = json.loads(server.uploads[0]["importRequest"])
+    mappings = request["files"][0]["fileImportPage"]["columnMappings"]
+    assert [x["columnName"] for x in mappings] == ["email", "firstname", "phone"]
+
+
+def test_empty_bulk_import_does_nothing(server, client):
+    result = client.bulk_import("contact", [])
+
+    assert result.row_count == 0
+    assert server.requests == []
+
+
+def test_small_bulk_import_validates_properties(server, client, monkeypatch):
+    validated = []
+    monkeypatch.setattr(client, "_validate_properties", True)
+    monkeypatch.setattr(
+        client.property_registry,
+        "validate",
+        lambda object_name, properties: validated.append((object_name, properties)),
+    )
+    records = [*contacts(2), {"email": "x@example.com", "phone": "123"}]
+
+    client.bulk_import("contact", records, batch_threshold=500)
+
+    assert validated == [("contact", ["email", "firstname", "phone"])]
+    with pytest.raises(ValueError):
+        client.bulk_import(
+            "contact", records, properties=["email", "firstname"], batch_threshold=500
+        )
+    assert len(server.batches) == 1
+
+
+def test_small_bulk_import_falls_back_to_batch_create(server, client):
+    result = client.bulk_import("contact", contacts(120), batch_threshold=500)
+
+    assert server.uploads == []
+    assert [len(x) for x in server.batches] == [100, 20]
+    assert result.import_id is None
+    assert result.row_count == 120
+    assert len(result.created) == 120
+    assert result.errors == []
+
+
+def test_small_bulk_import_reports_failed_rows(server, client):
+    records = list(contacts(3))
+    records[1] = {"email": "bad", "firstname": "Bad"}
+
+    result = client.bulk_import("contact", records, batch_threshold=500)
+
+    assert len(result.created) == 2
+    assert [x.line_number for x in result.errors] == [3]
+    assert "Invalid email" in result.errors[0].message
+
+
+def test_bulk_import_invalid_object_type_raises_value_error(client):
+    with pytest.raises(ValueError):
+        client.bulk_import("ticket", contacts(1))
@@ -3,7 +3,13 @@ import time
 
 import pytest
 
-from hs_api.api.hubspot_api import BATCH_LIMITS, EMAIL_BATCH_LIMIT, HubSpotClient
+from hs_api.api.association_index import AssociationIndex
+from hs_api.api.hubspot_api import (
+    BATCH_LIMITS,
+    EMAIL_BATCH_LIMIT,
+    HubSpotClient,
+    convert_date_to_epoch,
+)
 from hs_api.settings.settings import (
     HUBSPOT_TEST_ACCESS_TOKEN,
     HUBSPOT_TEST_PIPELINE_ID,
@@ -183,6 +189,53 @@ def test_create_contact_and_associated_company_without_auto_created_company(
     assert association[0].id == result["company"].id
 
 
+def test_create_contacts_and_companies(hubspot_client):
+
+    test_first_name = f"{UNIQUE_ID} first name"
+    test_last_name = f"{UNIQUE_ID} last name"
+
+    # Assert the companies and contacts don't already exist
+    company = hubspot_client.find_company("name", TEST_COMPANY_NAME)
+    assert not company
+
+    for email in (TEST_EMAIL, TEST_EMAIL_CUSTOM_DOMAIN):
+        contact = hubspot_client.find_contact("email", email)
+        assert not contact
+
+    # Create the contacts and companies in one batch
+    results = hubspot_client.create_contacts_and_companies(
+        [
+            dict(
+                email=email,
+                first_name=test_first_name,
+                last_name=test_last_name,
+                company=TEST_COMPANY_NAME,
+            )
+            # The second signup of an email isn't created
+            for email in (TEST_EMAIL, TEST_EMAIL_CUSTOM_DOMAIN, TEST_EMAIL.upper())
+        ]
+    )
+
+    assert len(results) == 3
+    for result in results[:2]:
+        assert result["contact"].id
+        assert result["company"].id
+    assert results[2] == {"contact": None}
+
+    # Assert the outputs are in the order of the given signups
+    assert results[0]["contact"].properties["email"] == TEST_EMAIL
+    assert results[1]["contact"].properties["email"] == TEST_EMAIL_CUSTOM_DOMAIN
+
+    # Assert the contact without an auto created company is linked to the
+    # newly created company
+    time.sleep(20)
+    association = hubspot_client.contact_associations(
+        results[0]["contact"].id, "company"
+    )
+    assert association
+    assert association[0].id == results[0]["company"].id
+
+
 def test_create_and_find_deal(hubspot_client):
 
     test_amount = 99.99
@@ -373,6 +426,18 @@ def test_find_all_tickets_returns_after_given_hs_lastmodifieddate(hubspot_client
     assert next(filtered_tickets)[0].updated_at > filter_value
 
 
+def test_find_all_tickets_enriched_matches_find_all_tickets(hubspot_client):
+    tickets = next(hubspot_client.find_all_tickets())
+    enriched = next(hubspot_client.find_all_tickets_enriched())
+
+    assert [x.id for x in enriched] == [x.id for x in tickets]
+    associations = hubspot_client._batch_read_associations(
+        "ticket", "contact", [x.id for x in enriched]
+    )
+    for ticket in enriched:
+        assert {x.id for x in ticket.contacts} <= set(associations.get(ticket.id, []))
+
+
 def test_find_all_tickets_returns_after_given_hs_object_id(hubspot_client):
     all_tickets = hubspot_client.find_all_tickets()
     filter_value = next(all_tickets)[0].id
@@ -499,6 +564,24 @@ def test_find_all_deals_returns_properties_with_history(hubspot_client):
     assert expected_history == [*actual_history]
 
 
+def test_deal_property_history_matches_find_all_deals(hubspot_client):
+    deal = next(hubspot_client.find_all_deals(properties_with_history=["dealstage"]))[0]
+    rows = hubspot_client.deal_property_history(["dealstage"])
+    deal_rows = [x for x in rows if x.deal_id == deal.id]
+
+    assert [x.value for x in deal_rows] == [
+        x.value for x in deal.properties_with_history["dealstage"]
+    ]
+
+
+def test_stream_export_returns_deals(hubspot_client):
+    batches = hubspot_client.stream_export("deal", ["dealname", "pipeline"])
+    deal = next(batches)[0]
+
+    assert deal.id == deal.properties["hs_object_id"]
+    assert "dealname" in deal.properties
+
+
 def test_find_all_email_events_returns_batches(hubspot_client):
     email_events = hubspot_client.find_all_email_events()
 
@@ -523,3 +606,99 @@ def test_find_all_email_events_returns_after_given_starttimestamp_epoch(hubspot_
     # Assert that the first record of the returned filtered list starts
     # after the original returned list
     assert next(filtered_events)[0]["created"] > filter_value
+
+
+def test_find_all_email_events_parallel_returns_events_in_range(hubspot_client):
+    end_timestamp = datetime.datetime.now()
+    start_timestamp = end_timestamp - datetime.timedelta(days=7)
+    start_epoch = convert_date_to_epoch(start_timestamp)
+    end_epoch = convert_date_to_epoch(end_timestamp)
+
+    windows = []
+    email_events = hubspot_client.find_all_email_events_parallel(
+        start_timestamp=start_timestamp,
+        end_timestamp=end_timestamp,
+        progress_callback=lambda window, event_count: windows.append(window),
+    )
+    events = [event for batch in email_events for event in batch]
+
+    # Assert that all the events are within the range
+    assert all(start_epoch <= event["created"] < end_epoch for event in events)
+
+    # Assert that the windows cover the whole range without overlapping
+    windows = sorted(windows)
+    assert windows[0][0] == start_epoch
+    assert windows[-1][1] == end_epoch
+    assert all(x[1] == y[0] for x, y in zip(windows, windows[1:]))
+
+
+def test_find_contact_list_by_id_and_name(hubspot_client):
+    contact_list = hubspot_client.find_all_contact_lists()[0]
+
+    assert (
+        hubspot_client.find_contact_list(list_id=contact_list["listId"])["name"]
+        == contact_list["name"]
+    )
+    assert (
+        hubspot_client.find_contact_list(name=contact_list["name"])["listId"]
+        == contact_list["listId"]
+    )
+
+
+def test_find_contact_list_without_id_or_name(hubspot_client):
+    with pytest.raises(ValueError):
+        hubspot_client.find_contact_list()
+
+
+def test_find_all_deals_fills_association_index(hubspot_client):
+    association_index = AssociationIndex()
+    deals = next(hubspot_client.find_all_deals(association_index=association_index))
+
+    for deal in deals:
+        companies = (deal.associations or {}).get("companies")
+        for company in companies.results if companies else []:
+            assert deal.id in association_index.associated(
+                "company", company.id, "deal"
+            )
+
+
+def test_find_all_deals_with_invalid_property_raises_value_error(hubspot_client):
+    with pytest.raises(ValueError):
+        next(hubspot_client.find_all_deals(properties=["hs_object_idd"]))
+
+
+def test_find_all_deals_returns_projection_properties(hubspot_client):
+    hubspot_client.property_registry.register_projection(
+        "object_ids", "deal", ["hs_lastmodifieddate", "hs_object_id"]
+    )
+    deals = hubspot_client.find_all_deals(projection="object_ids")
+    actual = next(deals)[0].properties
+    expected = {
+        "hs_lastmodifieddate": None,
+        "hs_object_id": None,
+        # createdate is always returned
+        "createdate": None,
+    }
+
+    # We don't care about the actual values just the keys
+    assert actual.keys() == expected.keys()
+
+
+def test_archive_companies(hubspot_client):
+    company_result = hubspot_client.create_company(name=TEST_COMPANY_NAME)
+
+    results = hubspot_client.archive_companies([company_result.id])
+
+    assert results == {company_result.id: True}
+
+
+def test_purge_contacts(hubspot_client):
+    hubspot_client.create_contact(
+        email=TEST_EMAIL,
+        first_name=f"{UNIQUE_ID} first name",
+        last_name=f"{UNIQUE_ID} last name",
+    )
+
+    results = hubspot_client.purge_contacts([TEST_EMAIL], property_name="email")
+
+    assert results == {TEST_EMAIL: True}
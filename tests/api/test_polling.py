@@ -0,0 +1,36 @@
+import pytest
+
+from hs_api.api import polling
+from hs_api.api.polling import poll_until
+
+
+def test_poll_until_backs_off_until_terminal_state(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(polling.time, "sleep", sleeps.append)
+    states = iter(["STARTED", "PROCESSING", "PROCESSING", "PROCESSING", "DONE"])
+
+    status = poll_until(
+        "Import 1",
+        lambda: {"state": next(states)},
+        "state",
+        ("DONE", "FAILED"),
+        timeout=60,
+        poll_interval=1,
+        max_poll_interval=3,
+    )
+
+    assert status == {"state": "DONE"}
+    assert sleeps == [1, 2, 3, 3]
+
+
+def test_poll_until_times_out():
+    with pytest.raises(TimeoutError, match="Export 1 not done after 0.05s"):
+        poll_until(
+            "Export 1",
+            lambda: {"status": "PROCESSING"},
+            "status",
+            ("COMPLETE",),
+            timeout=0.05,
+            poll_interval=0.01,
+            max_poll_interval=0.01,
+        )
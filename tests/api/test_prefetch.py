@@ -0,0 +1,108 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from hs_api.api.hubspot_api import HubSpotClient
+from hs_api.api.prefetch import prefetch
+
+
+class Pages:
+    """
+    A pages generator recording which pages have been fetched, and whether
+    it was closed and from which thread.
+    """
+
+    def __init__(self, count, error_at=None):
+        self.fetched = []
+        self.closed_on = None
+        self.generator = self._pages(count, error_at)
+
+    def _pages(self, count, error_at):
+        try:
+            for i in range(count):
+                if i == error_at:
+                    raise ValueError("failed")
+                self.fetched.append(i)
+                yield [i]
+        finally:
+            self.closed_on = threading.current_thread()
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_prefetch_yields_pages_in_order():
+    pages = Pages(10)
+
+    assert list(prefetch(pages.generator, 3)) == [[i] for i in range(10)]
+
+
+def test_prefetch_reads_ahead_up_to_limit():
+    pages = Pages(10)
+    prefetched = prefetch(pages.generator, 3)
+
+    assert next(prefetched) == [0]
+    # One page taken, three queued and one waiting to be queued
+    assert wait_for(lambda: len(pages.fetched) == 5)
+    time.sleep(0.2)
+    assert len(pages.fetched) == 5
+    prefetched.close()
+
+
+def test_prefetch_stops_when_consumer_stops_early():
+    pages = Pages(1000)
+    prefetched = prefetch(pages.generator, 2)
+    next(prefetched)
+
+    prefetched.close()
+
+    assert pages.closed_on is not None
+    assert pages.closed_on is not threading.current_thread()
+    assert len(pages.fetched) < 10
+
+
+def test_prefetch_raises_errors_after_earlier_pages():
+    pages = Pages(10, error_at=3)
+    results = []
+
+    with pytest.raises(ValueError):
+        for page in prefetch(pages.generator, 2):
+            results.append(page)
+
+    assert results == [[0], [1], [2]]
+
+
+def test_prefetch_without_read_ahead_does_not_start_thread():
+    pages = Pages(3)
+    threads = threading.active_count()
+    prefetched = prefetch(pages.generator, 0)
+
+    assert next(prefetched) == [0]
+    assert threading.active_count() == threads
+    assert pages.fetched == [0]
+
+
+def test_client_prefetches_ticket_pages():
+    client = HubSpotClient(access_token="token", pipeline_id="pipeline")
+    searched = []
+
+    def do_search(public_object_search_request):
+        searched.append(public_object_search_request.after)
+        after = len(searched)
+        paging = (
+            SimpleNamespace(next=SimpleNamespace(after=after)) if after < 5 else None
+        )
+        return SimpleNamespace(results=[after], paging=paging)
+
+    client._client.crm.tickets.search_api.do_search = do_search
+    tickets = client.find_all_tickets(read_ahead=2)
+
+    assert next(tickets) == [1]
+    assert wait_for(lambda: len(searched) == 4)
+    assert list(tickets) == [[2], [3], [4], [5]]
@@ -0,0 +1,167 @@
+import time
+import tracemalloc
+
+import pytest
+
+from hs_api.api.hubspot_api import HubSpotClient
+from hs_api.api.profiling import BACKGROUND, Profiler
+
+DEAL_PAGES = [["1", "2"], ["3"]]
+
+
+def deal(deal_id):
+    return {
+        "id": deal_id,
+        "properties": {"dealname": f"Deal {deal_id}", "pipeline": "default"},
+        "createdAt": "2022-01-01T00:00:00Z",
+        "updatedAt": "2022-01-01T00:00:00Z",
+        "archived": False,
+    }
+
+
+def list_deals(request):
+    page = int(request.query.get("after", ["0"])[0])
+    response = {"results": [deal(x) for x in DEAL_PAGES[page]]}
+    if page + 1 < len(DEAL_PAGES):
+        response["paging"] = {"next": {"after": str(page + 1)}}
+    return response
+
+
+def email_events(request):
+    return {"events": [{"id": "e1"}], "hasMore": False}
+
+
+@pytest.fixture()
+def server(mock_server):
+    return mock_server(
+        {
+            ("GET", "/crm/v3/objects/deals"): list_deals,
+            ("GET", "/email/public/v1/events"): email_events,
+        }
+    )
+
+
+@pytest.fixture()
+def profiler():
+    return Profiler()
+
+
+@pytest.fixture()
+def client(server, profiler):
+    return HubSpotClient(
+        access_token="token",
+        pipeline_id="pipeline",
+        api_url=server.url,
+        validate_properties=False,
+        profiler=profiler,
+    )
+
+
+def test_profiles_each_page_of_find_all_deals(client, profiler):
+    batches = list(client.find_all_deals())
+
+    assert [len(x) for x in batches] == [2, 1]
+    frames = profiler.frames("find_all_deals")
+    # The last page is the one finding there are no more
+    assert [x.page for x in frames] == [0, 1, 2]
+    for frame in frames[:2]:
+        assert frame.seconds > 0
+        for phase in ("network", "decode", "model", "filter"):
+            assert frame.phases[phase] > 0
+        assert sum(frame.phases.values()) <= frame.seconds
+
+
+def test_profiles_raw_api_requests(client, profiler):
+    list(client.find_all_email_events())
+
+    frame = profiler.frames("find_all_email_events")[0]
+    assert frame.phases["network"] > 0
+    assert frame.phases["decode"] > 0
+    assert "model" not in frame.phases
+
+
+def test_profiles_calls_of_other_methods(client, profiler):
+    client.transport_stats
+    client.buffered_writer().close()
+
+    frames = profiler.frames()
+    assert [(x.method, x.page) for x in frames] == [("buffered_writer", None)]
+
+
+def test_summary_and_report(client, profiler):
+    list(client.find_all_deals())
+
+    summary = profiler.summary()["find_all_deals"]
+    assert summary["calls"] == 0
+    assert summary["pages"] == 3
+    assert summary["seconds"] == pytest.approx(
+        sum(x.seconds for x in profiler.frames("find_all_deals"))
+    )
+    report = profiler.report().splitlines()
+    assert report[0].split()[:4] == ["method", "calls", "pages", "seconds"]
+    assert report[1].split()[:3] == ["find_all_deals", "0", "3"]
+
+
+def test_collapsed_stacks(client, profiler):
+    list(client.find_all_deals())
+
+    stacks = dict(x.rsplit(" ", 1) for x in profiler.collapsed_stacks().splitlines())
+    assert {"find_all_deals;network", "find_all_deals;model"} <= set(stacks)
+    assert all(int(x) > 0 for x in stacks.values())
+
+
+def test_nested_frames_and_phases():
+    profiler = Profiler()
+
+    with profiler.frame("outer"):
+        with profiler.phase("decode"):
+            with profiler.phase("model"):
+                pass
+        with profiler.frame("inner"):
+            with profiler.phase("network"):
+                # Long enough to show in the stacks, rounded to microseconds
+                time.sleep(0.001)
+
+    inner, outer = profiler.frames()
+    assert inner.stack == ("outer", "inner")
+    assert outer.child_seconds == inner.seconds
+    assert set(outer.phases) == {"decode", "model"}
+    assert set(inner.phases) == {"network"}
+    assert "outer;inner;network" in profiler.collapsed_stacks()
+
+
+def test_phases_outside_frames_are_background():
+    profiler = Profiler()
+
+    with profiler.phase("network"):
+        pass
+
+    assert profiler.frames() == []
+    assert BACKGROUND in profiler.summary()
+
+
+def test_trace_allocations():
+    was_tracing = tracemalloc.is_tracing()
+    profiler = Profiler(trace_allocations=True)
+    try:
+        with profiler.frame("allocate"):
+            kept = [object() for _ in range(1000)]
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+
+    frame = profiler.frames()[0]
+    assert frame.allocated_blocks >= len(kept)
+    assert frame.allocated_bytes > 0
+
+
+def test_dump(tmp_path, client, profiler):
+    list(client.find_all_deals())
+
+    profiler.dump(tmp_path / "profile.txt")
+    profiler.dump(tmp_path / "profile.folded", format="collapsed")
+
+    assert (tmp_path / "profile.txt").read_text().startswith("method")
+    assert "find_all_deals;network" in (tmp_path / "profile.folded").read_text()
+    with pytest.raises(ValueError):
+        profiler.dump(tmp_path / "profile.svg", format="svg")
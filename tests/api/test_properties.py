@@ -0,0 +1,84 @@
+from types import SimpleNamespace
+
+import pytest
+
+from hs_api.api.hubspot_api import HubSpotClient
+from hs_api.api.properties import PropertyRegistry
+
+
+class FakeCoreApi:
+    def __init__(self):
+        self.requests = []
+
+    def get_all(self, object_type):
+        self.requests.append(object_type)
+        names = ["dealname", "dealstage", "amount", "hs_object_id"]
+        return SimpleNamespace(results=[SimpleNamespace(name=x) for x in names])
+
+
+@pytest.fixture()
+def core_api():
+    return FakeCoreApi()
+
+
+@pytest.fixture()
+def registry(core_api):
+    client = SimpleNamespace(
+        _client=SimpleNamespace(
+            crm=SimpleNamespace(properties=SimpleNamespace(core_api=core_api))
+        )
+    )
+    return PropertyRegistry(client)
+
+
+def test_properties_are_loaded_once_per_object_type(registry, core_api):
+    registry.validate("deal", ["dealname"])
+    registry.validate("deals", ["amount"])
+
+    assert core_api.requests == ["deals"]
+
+
+def test_properties_are_reloaded_once_stale(registry, core_api):
+    registry.validate("deal", ["dealname"])
+    registry.max_age = 0
+    registry.validate("deal", ["dealname"])
+
+    assert core_api.requests == ["deals", "deals"]
+
+
+def test_validate_invalid_property_raises_value_error_with_suggestion(registry):
+    with pytest.raises(ValueError, match="did you mean dealstage"):
+        registry.validate("deal", ["dealname", "dealstag"])
+
+
+def test_projection_returns_registered_properties(registry):
+    registry.register_projection("stages", "deal", ["dealname", "dealstage"])
+
+    assert registry.projection("stages", "deal") == ["dealname", "dealstage"]
+
+
+def test_projection_for_other_object_type_raises_value_error(registry):
+    registry.register_projection("stages", "deal", ["dealname", "dealstage"])
+
+    with pytest.raises(ValueError):
+        registry.projection("stages", "ticket")
+
+
+def test_register_projection_with_invalid_property_raises_value_error(registry):
+    with pytest.raises(ValueError):
+        registry.register_projection("stages", "deal", ["not_a_property"])
+
+
+def test_client_only_validates_properties_where_asked(core_api):
+    client = HubSpotClient(access_token="token", pipeline_id="pipeline")
+    client._client.crm.properties.core_api.get_all = core_api.get_all
+
+    assert client._resolve_properties("deal", ["dealstag"]) == ["dealstag"]
+    assert core_api.requests == []
+
+    client = HubSpotClient(
+        access_token="token", pipeline_id="pipeline", validate_properties=True
+    )
+    client._client.crm.properties.core_api.get_all = core_api.get_all
+    with pytest.raises(ValueError):
+        client._resolve_properties("deal", ["dealstag"])
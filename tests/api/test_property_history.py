@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from hs_api.api.property_history import (
+    PropertyHistoryRow,
+    extract_property_history,
+    write_parquet,
+)
+
+
+def deal(deal_id, updated_at, stages):
+    return {
+        "id": deal_id,
+        "updatedAt": updated_at,
+        "propertiesWithHistory": {
+            "dealstage": [
+                {"value": value, "timestamp": timestamp, "sourceType": "CRM_UI"}
+                for value, timestamp in stages
+            ]
+        },
+    }
+
+
+PAGES = {
+    None: {
+        "results": [
+            deal(
+                "1",
+                "2022-01-03T00:00:00Z",
+                [
+                    ("closedwon", "2022-01-03T00:00:00Z"),
+                    ("appointmentscheduled", "2022-01-01T00:00:00Z"),
+                ],
+            )
+        ],
+        "paging": {"next": {"after": "2"}},
+    },
+    "2": {
+        "results": [
+            deal("2", "2021-06-01T00:00:00Z", [("closedlost", "2021-06-01T00:00:00Z")])
+        ],
+    },
+}
+
+
+class FakeTransport:
+    def __init__(self):
+        self.requests = []
+
+    def get_json(self, path, params=None):
+        self.requests.append((path, params))
+        return PAGES[params.get("after")]
+
+
+def test_extract_property_history_yields_flat_rows_across_pages():
+    transport = FakeTransport()
+
+    rows = list(extract_property_history(transport, ["dealstage"]))
+
+    assert rows == [
+        PropertyHistoryRow(
+            "1",
+            "dealstage",
+            "closedwon",
+            datetime(2022, 1, 3, tzinfo=timezone.utc),
+            "CRM_UI",
+        ),
+        PropertyHistoryRow(
+            "1",
+            "dealstage",
+            "appointmentscheduled",
+            datetime(2022, 1, 1, tzinfo=timezone.utc),
+            "CRM_UI",
+        ),
+        PropertyHistoryRow(
+            "2",
+            "dealstage",
+            "closedlost",
+            datetime(2021, 6, 1, tzinfo=timezone.utc),
+            "CRM_UI",
+        ),
+    ]
+    assert transport.requests[0] == (
+        "/crm/v3/objects/deals",
+        {"limit": 50, "propertiesWithHistory": "dealstage", "archived": "false"},
+    )
+
+
+def test_extract_property_history_is_lazy():
+    transport = FakeTransport()
+
+    rows = extract_property_history(transport, ["dealstage"])
+    next(rows)
+
+    assert len(transport.requests) == 1
+
+
+def test_extract_property_history_only_yields_changes_since():
+    since = datetime(2022, 1, 2, tzinfo=timezone.utc)
+
+    rows = list(extract_property_history(FakeTransport(), ["dealstage"], since=since))
+
+    assert [(x.deal_id, x.value) for x in rows] == [("1", "closedwon")]
+
+
+def test_write_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    rows = extract_property_history(FakeTransport(), ["dealstage"])
+
+    written = write_parquet(rows, tmp_path / "history.parquet", row_group_size=2)
+
+    table = pq.read_table(tmp_path / "history.parquet")
+    assert written == table.num_rows == 3
+    assert table.column("value").to_pylist() == [
+        "closedwon",
+        "appointmentscheduled",
+        "closedlost",
+    ]
@@ -0,0 +1,25 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from hs_api.api.rate_limit import RateLimiter
+
+
+def test_requests_within_limit_are_not_delayed():
+    rate_limiter = RateLimiter(max_requests=5, period=10)
+
+    assert all(rate_limiter.try_acquire()[0] for _ in range(5))
+
+    acquired, wait = rate_limiter.try_acquire()
+    assert not acquired
+    assert 0 < wait <= 10
+
+
+def test_concurrent_requests_are_held_to_limit():
+    rate_limiter = RateLimiter(max_requests=5, period=0.2)
+    start = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(lambda _: rate_limiter.acquire(), range(15)))
+
+    # 15 requests at 5 per 0.2 seconds need at least two more periods
+    assert time.monotonic() - start >= 0.4
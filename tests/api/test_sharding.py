@@ -0,0 +1,177 @@
+from contextlib import nullcontext
+from types import SimpleNamespace
+
+import pytest
+from hubspot.crm.deals import ApiException
+
+from hs_api.api import sharding
+from hs_api.api.rate_limit import RateLimiter
+from hs_api.api.sharding import (
+    ShardLeases,
+    export_shard,
+    merge_shards,
+    plan_shards,
+    run_shard_worker,
+)
+
+# Ids bunched up at the start of the id space
+OBJECT_IDS = list(range(1, 301)) + list(range(1000, 1100, 10))
+
+
+class FakeObject(SimpleNamespace):
+    def to_dict(self):
+        return {"id": self.id}
+
+
+class FakeClient:
+    def __init__(self, object_ids):
+        self.objects = [FakeObject(id=str(x)) for x in object_ids]
+        self.search_lookup = {"deal": self.search}
+        self.rate_limiter = RateLimiter()
+        # Statuses to fail the next searches with
+        self.failures = []
+        self.searches = 0
+        # The page size an adaptive controller would choose
+        self.page_size = None
+
+    def _page_size(self, name, default, maximum):
+        return self.page_size or default
+
+    def _request(self, name):
+        return nullcontext()
+
+    def search(self, public_object_search_request):
+        self.searches += 1
+        if self.failures:
+            raise ApiException(status=self.failures.pop(0))
+        request = public_object_search_request
+        objects = self.objects
+        for x in request.filter_groups[0].filters:
+            if x.operator == "GTE":
+                objects = [y for y in objects if int(y.id) >= int(x.value)]
+            if x.operator == "LT":
+                objects = [y for y in objects if int(y.id) < int(x.value)]
+        if request.sorts and request.sorts[0]["direction"] == "DESCENDING":
+            objects = objects[::-1]
+
+        results = objects[: request.limit]
+        paging = object() if len(objects) > request.limit else None
+        return SimpleNamespace(results=results, total=len(objects), paging=paging)
+
+
+def test_plan_shards_covers_ids_with_balanced_shards():
+    shards = plan_shards(FakeClient(OBJECT_IDS), "deal", 4)
+
+    assert shards[0]["start"] == 1
+    assert shards[-1]["end"] == 1091
+    assert all(x["end"] == y["start"] for x, y in zip(shards, shards[1:]))
+    # The bunched up ids are split over several shards rather than one
+    assert len([x for x in shards if x["start"] < 300]) > 1
+
+
+def test_plan_shards_without_objects_returns_no_shards():
+    assert plan_shards(FakeClient([]), "deal", 4) == []
+
+
+def test_export_shard_returns_all_objects_in_range():
+    shard = {"index": 0, "start": 50, "end": 1050}
+
+    pages = list(export_shard(FakeClient(OBJECT_IDS), "deal", shard))
+
+    assert [int(x.id) for page in pages for x in page] == [
+        x for x in OBJECT_IDS if 50 <= x < 1050
+    ]
+
+
+def test_export_shard_uses_adaptive_page_size():
+    client = FakeClient(OBJECT_IDS)
+    client.page_size = 40
+
+    pages = list(export_shard(client, "deal", {"start": 1, "end": 101}))
+
+    assert [len(x) for x in pages] == [40, 40, 20]
+
+
+def test_export_shard_retries_throttled_searches(monkeypatch):
+    monkeypatch.setattr(sharding, "SHARD_RETRY_WAIT", 0)
+    client = FakeClient(OBJECT_IDS)
+    client.failures = [429, 502]
+    shard = {"index": 0, "start": 1, "end": 50}
+
+    pages = list(export_shard(client, "deal", shard))
+
+    assert [int(x.id) for page in pages for x in page] == list(range(1, 50))
+    assert client.searches == 3
+    # Every search, retried or not, waited on the rate limiter
+    assert len(client.rate_limiter._requests) == 3
+
+
+def test_export_shard_raises_other_errors_and_gives_up(monkeypatch):
+    monkeypatch.setattr(sharding, "SHARD_RETRY_WAIT", 0)
+    client = FakeClient(OBJECT_IDS)
+    shard = {"index": 0, "start": 1, "end": 50}
+
+    client.failures = [400]
+    with pytest.raises(ApiException):
+        list(export_shard(client, "deal", shard))
+    assert client.searches == 1
+
+    client.failures = [429] * (sharding.SHARD_RETRY_LIMIT + 1)
+    with pytest.raises(ApiException):
+        list(export_shard(client, "deal", shard))
+    assert client.searches == 1 + sharding.SHARD_RETRY_LIMIT + 1
+
+
+@pytest.fixture()
+def leases(tmp_path):
+    leases = ShardLeases(tmp_path / "leases.json", lease_seconds=60)
+    leases.create(
+        [
+            {"index": 0, "start": 1, "end": 500},
+            {"index": 1, "start": 500, "end": 1091},
+        ]
+    )
+    return leases
+
+
+def test_leases_hand_out_each_shard_once(leases):
+    assert leases.acquire("first")["index"] == 0
+    assert leases.acquire("second")["index"] == 1
+    assert leases.acquire("third") is None
+
+
+def test_expired_lease_is_handed_out_again(leases):
+    # A worker that leased a shard and then stopped renewing it
+    leases.lease_seconds = -1
+    shard = leases.acquire("crashed")
+    leases.lease_seconds = 60
+
+    assert leases.acquire("retry")["index"] == shard["index"]
+    assert not leases.renew(shard, "crashed")
+
+
+def test_lost_lease_is_not_completed(leases):
+    leases.lease_seconds = -1
+    shard = leases.acquire("slow")
+    leases.lease_seconds = 60
+    leases.acquire("other")
+    committed = []
+
+    assert not leases.complete(shard, "slow", commit=lambda: committed.append(1))
+    assert committed == []
+    assert leases.shards()[0]["status"] == "leased"
+    assert leases.complete(shard, "other")
+    assert leases.shards()[0]["status"] == "done"
+
+
+def test_workers_export_and_merge_in_id_order(leases, tmp_path):
+    client = FakeClient(OBJECT_IDS)
+
+    # A worker that crashed part way through the first shard
+    leases.lease_seconds = -1
+    leases.acquire("crashed")
+    run_shard_worker(leases.path, tmp_path, "deal", client=client, worker_id="a")
+
+    assert all(x["status"] == "done" for x in leases.shards())
+    merged = merge_shards(tmp_path, leases.shards())
+    assert [int(x["id"]) for x in merged] == OBJECT_IDS
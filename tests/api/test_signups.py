@@ -0,0 +1,199 @@
+import pytest
+
+from hs_api.api import hubspot_api
+from hs_api.api.hubspot_api import HubSpotClient
+
+DATES = {"createdAt": "2022-01-01T00:00:00Z", "updatedAt": "2022-01-01T00:00:00Z"}
+# Companies hubspot auto generates from the domain of a contact's email, with
+# their names
+AUTO_COMPANIES = {"auto.com": ("900", None), "named.com": ("901", "Existing")}
+
+
+def simple_object(object_id, properties):
+    return {"id": object_id, "properties": properties, "archived": False, **DATES}
+
+
+def batch_response(results):
+    return {
+        "status": "COMPLETE",
+        "results": results,
+        "startedAt": "2022-01-01T00:00:00Z",
+        "completedAt": "2022-01-01T00:00:00Z",
+    }
+
+
+def create(request, properties):
+    server = request.server
+    with server.lock:
+        server.next_id += 1
+        object_id = str(server.next_id)
+    if "email" in properties:
+        server.contacts[object_id] = properties["email"]
+    return simple_object(object_id, properties)
+
+
+def batch_create(request):
+    inputs = [x["properties"] for x in request.json()["inputs"]]
+    request.server.batches.append((request.match[1], inputs))
+    if any(x.get("email", "").startswith("bad") for x in inputs):
+        return 400, {"status": "error", "message": "Invalid email"}
+    # Results don't come back in the order of the inputs
+    return 201, batch_response([create(request, x) for x in reversed(inputs)])
+
+
+def create_contact(request):
+    properties = request.json()["properties"]
+    if properties["email"].startswith("bad"):
+        return 400, {"status": "error", "message": "Invalid email"}
+    return 201, create(request, properties)
+
+
+def read_associations(request):
+    ids = [x["id"] for x in request.json()["inputs"]]
+    request.server.association_reads.append(ids)
+    results = []
+    for contact_id in ids:
+        domain = request.server.contacts[contact_id].split("@")[1].lower()
+        if domain in AUTO_COMPANIES:
+            to = [{"id": AUTO_COMPANIES[domain][0], "type": "contact_to_company"}]
+            results.append({"from": {"id": contact_id}, "to": to})
+    return batch_response(results)
+
+
+def read_companies(request):
+    names = dict(AUTO_COMPANIES.values())
+    return batch_response(
+        [
+            simple_object(x["id"], {"name": names[x["id"]]})
+            for x in request.json()["inputs"]
+        ]
+    )
+
+
+def update_companies(request):
+    inputs = request.json()["inputs"]
+    request.server.updates.extend((x["id"], x["properties"]) for x in inputs)
+    return batch_response([simple_object(x["id"], x["properties"]) for x in inputs])
+
+
+def create_associations(request):
+    inputs = request.json()["inputs"]
+    request.server.associations.append(
+        [(x["from"]["id"], x["to"]["id"]) for x in inputs]
+    )
+    return batch_response(
+        [dict(x, type="contact_to_company") for x in inputs],
+    )
+
+
+@pytest.fixture()
+def server(mock_server, monkeypatch):
+    monkeypatch.setattr(hubspot_api, "ASSOCIATION_WAIT", 0)
+    server = mock_server(
+        {
+            ("POST", r"/crm/v3/objects/(\w+)/batch/create"): batch_create,
+            ("POST", "/crm/v3/objects/contacts"): create_contact,
+            (
+                "POST",
+                "/crm/v3/associations/contact/company/batch/read",
+            ): read_associations,
+            ("POST", "/crm/v3/objects/companies/batch/read"): read_companies,
+            ("POST", "/crm/v3/objects/companies/batch/update"): update_companies,
+            (
+                "POST",
+                "/crm/v3/associations/contact/company/batch/create",
+            ): create_associations,
+        }
+    )
+    server.next_id = 0
+    server.contacts = dict()
+    server.batches = []
+    server.association_reads = []
+    server.updates = []
+    server.associations = []
+    return server
+
+
+@pytest.fixture()
+def client(server):
+    return HubSpotClient(
+        access_token="token",
+        pipeline_id="pipeline",
+        api_url=server.url,
+        validate_properties=False,
+    )
+
+
+def signup(email, company):
+    return dict(email=email, first_name="First", last_name="Last", company=company)
+
+
+def test_create_contacts_and_companies(server, client):
+    outputs = client.create_contacts_and_companies(
+        [
+            signup("a@auto.com", "Auto"),
+            signup("b@named.com", "Named"),
+            signup("c@new.com", "New"),
+            signup("A@AUTO.com", "Auto again"),
+            signup("d@auto.com", "Auto too"),
+        ]
+    )
+
+    # Outputs are in the order of the signups, matched on email
+    assert [x["contact"] and x["contact"].properties["email"] for x in outputs] == [
+        "a@auto.com",
+        "b@named.com",
+        "c@new.com",
+        None,
+        "d@auto.com",
+    ]
+    # Only the first signup of a duplicate email is created
+    object_name, inputs = server.batches[0]
+    assert object_name == "contacts"
+    assert [x["email"] for x in inputs] == [
+        "a@auto.com",
+        "b@named.com",
+        "c@new.com",
+        "d@auto.com",
+    ]
+
+    # The unnamed auto generated company is named once, by its first signup
+    assert server.updates == [("900", {"name": "Auto"})]
+    assert outputs[0]["company"].properties["name"] == "Auto"
+    assert "company" not in outputs[4]
+    # A named one is left as it is
+    assert "company" not in outputs[1]
+
+    # Contacts without a company get a new one, associated with them
+    assert outputs[2]["company"].properties["name"] == "New"
+    contact_id, company_id = outputs[2]["contact"].id, outputs[2]["company"].id
+    assert server.associations == [[(contact_id, company_id)]]
+
+
+def test_failed_contacts_get_no_company(server, client):
+    outputs = client.create_contacts_and_companies(
+        [signup("bad@new.com", "Bad"), signup("c@new.com", "New")]
+    )
+
+    assert outputs[0] == {"contact": None}
+    assert outputs[1]["company"].properties["name"] == "New"
+    # The failed batch was retried one by one, and no company made for it
+    assert server.batches[-1] == ("companies", [{"name": "New", "domain": None}])
+
+
+def test_create_contacts_and_companies_batches_requests(server, client):
+    signups = [signup(f"{i}@new.com", f"Company {i}") for i in range(120)]
+
+    outputs = client.create_contacts_and_companies(signups)
+
+    assert all(x["company"] is not None for x in outputs)
+    assert [(x[0], len(x[1])) for x in server.batches] == [
+        ("contacts", 50),
+        ("contacts", 50),
+        ("contacts", 20),
+        ("companies", 50),
+        ("companies", 50),
+        ("companies", 20),
+    ]
+    assert [len(x) for x in server.association_reads] == [50, 50, 20]
+    assert [len(x) for x in server.associations] == [50, 50, 20]
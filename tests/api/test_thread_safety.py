@@ -0,0 +1,79 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hs_api.api.hubspot_api import HubSpotClient
+
+THREADS = 16
+CALLS_PER_THREAD = 25
+
+
+def search_companies(request):
+    # Echo the searched value back as the company, so each caller can check
+    # it got the response to its own request
+    value = request.json()["filterGroups"][0]["filters"][0]["value"]
+    return {
+        "total": 1,
+        "results": [
+            {
+                "id": value,
+                "properties": {"domain": value},
+                "createdAt": "2022-01-01T00:00:00Z",
+                "updatedAt": "2022-01-01T00:00:00Z",
+                "archived": False,
+            }
+        ],
+    }
+
+
+def email_events(request):
+    start_timestamp = request.query["startTimestamp"][0]
+    return {"events": [{"created": int(start_timestamp)}], "hasMore": False}
+
+
+@pytest.fixture()
+def server(mock_server):
+    return mock_server(
+        {
+            ("POST", "/crm/v3/objects/companies/search"): search_companies,
+            ("GET", "/email/public/v1/events"): email_events,
+        }
+    )
+
+
+def worker(client, thread_index):
+    for i in range(CALLS_PER_THREAD):
+        value = f"{thread_index}-{i}.com"
+        companies = client.find_company("domain", value)
+        assert [x.id for x in companies] == [value]
+
+        start_timestamp = thread_index * CALLS_PER_THREAD + i
+        events = next(client.find_all_email_events("startTimestamp", start_timestamp))
+        assert events == [{"created": start_timestamp}]
+
+
+def test_client_shared_between_threads(server):
+    client = HubSpotClient(
+        access_token="token", pipeline_id="pipeline", api_url=server.url
+    )
+
+    with ThreadPoolExecutor(max_workers=THREADS) as executor:
+        futures = [executor.submit(worker, client, x) for x in range(THREADS)]
+        for future in futures:
+            future.result()
+
+    assert client.transport_stats["requests"] == THREADS * CALLS_PER_THREAD
+
+    # Assert the connections were pooled rather than made per request
+    connections = {x.client_address for x in server.requests}
+    assert len(connections) <= THREADS * 2
+
+
+def test_sdk_apis_are_built_once():
+    client = HubSpotClient(access_token="token", pipeline_id="pipeline")
+
+    assert (
+        client._client.crm.companies.search_api
+        is client.search_lookup["company"].__self__
+    )
+    assert client.create_lookup is client.create_lookup
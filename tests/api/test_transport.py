@@ -0,0 +1,46 @@
+import gzip
+import json
+
+import pytest
+from requests.exceptions import HTTPError
+
+from hs_api.api.transport import HttpTransport, get_json_loads
+
+BODY = json.dumps({"events": [{"id": i} for i in range(100)]}).encode()
+
+
+def compressed_events(request):
+    headers = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+    return 200, gzip.compress(BODY), headers
+
+
+@pytest.fixture()
+def base_url(mock_server):
+    return mock_server({("GET", "/events"): compressed_events}).url
+
+
+def test_get_json_decodes_compressed_response(base_url):
+    transport = HttpTransport("token", base_url=base_url)
+
+    assert transport.get_json("/events") == json.loads(BODY)
+
+    stats = transport.stats.as_dict()
+    assert stats["requests"] == 1
+    assert stats["bytes_decoded"] == len(BODY)
+    assert stats["bytes_received"] < len(BODY)
+
+
+def test_get_json_raises_for_error_response(base_url):
+    transport = HttpTransport("token", base_url=base_url)
+
+    with pytest.raises(HTTPError):
+        transport.get_json("/missing")
+
+
+def test_get_json_loads_falls_back_to_standard_library():
+    assert get_json_loads("json") is json.loads
+
+
+def test_get_json_loads_invalid_backend_raises_value_error():
+    with pytest.raises(ValueError):
+        get_json_loads("not_a_backend")
@@ -0,0 +1,214 @@
+import base64
+import hashlib
+import hmac
+import json
+import queue
+import time
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+import requests
+from hubspot.exceptions import InvalidSignatureError
+
+from hs_api.api.rate_limit import RateLimiter
+from hs_api.api.webhooks import (
+    ChangeBatcher,
+    ChangeRecord,
+    WebhookReceiver,
+    reconciliation_sweep,
+    validate_signature,
+)
+
+CLIENT_SECRET = "client-secret"
+
+EVENTS = [
+    {
+        "eventId": 1,
+        "subscriptionType": "deal.propertyChange",
+        "objectId": 123,
+        "propertyName": "dealstage",
+        "propertyValue": "closedwon",
+        "occurredAt": 1650000000000,
+    },
+    {
+        "eventId": 2,
+        "subscriptionType": "contact.creation",
+        "objectId": 456,
+        "occurredAt": 1650000000001,
+    },
+    {
+        "eventId": 3,
+        "subscriptionType": "ticket.deletion",
+        "objectId": 789,
+        "occurredAt": 1650000000002,
+    },
+]
+
+
+def sign(uri, body, timestamp=None, client_secret=CLIENT_SECRET):
+    timestamp = str(timestamp or int(time.time() * 1000))
+    signature = base64.b64encode(
+        hmac.new(
+            client_secret.encode(),
+            f"POST{uri}{body}{timestamp}".encode(),
+            hashlib.sha256,
+        ).digest()
+    ).decode()
+    return {
+        "Content-Type": "application/json",
+        "X-HubSpot-Signature-v3": signature,
+        "X-HubSpot-Request-Timestamp": timestamp,
+    }
+
+
+def send_webhook(url, events, **kwargs):
+    """
+    Sends the events to the receiver the way hubspot does.
+    """
+    body = json.dumps(events)
+    return requests.post(url, data=body, headers=sign(url, body, **kwargs))
+
+
+@pytest.fixture()
+def receiver():
+    batches = queue.Queue()
+    receiver = WebhookReceiver(
+        CLIENT_SECRET, batches.put, host="127.0.0.1", port=0, max_wait=0.1
+    )
+    with receiver:
+        receiver.url = f"http://127.0.0.1:{receiver.port}/webhooks"
+        receiver.batches = batches
+        yield receiver
+
+
+def test_receiver_turns_events_into_batched_change_records(receiver):
+    response = send_webhook(receiver.url, EVENTS)
+
+    assert response.status_code == 204
+    assert receiver.batches.get(timeout=5) == [
+        ChangeRecord(
+            "deal", "123", "propertyChange", "dealstage", "closedwon", 1650000000000, 1
+        ),
+        ChangeRecord(
+            "contact", "456", "creation", occurred_at=1650000000001, event_id=2
+        ),
+        ChangeRecord(
+            "ticket", "789", "deletion", occurred_at=1650000000002, event_id=3
+        ),
+    ]
+
+
+def test_receiver_ignores_retried_events(receiver):
+    send_webhook(receiver.url, EVENTS[:1])
+    receiver.batches.get(timeout=5)
+    send_webhook(receiver.url, EVENTS)
+
+    assert [x.event_id for x in receiver.batches.get(timeout=5)] == [2, 3]
+
+
+def test_receiver_keeps_other_events_with_the_same_event_id(receiver):
+    other_subscription = dict(EVENTS[0], subscriptionId=2)
+    other_object = dict(EVENTS[0], objectId=124)
+    send_webhook(receiver.url, [EVENTS[0], other_subscription, other_object])
+
+    assert [
+        (x.subscription_id, x.object_id) for x in receiver.batches.get(timeout=5)
+    ] == [(None, "123"), (2, "123"), (None, "124")]
+
+
+class FakeSweepClient:
+    def __init__(self):
+        self.searches = []
+        self.tickets = []
+        self.search_lookup = {"deal": self.search}
+        self.rate_limiter = RateLimiter()
+
+    def _page_size(self, name, default, maximum):
+        return default
+
+    def _request(self, name):
+        return nullcontext()
+
+    def search(self, public_object_search_request):
+        self.searches.append(public_object_search_request.filter_groups[0].filters)
+        deal = SimpleNamespace(id="5", updated_at=datetime(2022, 1, 2))
+        return SimpleNamespace(results=[deal], paging=None)
+
+    def find_all_tickets(self, filter_name, filter_value):
+        self.tickets.append((filter_name, filter_value))
+        yield [SimpleNamespace(id="7", updated_at=datetime(2022, 1, 3))]
+
+
+def test_reconciliation_sweep_searches_modified_deals_and_tickets():
+    client = FakeSweepClient()
+    since = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+    records = list(reconciliation_sweep(client, since))
+
+    assert [(x.object_type, x.object_id, x.change_type) for x in records] == [
+        ("deal", "5", "reconciliation"),
+        ("ticket", "7", "reconciliation"),
+    ]
+    filters = {(x.property_name, x.operator): x.value for x in client.searches[0]}
+    assert filters == {
+        ("hs_object_id", "GTE"): "0",
+        ("hs_lastmodifieddate", "GT"): "1640995200000",
+    }
+    assert client.tickets == [("hs_lastmodifieddate", since)]
+
+
+def test_receiver_rejects_invalid_signature(receiver):
+    response = send_webhook(receiver.url, EVENTS, client_secret="wrong-secret")
+
+    assert response.status_code == 401
+
+
+def test_receiver_rejects_old_signature(receiver):
+    response = send_webhook(
+        receiver.url, EVENTS, timestamp=int(time.time() * 1000) - 10 * 60 * 1000
+    )
+
+    assert response.status_code == 401
+
+
+def test_validate_signature_v1():
+    body = json.dumps(EVENTS)
+    headers = {
+        "X-HubSpot-Signature": hashlib.sha256(
+            (CLIENT_SECRET + body).encode()
+        ).hexdigest(),
+        "X-HubSpot-Signature-Version": "v1",
+    }
+
+    validate_signature(CLIENT_SECRET, headers, "POST", "http://localhost", body)
+
+    with pytest.raises(InvalidSignatureError):
+        validate_signature("wrong-secret", headers, "POST", "http://localhost", body)
+
+
+def test_batcher_keeps_handing_on_after_handler_fails():
+    handled = queue.Queue()
+    errors = queue.Queue()
+
+    def handler(batch):
+        if batch[0].object_id == "1":
+            raise RuntimeError("handler failed")
+        handled.put(batch)
+
+    batcher = ChangeBatcher(
+        handler, max_batch_size=1, max_wait=0.05, on_error=errors.put
+    )
+    try:
+        batcher.add([ChangeRecord("deal", "1", "creation")])
+        failure = errors.get(timeout=2)
+        batcher.add([ChangeRecord("deal", "2", "creation")])
+
+        assert handled.get(timeout=2)[0].object_id == "2"
+    finally:
+        batcher.close()
+
+    assert [x.object_id for x in failure.records] == ["1"]
+    assert isinstance(failure.exception, RuntimeError)
+    assert batcher.failed == [failure]
@@ -0,0 +1,168 @@
+import json
+import time
+from datetime import datetime, timezone
+
+import pytest
+from requests.exceptions import HTTPError
+
+from hs_api.api.hubspot_api import HubSpotClient
+from hs_api.api.windows import TimeWindowPlanner, WindowCheckpoint
+
+# An email event a second over the first ten seconds of the epoch
+EVENTS = [{"id": str(i), "created": i * 1000} for i in range(10)]
+
+
+def test_planner_windows_cover_range():
+    planner = TimeWindowPlanner(0, 1000, window_size=300, min_window_size=1)
+
+    windows = []
+    window = planner.next_window()
+    while window is not None:
+        windows.append(window)
+        window = planner.next_window()
+
+    assert windows == [(0, 300), (300, 600), (600, 900), (900, 1000)]
+
+
+def test_planner_shrinks_windows_for_dense_events():
+    planner = TimeWindowPlanner(
+        0, 10000, window_size=1000, target_events=100, min_window_size=1
+    )
+
+    window = planner.next_window()
+    planner.complete(window, 1000)
+
+    assert planner.next_window() == (1000, 1550)
+
+
+def test_planner_grows_windows_for_empty_windows():
+    planner = TimeWindowPlanner(0, 10000, window_size=1000, min_window_size=1)
+
+    window = planner.next_window()
+    planner.complete(window, 0)
+
+    assert planner.next_window() == (1000, 2500)
+
+
+def test_planner_skips_completed_windows():
+    planner = TimeWindowPlanner(
+        0, 1000, window_size=400, min_window_size=1, completed=[(200, 500)]
+    )
+
+    assert planner.next_window() == (0, 200)
+    assert planner.next_window() == (500, 900)
+    assert planner.next_window() == (900, 1000)
+    assert planner.next_window() is None
+
+
+def test_checkpoint_resumes_completed_windows(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    checkpoint = WindowCheckpoint(path)
+    checkpoint.mark_complete((0, 100))
+    checkpoint.mark_complete((100, 200))
+
+    assert json.loads(path.read_text()) == {"completed": [[0, 100], [100, 200]]}
+    assert WindowCheckpoint(path).completed == [(0, 100), (100, 200)]
+
+
+def email_events(request):
+    server = request.server
+    start = int(request.query["startTimestamp"][0])
+    end = int(request.query["endTimestamp"][0])
+    offset = int(request.query.get("offset", ["0"])[0])
+    if server.failing is not None and start <= server.failing <= end:
+        return 400, {"status": "error", "message": "Bad window"}
+    events = [x for x in EVENTS if start <= x["created"] <= end]
+    page = events[offset:][:2]
+    has_more = server.endless or offset + 2 < len(events)
+    return {"events": page, "offset": str(offset + 2), "hasMore": has_more}
+
+
+@pytest.fixture()
+def server(mock_server):
+    server = mock_server({("GET", "/email/public/v1/events"): email_events})
+    # The epoch millis within the window failing with a 400
+    server.failing = None
+    # Whether every page has more after it
+    server.endless = False
+    return server
+
+
+@pytest.fixture()
+def client(server):
+    return HubSpotClient(
+        access_token="token",
+        pipeline_id="pipeline",
+        api_url=server.url,
+        validate_properties=False,
+    )
+
+
+def find_events(client, **kwargs):
+    return client.find_all_email_events_parallel(
+        end_timestamp=datetime.fromtimestamp(10, timezone.utc),
+        window_size=2000,
+        **kwargs,
+    )
+
+
+def test_parallel_email_events_merge_all_windows(client):
+    windows = []
+
+    batches = list(
+        find_events(
+            client,
+            workers=3,
+            progress_callback=lambda window, count: windows.append((window, count)),
+        )
+    )
+
+    assert sorted(x["id"] for batch in batches for x in batch) == sorted(
+        x["id"] for x in EVENTS
+    )
+    assert sum(count for _, count in windows) == len(EVENTS)
+    windows.sort()
+    assert windows[0][0][0] == 0 and windows[-1][0][1] == 10000
+    assert all(a[0][1] == b[0][0] for a, b in zip(windows, windows[1:]))
+
+
+def test_parallel_email_events_raise_worker_errors(server, client):
+    server.failing = 7000
+
+    with pytest.raises(HTTPError) as e:
+        list(find_events(client, workers=3))
+
+    assert e.value.response.status_code == 400
+
+
+def test_closing_parallel_email_events_stops_workers(server, client):
+    server.endless = True
+    events = find_events(client, workers=3)
+
+    next(events)
+    events.close()
+    requests = len(server.requests)
+    time.sleep(0.3)
+
+    assert len(server.requests) == requests
+
+
+def test_parallel_email_events_resume_from_checkpoint(server, client, tmp_path):
+    checkpoint_path = tmp_path / "windows.json"
+    server.failing = 7000
+    with pytest.raises(HTTPError):
+        list(find_events(client, workers=1, checkpoint_path=checkpoint_path))
+    completed = WindowCheckpoint(checkpoint_path).completed
+    assert completed == [(0, 2000)]
+
+    server.failing = None
+    server.requests.clear()
+    batches = list(find_events(client, workers=1, checkpoint_path=checkpoint_path))
+
+    assert [x["id"] for batch in batches for x in batch] == [
+        x["id"] for x in EVENTS if x["created"] >= 2000
+    ]
+    assert all(int(x.query["startTimestamp"][0]) >= 2000 for x in server.requests)
+    completed = sorted(WindowCheckpoint(checkpoint_path).completed)
+    assert completed[0] == (0, 2000) and completed[-1][1] == 10000
+    assert all(a[1] == b[0] for a, b in zip(completed, completed[1:]))
@@ -0,0 +1,98 @@
+import csv
+import json
+
+import pytest
+
+from hs_api.api.writers import (
+    convert_jsonl,
+    flatten_record,
+    import_pyarrow,
+    write_parquet_rows,
+)
+
+
+def write_jsonl(path, records):
+    with open(path, "w") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def test_flatten_record_lifts_properties():
+    record = {
+        "id": "1",
+        "properties": {"dealname": "Deal", "id": "clash"},
+        "associations": {"contacts": [{"id": "2"}]},
+    }
+
+    assert flatten_record(record) == {
+        "id": "1",
+        "associations": '{"contacts": [{"id": "2"}]}',
+        "dealname": "Deal",
+    }
+
+
+def test_convert_jsonl_to_jsonl_moves_file(tmp_path):
+    write_jsonl(tmp_path / "part.tmp", [{"id": "1"}])
+
+    convert_jsonl(tmp_path / "part.tmp", tmp_path / "part.jsonl", "jsonl")
+
+    assert not (tmp_path / "part.tmp").exists()
+    assert (tmp_path / "part.jsonl").read_text() == '{"id": "1"}\n'
+
+
+def test_convert_jsonl_to_csv(tmp_path):
+    write_jsonl(
+        tmp_path / "part.tmp",
+        [{"id": "1", "properties": {"a": "x"}}, {"id": "2", "properties": {"b": "y"}}],
+    )
+
+    convert_jsonl(tmp_path / "part.tmp", tmp_path / "part.csv", "csv")
+
+    with open(tmp_path / "part.csv") as f:
+        rows = list(csv.DictReader(f))
+    assert rows == [{"id": "1", "a": "x", "b": ""}, {"id": "2", "a": "", "b": "y"}]
+    assert not (tmp_path / "part.tmp").exists()
+
+
+def test_convert_jsonl_to_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    write_jsonl(tmp_path / "part.tmp", [{"id": "1", "count": 2}, {"id": "2"}])
+
+    convert_jsonl(tmp_path / "part.tmp", tmp_path / "part.parquet", "parquet")
+
+    assert pq.read_table(tmp_path / "part.parquet").to_pylist() == [
+        {"id": "1", "count": "2"},
+        {"id": "2", "count": None},
+    ]
+
+
+def test_convert_empty_jsonl_to_parquet(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    write_jsonl(tmp_path / "part.tmp", [])
+
+    convert_jsonl(tmp_path / "part.tmp", tmp_path / "part.parquet", "parquet")
+
+    assert pq.read_table(tmp_path / "part.parquet").num_rows == 0
+
+
+def test_write_parquet_rows_in_row_groups(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    pa, _ = import_pyarrow()
+    schema = pa.schema([("id", pa.string())])
+
+    written = write_parquet_rows(
+        tmp_path / "rows.parquet",
+        schema,
+        ({"id": str(x)} for x in range(5)),
+        lambda rows: pa.Table.from_pylist(rows, schema=schema),
+        row_group_size=2,
+    )
+
+    parquet_file = pq.ParquetFile(tmp_path / "rows.parquet")
+    assert written == parquet_file.metadata.num_rows == 5
+    assert parquet_file.num_row_groups == 3
+
+
+def test_convert_jsonl_invalid_format_raises_value_error(tmp_path):
+    with pytest.raises(ValueError):
+        convert_jsonl(tmp_path / "part.tmp", tmp_path / "part.xml", "xml")